@@ -1,7 +1,8 @@
 from flask import Flask
-from app.routes import main
 
 def create_app():
+    from app.routes import main  # Imported here so tools can use app modules without opening the chain
+
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'your_secret_key_here'  # Replace with a secure key
     app.register_blueprint(main)
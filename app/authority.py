@@ -0,0 +1,247 @@
+import os
+import time
+from cryptography.hazmat.primitives import serialization
+from app.storage import read_json, write_json_atomic
+
+
+class AuthorityScheduler:
+    """
+    Proof-of-authority slot assignment.
+
+    The authorities, sorted by identifier so every node agrees on the order, take
+    turns by height: the slot of height h belongs to authority h mod n. When the
+    owner of a slot has not produced a block slot_timeout seconds after the
+    previous block, the slot passes to the next authority in the rotation.
+    Authorities that were skipped more recently than they signed are offline and
+    are passed over without waiting; the owner of a slot may always seal it, which
+    is how an offline authority comes back.
+
+    The offline set is derived from the signers of the blocks before a height, so
+    every node computes the same one, and check_signer() holds blocks from peers to
+    the same rule: a block sealed by the j-th authority still online in its
+    rotation must be timestamped at least j slot timeouts after its parent.
+    """
+
+    MAX_CLOCK_DRIFT = 15.0  # Seconds a peer's block may be timestamped ahead of our clock
+
+    def __init__(self, blockchain, slot_timeout=1.0):
+        """
+        Initialize the scheduler.
+
+        Args:
+            blockchain (Blockchain): The chain whose authority_nodes take turns.
+            slot_timeout (float): Seconds to wait for an authority before skipping it.
+        """
+        self.blockchain = blockchain
+        self.slot_timeout = slot_timeout
+
+    def rotation(self, height):
+        """
+        Return the authorities in the order they may seal the block at height.
+
+        Args:
+            height (int): Height of the block to seal.
+
+        Returns:
+            list: Node identifiers, the slot owner first.
+        """
+        node_ids = sorted(self.blockchain.authority_nodes)
+        if not node_ids:
+            return []
+        first = height % len(node_ids)
+        return node_ids[first:] + node_ids[:first]
+
+    def slot_owner(self, height):
+        """Return the authority whose slot is height, ignoring timeouts."""
+        rotation = self.rotation(height)
+        if not rotation:
+            raise ValueError("No authority nodes available.")
+        return rotation[0]
+
+    def offline_at(self, height, block_at=None):
+        """
+        Return which authorities are offline, and which are unknown, when height is sealed.
+
+        An authority is offline if, in the latest block before height that involves
+        it, it was skipped: it was ahead of the signer in that block's rotation; one
+        no block involves is online. The slot owners of n consecutive blocks cover
+        all n authorities, so at most the n previous blocks are read.
+
+        Args:
+            height (int): Height of the block to seal.
+            block_at (callable, optional): Returns the block at a lower height, or None
+                if it is not available; defaults to the committed chain.
+
+        Returns:
+            tuple: (offline, unknown) sets of node identifiers. Unknown authorities
+                are not involved in the blocks read, and some of the blocks that
+                should have been read are not available, e.g. after a bootstrap.
+        """
+        block_at = block_at or self._committed_block
+        node_ids = set(self.blockchain.authority_nodes)
+        offline, decided = set(), set()
+        for h in range(height - 1, max(height - len(node_ids), 0) - 1, -1):
+            if len(decided) == len(node_ids):
+                break
+            block = block_at(h)
+            if block is None:
+                return offline, node_ids - decided
+            if block.authority is None:
+                continue
+            for node_id in self.rotation(h):
+                if node_id not in decided:
+                    decided.add(node_id)
+                    if node_id != block.authority:
+                        offline.add(node_id)
+                if node_id == block.authority:
+                    break
+        return offline, set()
+
+    def _committed_block(self, height):
+        chain = self.blockchain.chain
+        if getattr(chain, 'base', 0) <= height < len(chain):
+            return chain[height]
+        return None
+
+    def authority_for(self, height, waited=0.0):
+        """
+        Return the authority entitled to seal the block at height.
+
+        Authorities not seen recently are counted as online, so this node waits at
+        least as long as any peer will require.
+
+        Args:
+            height (int): Height of the block to seal.
+            waited (float): Seconds since the previous block (or since the batch
+                became due, if that is later).
+
+        Returns:
+            str: A node identifier, or None if there are no authorities.
+        """
+        rotation = self.rotation(height)
+        if not rotation:
+            return None
+        offline, _ = self.offline_at(height)
+        candidates = [node_id for node_id in rotation if node_id not in offline] or rotation
+        return candidates[int(waited // self.slot_timeout) % len(candidates)]
+
+    def check_signer(self, height, block, block_at=None):
+        """
+        Check that a block from another node was sealed by the authority entitled to its slot.
+
+        The slot owner may seal at once. Any other authority must be online and the
+        block must come at least one slot timeout after its parent for every online
+        authority ahead of it in the rotation. Authorities whose state cannot be
+        told from the blocks available are not counted against the signer.
+
+        Args:
+            height (int): Height of the block.
+            block (Block): The block.
+            block_at (callable, optional): Returns the block at a lower height, or None;
+                defaults to the committed chain.
+
+        Returns:
+            str: Why the signer is not entitled, or None if it is or there are no authorities.
+        """
+        rotation = self.rotation(height)
+        if not rotation:
+            return None
+        authority = block.authority
+        if authority is None:
+            return "block is not signed by an authority"
+        if authority not in rotation:
+            return f"signed by {authority!r}, which is not in the rotation of height {height}"
+        if block.timestamp > time.time() + self.MAX_CLOCK_DRIFT:
+            return "block is timestamped in the future"
+        if authority == rotation[0]:
+            return None
+        block_at = block_at or self._committed_block
+        offline, unknown = self.offline_at(height, block_at)
+        if authority in offline and len(offline) < len(rotation):
+            return f"signed by {authority!r}, which is offline and does not own slot {height}"
+        parent = block_at(height - 1)
+        if parent is None:
+            return None  # Nothing to measure the wait against
+        ahead = [node_id for node_id in rotation[:rotation.index(authority)]
+                 if node_id not in offline and node_id not in unknown]
+        elapsed = block.timestamp - parent.timestamp
+        if elapsed < len(ahead) * self.slot_timeout:
+            return (f"signed by {authority!r} {elapsed:.2f}s after its parent, before "
+                    f"{', '.join(ahead)} let slot {height} time out")
+        return None
+
+    def time_to_next_slot(self, waited):
+        """Seconds until the slot passes to the next authority."""
+        return self.slot_timeout - waited % self.slot_timeout
+
+
+def load_public_key(key):
+    """Return an RSA public key given as a key object or as PEM (str or bytes)."""
+    if isinstance(key, str):
+        key = key.encode()
+    if isinstance(key, bytes):
+        return serialization.load_pem_public_key(key)
+    return key
+
+
+def public_key_pem(key):
+    """Return the PEM encoding of a public key, as a string."""
+    return key.public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+
+
+def load_authority_keys(filename):
+    """
+    Read the authority public keys saved next to a chain.
+
+    Returns:
+        dict: Node identifier -> RSA public key; empty if the file is missing.
+    """
+    return {node_id: load_public_key(pem) for node_id, pem in (read_json(filename) or {}).items()}
+
+
+def save_authority_keys(filename, authority_nodes):
+    """Write the authority public keys of a chain as node identifier -> PEM."""
+    write_json_atomic(filename, {
+        node_id: public_key_pem(load_public_key(key)) for node_id, key in authority_nodes.items()
+    })
+
+
+def authorities_from_environment():
+    """
+    Read the authority keys configured for this process.
+
+    BLOCKCHAIN_AUTHORITIES lists the public keys of the network as comma-separated
+    node_id=path.pem pairs. BLOCKCHAIN_AUTHORITY_ID and BLOCKCHAIN_AUTHORITY_KEY
+    (path of a PEM private key, encrypted with BLOCKCHAIN_AUTHORITY_KEY_PASSWORD if
+    set) name the authority this process signs for.
+
+    Returns:
+        tuple: (authority_nodes, local_authorities) dicts of node identifier -> key.
+
+    Raises:
+        ValueError: If the configuration is incomplete or malformed.
+    """
+    authority_nodes = {}
+    for entry in os.environ.get('BLOCKCHAIN_AUTHORITIES', '').split(','):
+        if not entry.strip():
+            continue
+        node_id, separator, path = entry.partition('=')
+        if not separator or not node_id.strip() or not path.strip():
+            raise ValueError(f"BLOCKCHAIN_AUTHORITIES entry {entry!r} is not node_id=path.pem.")
+        with open(path.strip(), 'rb') as f:
+            authority_nodes[node_id.strip()] = serialization.load_pem_public_key(f.read())
+
+    local_authorities = {}
+    node_id = os.environ.get('BLOCKCHAIN_AUTHORITY_ID')
+    key_filename = os.environ.get('BLOCKCHAIN_AUTHORITY_KEY')
+    if bool(node_id) != bool(key_filename):
+        raise ValueError("BLOCKCHAIN_AUTHORITY_ID and BLOCKCHAIN_AUTHORITY_KEY must be set together.")
+    if node_id:
+        password = os.environ.get('BLOCKCHAIN_AUTHORITY_KEY_PASSWORD')
+        with open(key_filename, 'rb') as f:
+            local_authorities[node_id] = serialization.load_pem_private_key(
+                f.read(), password.encode() if password else None)
+    return authority_nodes, local_authorities
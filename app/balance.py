@@ -1,6 +1,35 @@
+import math
+from app.storage import SnapshotLog
+
+
+class InsufficientBalanceError(ValueError):
+    """Raised when a spend exceeds what an account has left after its pending spends."""
+
+
 class BalanceManager:
+    # How each token operation moves its amount: (debit sender, credit recipient)
+    TOKEN_OPERATIONS = {
+        'CREDIT': (False, True),
+        'MINT_TOKENS': (False, True),
+        'TOKEN_TRANSFER': (True, True),
+        'DROP': (True, True),
+        'TAX_PAYMENT': (True, True),
+        'BURN': (True, False),
+        'BURN_TOKENS': (True, False),
+        'STAKE': (True, False),
+        'UNSTAKE': (False, True),
+    }
+    SYSTEM_ACCOUNTS = {'SYSTEM', 'BURN', 'STAKE_POOL'}  # Accounts that never hold a balance
+
     def __init__(self):
         self.balances = {}  # Dictionary to store user balances
+        self.stakes = {}  # Dictionary to store staked amounts per user
+        self.columns = None  # Chain columns the running balance after each transaction is written to
+        self.height = 0  # Number of blocks folded into the balances
+        self.tip_hash = None  # Hash of the last folded block
+        self.snapshot_height = 0  # Height covered by the checkpoint log on disk
+        self.snapshot_log = None  # SnapshotLog the checkpoints are saved to
+        self._changed = set()  # Accounts whose balance or stake changed since the last checkpoint
 
     def initialize_user(self, user_did):
         """Initialize a user's balance if not already present."""
@@ -11,11 +40,16 @@ class BalanceManager:
         """Retrieve the balance of a user."""
         return self.balances.get(user_did, 0)
 
+    def get_stake(self, user_did):
+        """Retrieve the amount a user currently has staked."""
+        return self.stakes.get(user_did, 0)
+
     def update_balance(self, user_did, amount):
         """Update the balance of a user."""
         if user_did not in self.balances:
             self.initialize_user(user_did)
         self.balances[user_did] += amount
+        self._changed.add(user_did)
 
     def send_tokens(self, sender_did, recipient_did, amount):
         """Transfer tokens from one user to another."""
@@ -26,9 +60,229 @@ class BalanceManager:
 
         if self.get_balance(sender_did) < amount:
             raise ValueError("Insufficient balance")
-        
+
         self.update_balance(sender_did, -amount)
         self.update_balance(recipient_did, amount)
 
     def print_balance(self, username):
         print(f"Balance before credit: {self.get_balance(username)}")  # Before adding credit
+
+    def pending_debits(self, account, transactions, stake=False):
+        """
+        Return how much transactions not yet committed will take from an account.
+
+        Args:
+            account (str): The account.
+            transactions (list): Pending transactions.
+            stake (bool): Count what they unstake from the account's stake instead of
+                what they debit from its balance.
+
+        Returns:
+            float: The total amount debited.
+        """
+        total = 0
+        for transaction in transactions:
+            if not isinstance(transaction.data, dict):
+                continue
+            if stake:
+                debits = transaction.operation == 'UNSTAKE' and transaction.recipient == account
+            else:
+                movement = self.TOKEN_OPERATIONS.get(transaction.operation)
+                debits = movement is not None and movement[0] and transaction.sender == account
+            if debits:
+                total += transaction.data.get('amount', 0)
+        return total
+
+    def apply_transaction(self, transaction):
+        """
+        Fold one committed transaction into the balance table.
+
+        Args:
+            transaction (Transaction): A transaction from a committed block.
+        """
+        if transaction.operation not in self.TOKEN_OPERATIONS or not isinstance(transaction.data, dict):
+            return
+        self.apply_movement(transaction.operation, transaction.sender, transaction.recipient,
+                            transaction.data.get('amount', 0))
+
+    def apply_movement(self, operation, sender, recipient, amount, row=None):
+        """
+        Apply the balance and stake changes of one token operation.
+
+        Args:
+            operation (str): The transaction operation.
+            sender (str): The sending account.
+            recipient (str): The receiving account.
+            amount (float): The amount moved.
+            row (int, optional): Row of the transaction in the chain columns, where the
+                balances it leaves are recorded.
+        """
+        balances, stakes = {}, {}
+        moved = self._stage_movement(balances, stakes, operation, sender, recipient, amount)
+        if row is not None:
+            self._record_balances(row, balances, sender, recipient, moved)
+        self._publish(balances, stakes)
+
+    def _stage_movement(self, balances, stakes, operation, sender, recipient, amount):
+        """
+        Record the new balances and stakes of one token operation in the staging dicts.
+
+        Returns:
+            tuple: Whether the operation moved the sender's and the recipient's balance.
+        """
+        movement = self.TOKEN_OPERATIONS.get(operation)
+        if movement is None:
+            return False, False
+        debit_sender, credit_recipient = movement
+
+        debited = debit_sender and sender not in self.SYSTEM_ACCOUNTS
+        credited = credit_recipient and recipient not in self.SYSTEM_ACCOUNTS
+        if debited:
+            balances[sender] = balances.get(sender, self.get_balance(sender)) - amount
+        if credited:
+            balances[recipient] = balances.get(recipient, self.get_balance(recipient)) + amount
+
+        if operation == 'STAKE':
+            stakes[sender] = stakes.get(sender, self.get_stake(sender)) + amount
+        elif operation == 'UNSTAKE':
+            stakes[recipient] = stakes.get(recipient, self.get_stake(recipient)) - amount
+        return debited, credited
+
+    def _record_balances(self, row, balances, sender, recipient, moved):
+        """Write the staged balances of a transaction's sender and recipient next to its row."""
+        debited, credited = moved
+        self.columns.set_balances(
+            row,
+            balances[sender] if debited else math.nan,
+            balances[recipient] if credited else math.nan
+        )
+
+    def _publish(self, balances, stakes):
+        """
+        Write staged balances and stakes into the live tables.
+
+        Each account is written once with its final value, so a reader that does not
+        take the commit lock sees a balance either before or after a block, never in
+        between.
+        """
+        self.balances.update(balances)
+        self._changed.update(balances)
+        self._changed.update(stakes)
+        for account, stake in stakes.items():
+            if stake:
+                self.stakes[account] = stake
+            else:
+                self.stakes.pop(account, None)
+
+    def apply_block(self, block):
+        """
+        Fold every transaction of a newly committed block into the balance table.
+
+        If the block has already been added to the columns, the running balances are
+        recorded in its rows.
+
+        Args:
+            block (Block): The block appended at height ``self.height``.
+        """
+        columns = self.columns
+        first_row = None
+        if columns is not None and columns.height == self.height + 1:
+            first_row = columns.block_first_row[self.height - columns.base]
+        balances, stakes = {}, {}
+        for position, transaction in enumerate(block.transactions):
+            if transaction.operation in self.TOKEN_OPERATIONS and isinstance(transaction.data, dict):
+                moved = self._stage_movement(balances, stakes, transaction.operation, transaction.sender,
+                                             transaction.recipient, transaction.data.get('amount', 0))
+                if first_row is not None:
+                    self._record_balances(first_row + position, balances, transaction.sender,
+                                          transaction.recipient, moved)
+        self._publish(balances, stakes)
+        self.height += 1
+        self.tip_hash = block.hash
+
+    def rebuild(self, chain, start=0):
+        """
+        Replay the blocks of chain from height start onwards.
+
+        Reads the chain's columns when they cover it, so no block has to be decoded.
+
+        Args:
+            chain (list): The blockchain's list of blocks.
+            start (int): First height to replay.
+        """
+        columns = getattr(chain, 'columns', None)
+        if columns is None or columns.height != len(chain):
+            for height in range(start, len(chain)):
+                self.apply_block(chain[height])
+            return
+
+        first_row = columns.block_first_row[start - columns.base] if start < columns.height else len(columns)
+        for row in range(first_row, len(columns)):
+            tx = columns.row(row)
+            if tx.operation in self.TOKEN_OPERATIONS and tx.amount is not None:
+                self.apply_movement(tx.operation, tx.sender, tx.recipient, tx.amount, row)
+        if columns.height > start:
+            self.height = columns.height
+            self.tip_hash = columns.block_hash_at(columns.height - 1)
+
+    def save(self, filename):
+        """
+        Append a checkpoint of the balances and stakes changed since the last one.
+
+        Args:
+            filename (str): Path of the checkpoint log.
+        """
+        if self.snapshot_log is None or self.snapshot_log.filename != filename:
+            self.snapshot_log = SnapshotLog(filename)
+        if self.height > self.snapshot_height:
+            self.snapshot_log.append({
+                "start": self.snapshot_height,
+                "height": self.height,
+                "tip_hash": self.tip_hash,
+                "balances": {account: self.balances[account] for account in self._changed if account in self.balances},
+                "stakes": {account: self.stakes.get(account, 0) for account in self._changed}
+            })
+        self._changed = set()
+        self.snapshot_height = self.height
+
+    @classmethod
+    def load(cls, filename, chain, base_state=None):
+        """
+        Restore the balance table from its checkpoint log and replay the blocks after it.
+
+        Checkpoints are only trusted while they continue each other, the block at
+        their height still has the hash they recorded, and the chain's column
+        snapshot, which carries the running balances, reaches it. The balances are
+        replayed from the last one that is, starting from base_state on a chain
+        bootstrapped from a state snapshot.
+
+        Args:
+            filename (str): Path of the checkpoint log.
+            chain (list): The blockchain's list of blocks.
+            base_state (StateSnapshot, optional): The state the chain was bootstrapped from.
+
+        Returns:
+            BalanceManager: Balances covering every block of chain.
+        """
+        manager = cls()
+        columns = manager.columns = getattr(chain, 'columns', None)
+        if base_state is not None:
+            manager.height = manager.snapshot_height = base_state.height
+            manager.tip_hash = base_state.tip_hash
+            manager.balances = dict(base_state.balances)
+            manager.stakes = dict(base_state.stakes)
+        manager.snapshot_log = SnapshotLog(filename)
+        for checkpoint, _ in manager.snapshot_log.read(chain, manager.height):
+            if columns is not None and checkpoint["height"] > columns.snapshot_height:
+                break
+            manager.balances.update(checkpoint["balances"])
+            for account, stake in checkpoint["stakes"].items():
+                if stake:
+                    manager.stakes[account] = stake
+                else:
+                    manager.stakes.pop(account, None)
+            manager.height = manager.snapshot_height = checkpoint["height"]
+            manager.tip_hash = checkpoint["tip_hash"]
+        manager._changed = set()
+        manager.rebuild(chain, start=manager.height)
+        return manager
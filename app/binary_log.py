@@ -0,0 +1,232 @@
+import json
+import mmap
+import os
+import struct
+import zlib
+from app.merkle import merkle_root_from_digests
+from app.storage import BlockLog, BlockLogError
+
+
+class BinaryBlockLog(BlockLog):
+    """
+    Binary, memory-mapped alternative to the JSON Lines block log.
+
+    Each record is a fixed-size header followed by a variable body::
+
+        header: marker "GLB1", body length, CRC-32, index (u64), timestamp (f64),
+                version (u8), block hash (32 raw bytes), Merkle root (32 raw bytes),
+                transaction count (u32), meta length (u32)
+        body:   compact JSON of the remaining block fields (previous_hash, nonce...),
+                the transaction hashes (32 raw bytes each, in block order),
+                compact JSON array of the other transaction fields
+
+    Records are read through mmap: header fields, hashes and CRCs are taken from
+    memoryview slices of the mapping, so the offline check in verify_at() does not
+    copy the file into Python strings. Chain validation decodes every block, since
+    it checks each transaction against its hash. The ``.offsets`` sidecar from BlockLog
+    is reused as the offset table.
+    """
+
+    FORMAT = 'binary'
+    EXTENSION = '.blocks'
+    MARKER = b'GLB1'
+    RECORD_HEADER = struct.Struct('<4sIIQdB32s32sII')
+    HEADER_SIZE = RECORD_HEADER.size
+    HASH_SIZE = 32
+    CRC_START = 12  # CRC covers everything after the marker, length and CRC fields
+    HEADER_KEYS = ('index', 'timestamp', 'version', 'hash', 'merkle_root', 'transactions')
+
+    def __init__(self, filename):
+        """
+        Initialize the binary block log.
+
+        Args:
+            filename (str): Path of the log file.
+        """
+        super().__init__(filename)
+        self._map = None  # Read-only mapping of the whole file, replaced when the file grows
+
+    @classmethod
+    def encode_record(cls, block_data):
+        """
+        Encode a block dictionary as one binary record.
+
+        Args:
+            block_data (dict): The block as returned by Block.to_dict().
+
+        Returns:
+            bytes: The encoded record.
+        """
+        meta = {key: value for key, value in block_data.items() if key not in cls.HEADER_KEYS}
+        timestamp = block_data['timestamp']
+        if type(timestamp) is not float:
+            meta['timestamp'] = timestamp  # Keep the exact JSON type for legacy hashing
+        merkle = block_data.get('merkle_root')
+
+        transactions = block_data['transactions']
+        meta_json = _dumps(meta)
+        meta_length = len(meta_json)
+        body = b''.join([
+            meta_json,
+            b''.join(bytes.fromhex(tx['hash']) for tx in transactions),
+            _dumps([{key: value for key, value in tx.items() if key != 'hash'} for tx in transactions])
+        ])
+
+        header = cls.RECORD_HEADER.pack(
+            cls.MARKER, len(body), 0,
+            block_data['index'], float(timestamp), block_data.get('version', 0),
+            bytes.fromhex(block_data['hash']), bytes.fromhex(merkle) if merkle else bytes(32),
+            len(block_data['transactions']), meta_length
+        )
+        checksum = zlib.crc32(body, zlib.crc32(header[cls.CRC_START:]))
+        return header[:8] + struct.pack('<I', checksum) + header[cls.CRC_START:] + body
+
+    def read_at(self, offset):
+        """
+        Decode the block stored at a byte offset.
+
+        Args:
+            offset (int): Offset of the record.
+
+        Returns:
+            dict: The block dictionary, identical to what was appended.
+        """
+        view, header = self._record_view(offset)
+        try:
+            (_, _, _, index, timestamp, version, block_hash, merkle,
+             tx_count, meta_length) = header
+            body = view[self.HEADER_SIZE:]
+            block_data = json.loads(body[:meta_length].tobytes())
+            block_data.setdefault('timestamp', timestamp)
+            block_data['index'] = index
+            block_data['hash'] = block_hash.hex()
+            if version:
+                block_data['version'] = version
+            if merkle != bytes(32):
+                block_data['merkle_root'] = merkle.hex()
+
+            hashes_end = meta_length + tx_count * self.HASH_SIZE
+            hashes = body[meta_length:hashes_end].hex()
+            transactions = json.loads(body[hashes_end:].tobytes())
+            for position, tx in enumerate(transactions):
+                tx['hash'] = hashes[position * 64:(position + 1) * 64]
+            block_data['transactions'] = transactions
+            return block_data
+        finally:
+            view.release()
+
+    def verify_at(self, offset):
+        """
+        Verify a record in place: its CRC-32 and, for version 2 blocks, that the
+        Merkle root matches the stored transaction hashes and that the header
+        hashes to the stored block hash.
+
+        Args:
+            offset (int): Offset of the record.
+
+        Returns:
+            bool: True if the record is intact and self-consistent.
+        """
+        from app.block import Block
+
+        try:
+            view, header = self._record_view(offset)
+        except BlockLogError:
+            return False
+        try:
+            (_, _, _, index, timestamp, version, block_hash, merkle,
+             tx_count, meta_length) = header
+            if version < 2:
+                return True  # Legacy blocks hash their full payload; only the CRC applies
+            body = view[self.HEADER_SIZE:]
+            digests = [
+                body[position:position + self.HASH_SIZE]
+                for position in range(meta_length, meta_length + tx_count * self.HASH_SIZE, self.HASH_SIZE)
+            ]
+            root = merkle_root_from_digests(digests)
+            for digest in digests:
+                digest.release()
+            if root != merkle.hex():
+                return False
+            meta = json.loads(body[:meta_length].tobytes())
+            block_header = {
+                "version": version,
+                "index": index,
+                "timestamp": meta.get('timestamp', timestamp),
+                "previous_hash": meta.get('previous_hash'),
+                "merkle_root": merkle.hex(),
+                "nonce": meta.get('nonce')
+            }
+            return Block.hash_header(block_header) == block_hash.hex()
+        finally:
+            view.release()
+
+    def read_blocks(self):
+        """
+        Read every block stored in the log.
+
+        Returns:
+            list: The stored block dictionaries, in chain order.
+        """
+        return [self.read_at(offset) for offset in self.load_offsets()]
+
+    def close(self):
+        """Drop the mapping; the file is mapped again on the next read."""
+        with self._read_lock:
+            self._map = None
+
+    def _mapping(self, end):
+        """
+        Return a mapping of the file covering at least the first end bytes.
+
+        The file is mapped again once it has grown past the current mapping. An
+        outdated mapping is only dropped, not closed, so readers still holding a
+        view of it are unaffected; it is unmapped when the last view goes away.
+        """
+        with self._read_lock:
+            if self._map is None or len(self._map) < end:
+                if not self.exists() or os.path.getsize(self.filename) < end:
+                    raise BlockLogError(f"Record ending at offset {end} lies beyond the end of {self.filename}")
+                with open(self.filename, 'rb') as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map
+
+    def _record_view(self, offset):
+        """
+        Return a memoryview over a whole record after checking its marker and CRC.
+
+        Returns:
+            tuple: (memoryview of the record, unpacked header fields).
+        """
+        mapping = self._mapping(offset + self.HEADER_SIZE)
+        header = self.RECORD_HEADER.unpack_from(mapping, offset)
+        marker, body_length, checksum = header[:3]
+        end = offset + self.HEADER_SIZE + body_length
+        if marker != self.MARKER:
+            raise BlockLogError(f"Corrupted record at offset {offset} in {self.filename}")
+        mapping = self._mapping(end)
+        view = memoryview(mapping)[offset:end]
+        if zlib.crc32(view[self.CRC_START:]) != checksum:
+            view.release()
+            raise BlockLogError(f"Corrupted record at offset {offset} in {self.filename}")
+        return view, header
+
+    def _record_end(self, f, offset, size):
+        if offset + self.HEADER_SIZE > size:
+            return None
+        f.seek(offset)
+        marker, body_length = struct.unpack('<4sI', f.read(8))
+        end = offset + self.HEADER_SIZE + body_length
+        if marker != self.MARKER:
+            if end == size:
+                return None  # Damaged final record
+            # A torn append leaves a prefix of a record with its marker intact, so
+            # this is damage in the middle of the log
+            raise BlockLogError(f"Corrupted record at offset {offset} in {self.filename}")
+        if end > size:
+            return None
+        return end
+
+
+def _dumps(value):
+    return json.dumps(value, sort_keys=True, separators=(',', ':')).encode()
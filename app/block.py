@@ -1,15 +1,27 @@
+import base64
 import hashlib
 import time
 import json
 from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.exceptions import InvalidSignature
 from app.transaction import Transaction
+from app.merkle import merkle_root, merkle_proof, verify_merkle_proof
 
 class Block:
-    def __init__(self, index, transactions, previous_hash, nonce=0, authority_signature=None, timestamp=None, hash=None):
+    # Version 1 blocks hash their full transaction list; version 2 blocks hash a
+    # fixed-size header that commits to the transactions through a Merkle root.
+    VERSION = 2
+
+    # Fixed attribute layout: no per-instance __dict__
+    __slots__ = ('index', 'timestamp', 'transactions', 'previous_hash', 'nonce', 'authority_signature',
+                 'authority', 'version', 'merkle_root', 'hash')
+
+    def __init__(self, index, transactions, previous_hash, nonce=0, authority_signature=None, timestamp=None, hash=None,
+                 merkle_root=None, version=VERSION, authority=None):
         """
         Initialize a new block in the blockchain.
 
@@ -21,6 +33,9 @@ class Block:
             authority_signature (bytes): The signature of the authority node.
             timestamp (float): The time the block was created.
             hash (str): The hash of the block.
+            merkle_root (str): The Merkle root of the transaction hashes.
+            version (int): The block format version.
+            authority (str): Identifier of the authority node that signed the block.
         """
         self.index = index
         self.timestamp = timestamp if timestamp is not None else time.time()
@@ -28,8 +43,69 @@ class Block:
         self.previous_hash = previous_hash
         self.nonce = nonce
         self.authority_signature = authority_signature
+        self.authority = authority
+        self.version = version
+        if version >= 2:
+            self.merkle_root = merkle_root if merkle_root is not None else self.compute_merkle_root()
+        else:
+            self.merkle_root = None
         self.hash = hash if hash is not None else self.calculate_hash()
 
+    def compute_merkle_root(self):
+        """
+        Compute the Merkle root over the stored hashes of the block's transactions.
+
+        Returns:
+            str: The hex-encoded Merkle root.
+        """
+        return merkle_root([tx.hash for tx in self.transactions])
+
+    def header(self):
+        """
+        Return the fields covered by the block hash.
+
+        Returns:
+            dict: The block header.
+        """
+        return {
+            "version": self.version,
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "merkle_root": self.merkle_root,
+            "nonce": self.nonce
+        }
+
+    @staticmethod
+    def header_prefix(header):
+        """
+        Serialize every header field except the nonce.
+
+        The nonce is appended last, so miners can hash this prefix once and only
+        feed the changing nonce for each attempt.
+
+        Args:
+            header (dict): A block header as returned by header().
+
+        Returns:
+            bytes: The serialized header without the nonce.
+        """
+        fields = {key: value for key, value in header.items() if key != "nonce"}
+        return json.dumps(fields, sort_keys=True, separators=(',', ':')).encode() + b'|'
+
+    @classmethod
+    def hash_header(cls, header):
+        """
+        Hash a version 2 block header.
+
+        Args:
+            header (dict): A block header as returned by header().
+
+        Returns:
+            str: The SHA-256 hash of the header.
+        """
+        return hashlib.sha256(cls.header_prefix(header) + str(header["nonce"]).encode()).hexdigest()
+
     def calculate_hash(self):
         """
         Calculate the hash of the block.
@@ -37,35 +113,121 @@ class Block:
         Returns:
             str: The SHA-256 hash of the block's contents.
         """
+        if self.version >= 2:
+            return self.hash_header(self.header())
+        return self._calculate_legacy_hash()
+
+    def _calculate_legacy_hash(self):
+        """
+        Hash a version 1 block, which serializes every transaction.
+
+        Version 1 blocks were hashed before their transactions were marked
+        'Processed', so they are hashed here in their 'Pending' state.
+        """
         block_string = json.dumps({
             "index": self.index,
             "timestamp": self.timestamp,
-            "transactions": [tx.__dict__ for tx in self.transactions],
+            "transactions": [dict(tx.to_dict(), state='Pending') for tx in self.transactions],
             "previous_hash": self.previous_hash,
             "nonce": self.nonce
         }, sort_keys=True).encode()
 
         return hashlib.sha256(block_string).hexdigest()
 
-    def mine_block(self, difficulty):
+    def is_valid(self):
+        """
+        Check that the stored hash (and Merkle root) match the block's contents.
+
+        Returns:
+            bool: True if the block has not been tampered with.
+        """
+        if self.version >= 2 and self.merkle_root != self.compute_merkle_root():
+            return False
+        return self.hash == self.calculate_hash()
+
+    def mine_block(self, difficulty, engine=None):
         """
         Mine the block by finding a hash that meets the difficulty criteria.
 
         Args:
             difficulty (int): The number of leading zeros required in the block's hash.
+            engine (MiningEngine, optional): Search the nonces on its worker processes instead of this thread.
+
+        Returns:
+            bool: True once mined; False if the engine's search was cancelled.
         """
         target = '0' * difficulty
+        if self.hash.startswith(target):
+            return True
+        if self.version < 2:
+            while not self.hash.startswith(target):
+                self.nonce += 1
+                self.hash = self.calculate_hash()
+            return True
+        if engine is not None:
+            return engine.mine(self, difficulty)
+
+        # Hash the fixed part of the header once and only feed the nonce per attempt
+        midstate = hashlib.sha256(self.header_prefix(self.header()))
         while not self.hash.startswith(target):
             self.nonce += 1
-            self.hash = self.calculate_hash()
+            attempt = midstate.copy()
+            attempt.update(str(self.nonce).encode())
+            self.hash = attempt.hexdigest()
+        return True
+
+    def get_merkle_proof(self, tx_hash):
+        """
+        Build an inclusion proof for one of the block's transactions.
 
-    def sign_block(self, private_key):
+        Args:
+            tx_hash (str): The hash of the transaction.
+
+        Returns:
+            list: The Merkle proof, or None if the transaction is not in this block.
+        """
+        tx_hashes = [tx.hash for tx in self.transactions]
+        if self.version < 2 or tx_hash not in tx_hashes:
+            return None
+        return merkle_proof(tx_hashes, tx_hashes.index(tx_hash))
+
+    @classmethod
+    def verify_inclusion(cls, tx_hash, proof, header, block_hash):
+        """
+        Verify that a transaction is included in a block using only the block header.
+
+        Args:
+            tx_hash (str): The hash of the transaction.
+            proof (list): The Merkle proof from get_merkle_proof().
+            header (dict): The block header from header().
+            block_hash (str): The expected hash of the block.
+
+        Returns:
+            bool: True if the header hashes to block_hash and the proof leads to its Merkle root.
+        """
+        if header.get("version", 1) < 2 or cls.hash_header(header) != block_hash:
+            return False
+        return verify_merkle_proof(tx_hash, proof, header["merkle_root"])
+
+    def sign_block(self, private_key, executor=None, authority=None):
         """
         Sign the block with the authority's private key.
 
         Args:
             private_key (rsa.RSAPrivateKey): The private key of the authority node.
+            executor (CryptoExecutor, optional): Sign in a worker process instead of on this thread.
+            authority (str, optional): Identifier of the signing node, recorded in the block.
         """
+        if authority is not None:
+            self.authority = authority
+        if executor is not None:
+            private_key_pem = private_key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=serialization.NoEncryption()
+            )
+            self.authority_signature = executor.sign(private_key_pem, self.hash.encode())
+            return
         self.authority_signature = private_key.sign(
             self.hash.encode(),
             padding.PSS(
@@ -75,16 +237,23 @@ class Block:
             hashes.SHA256()
         )
 
-    def verify_signature(self, public_key):
+    def verify_signature(self, public_key, executor=None):
         """
         Verify the block's signature with the authority's public key.
 
         Args:
             public_key (rsa.RSAPublicKey): The public key of the authority node.
+            executor (CryptoExecutor, optional): Verify in a worker process instead of on this thread.
 
         Returns:
             bool: True if the signature is valid, False otherwise.
         """
+        if executor is not None:
+            public_key_pem = public_key.public_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PublicFormat.SubjectPublicKeyInfo
+            )
+            return executor.verify(public_key_pem, self.authority_signature, self.hash.encode())
         try:
             public_key.verify(
                 self.authority_signature,
@@ -106,7 +275,7 @@ class Block:
         Returns:
             dict: The block's data as a dictionary.
         """
-        return {
+        block_data = {
             "index": self.index,
             "timestamp": self.timestamp,
             "transactions": [tx.to_dict() for tx in self.transactions],
@@ -114,16 +283,28 @@ class Block:
             "nonce": self.nonce,
             "hash": self.hash
         }
+        if self.version >= 2:
+            block_data["version"] = self.version
+            block_data["merkle_root"] = self.merkle_root
+        if self.authority_signature is not None:
+            block_data["authority"] = self.authority
+            block_data["authority_signature"] = base64.b64encode(self.authority_signature).decode()
+        return block_data
 
     @classmethod
     def from_dict(cls, block_data):
         """Create a Block object from a dictionary."""
         transactions = [Transaction.from_dict(tx) for tx in block_data['transactions']]
+        signature = block_data.get('authority_signature')
         return cls(
             index=block_data['index'],
             transactions=transactions,
             previous_hash=block_data['previous_hash'],
             nonce=block_data['nonce'],
             timestamp=block_data['timestamp'],
-            hash=block_data['hash']
+            hash=block_data['hash'],
+            merkle_root=block_data.get('merkle_root'),
+            version=block_data.get('version', 1),
+            authority_signature=base64.b64decode(signature) if signature else None,
+            authority=block_data.get('authority')
         )
@@ -7,54 +7,402 @@ from app.DID import DID
 from cryptography.hazmat.primitives.asymmetric import rsa
 import threading
 import time
-from app.balance import BalanceManager
+from app.balance import BalanceManager, InsufficientBalanceError
+from app.storage import BlockLog, block_log_class, open_block_log, convert_block_log
+from app.lazy_chain import LazyChain
+from app.columns import ChainColumns
+from app.chain_index import ChainIndex
+from app.time_index import TimeIndex, period_bounds
+from app.rollups import EmissionRollups
+from app.explorer import ChainExplorer
+from app.producer import BlockProducer
+from app.validation import ChainValidator
+from app.signature_audit import SignatureAuditor
+from app.authority import AuthorityScheduler, load_authority_keys, load_public_key, public_key_pem, save_authority_keys
+from app.mempool import Mempool, MempoolError
+from app.crypto_executor import CryptoBusyError
+from app.state_snapshot import StateSnapshot, STATE_OPERATION, STATE_RECIPIENT, registration_data
+from concurrent.futures import Future
+from app.storage import read_json, write_json_atomic
 from flask import flash 
+from collections import namedtuple
+
+# The committed head as seen by readers: replaced as a whole after every commit
+ChainHead = namedtuple('ChainHead', ['height', 'tip_hash'])
+
+# Fixed, so that independently created nodes share the same genesis block and can sync
+GENESIS_TIMESTAMP = 0.0
 
 class Blockchain:
-    def __init__(self, filename='blockchain.json'):
+    def __init__(self, filename='blockchain.json', format='json', authority_nodes=None, crypto_executor=None,
+                 local_authorities=None):
+        """
+        Open (or create) a blockchain.
+
+        Args:
+            filename (str): Path of the legacy chain file; the block log and sidecars are stored next to it.
+            format (str): On-disk format of the block log, 'json' (JSON Lines) or 'binary' (memory-mapped).
+            authority_nodes (dict, optional): Node identifiers mapped to public keys, known before the
+                startup validation audits block signatures. They are added to the keys saved with
+                the chain, so later starts know them without being told again.
+            crypto_executor (CryptoExecutor, optional): Worker pool that signs sealed blocks and
+                verifies signatures in audits, shared with the web process's key derivation.
+            local_authorities (dict, optional): Node identifiers mapped to the private keys of the
+                authorities this process signs for.
+        """
         self.chain = []
-        self.current_transactions = []  # List to hold current transactions
-        self.authority_nodes = {}  # Map of node identifiers to public keys
+        self.mempool = Mempool(on_evict=self._on_evict)  # Pending transactions by hash, in sealing order
         self.filename = filename
-        self.balance_manager = BalanceManager()  # Initialize balance manager
+        self.authority_nodes = load_authority_keys(self._sidecar_filename('authorities'))  # Node identifiers -> public keys
+        self.local_authorities = {}  # Node identifiers this process signs for -> private keys
+        self.scheduler = AuthorityScheduler(self)  # Assigns block heights to authorities
+        for node_id, public_key in (authority_nodes or {}).items():
+            self.add_authority(node_id, public_key)
+        for node_id, private_key in (local_authorities or {}).items():
+            self.add_authority(node_id, self.authority_nodes.get(node_id) or private_key.public_key(), private_key)
+        self.storage = open_block_log(self._log_filename(filename, format), format)  # Append-only block log
+        self.index = ChainIndex()  # Lookups by sender, recipient, operation and tx hash
+        self.balance_manager = BalanceManager()  # Balances materialized from committed blocks
+        self.time_index = TimeIndex()  # Block heights by timestamp
+        self.rollups = EmissionRollups()  # Emission totals per day, month and tax period
+        self.snapshot_interval = 100  # Blocks between index and balance snapshots
+        self.state_interval = 1000  # Blocks between state snapshots committed to the chain
+        self.state = None  # Latest StateSnapshot of this chain
+        self.base_state = None  # StateSnapshot the chain was bootstrapped from, if any
+        self._emissions = None  # EmissionsAnalytics, created on first use
+        self.producer = BlockProducer(self)  # Seals pending transactions into blocks
+        self.validator = ChainValidator()  # Parallel hash and link verification
+        self.crypto_executor = crypto_executor  # Shared pool for RSA signing and verification, if any
+        self.auditor = SignatureAuditor(executor=crypto_executor)  # Batched authority signature verification
+        self.explorer = ChainExplorer(self)  # Paginated block and transaction listings
+        self.head = ChainHead(0, None)  # Last fully committed block, published after the derived state
+        # Single writer: sealing, committing and compacting blocks hold the commit lock.
+        # Queuing only takes the pending lock, so request threads never wait on a commit.
+        self._commit_lock = threading.RLock()
+        self._pending_lock = threading.RLock()
+        self._sealing = []  # Batch taken from the pending pool but not yet committed
+        self._sealing_height = 0  # Height of the block the batch is sealed into
+        self.commit_hooks = []  # Callables run with each block once it is committed
         self.load_blockchain()
 
+    @staticmethod
+    def _log_filename(filename, format='json'):
+        """Return the path of the append-only block log that backs filename."""
+        return os.path.splitext(filename)[0] + block_log_class(format).EXTENSION
+
+    def _sidecar_filename(self, name, extension='json'):
+        """Return the path of a sidecar file (snapshot, checkpoint...) stored next to the chain."""
+        return f"{os.path.splitext(self.filename)[0]}.{name}.{extension}"
+
     
     def create_genesis_block(self):
         """Create the genesis block and add it to the blockchain."""
-        genesis_block = Block(0, [], "0", nonce=0)
-        self.chain.append(genesis_block)
-        self.store_blockchain()
+        genesis_block = Block(0, [], "0", nonce=0, timestamp=GENESIS_TIMESTAMP)
+        self._commit_block(genesis_block)
         print("Genesis block created.")
 
+    def _commit_block(self, block, snapshot=True):
+        """
+        Append a block to the chain and the block log, and fold it into the derived state.
+
+        Args:
+            block (Block): The block to commit at height len(self.chain).
+            snapshot (bool): Save the snapshots when the block falls on the snapshot interval.
+
+        Returns:
+            StateSnapshot: The state captured after this block, if it completes a
+                state interval; otherwise None.
+        """
+        state = None
+        with self._commit_lock:
+            self.chain.append(block)  # Appends the record to the block log
+            self.index.add_block(block)
+            self.balance_manager.apply_block(block)
+            self.time_index.add_block(block)
+            self.rollups.add_block(block)
+            self.head = ChainHead(len(self.chain), block.hash)
+            if snapshot and block.index % self.snapshot_interval == 0:
+                self.save_snapshots()
+            for transaction in block.transactions:
+                if transaction.operation == STATE_OPERATION:
+                    self._check_state_commitment(transaction, block)
+            if (block.index + 1) % self.state_interval == 0:
+                state = self.save_state()
+            for hook in self.commit_hooks:
+                hook(block)
+        self.producer.on_commit(block)
+        return state
+
+    def save_snapshots(self):
+        """Append what changed since the last snapshot to the column, index, balance and rollup logs."""
+        self.chain.columns.save(self._sidecar_filename('columns', 'log'))
+        self.index.save(self._sidecar_filename('index', 'log'))
+        self.balance_manager.save(self._sidecar_filename('balances', 'log'))
+        self.rollups.save(self._sidecar_filename('rollups', 'log'))
+
+    def save_state(self):
+        """
+        Capture the state at the tip and write it next to the chain.
+
+        Returns:
+            StateSnapshot: The new snapshot, also kept as self.state.
+        """
+        with self._commit_lock:
+            self.state = StateSnapshot.capture(self, self.state)
+            self.state.save(self._sidecar_filename('state'))
+        return self.state
+
+    def _load_state(self):
+        """Return the saved state snapshot if it is still part of the chain, else the base state."""
+        state = StateSnapshot.load(self._sidecar_filename('state'))
+        if state is not None and self.chain.base < state.height <= len(self.chain) \
+                and self.chain[state.height - 1].hash == state.tip_hash:
+            return state
+        return self.base_state
+
+    def _check_state_commitment(self, transaction, block):
+        """Warn when a committed state hash differs from the state this node computed."""
+        state = self.state
+        data = transaction.data if isinstance(transaction.data, dict) else {}
+        if state is not None and data.get('height') == state.height and data != state.commitment():
+            print(f"Warning: block {block.index} commits a state at height {state.height} "
+                  f"that differs from ours ({state.state_hash}).")
+
+    def committed_state(self):
+        """
+        Return the latest state snapshot whose commitment has been sealed into the chain.
+
+        Returns:
+            tuple: (StateSnapshot, height of the block holding its commitment), or
+                (None, None) if the latest snapshot is not committed yet.
+        """
+        state = self.state
+        if state is None:
+            return None, None
+        commitment = state.commitment()
+        for posting in reversed(self.index.operation_postings(STATE_OPERATION)):
+            if posting[0] < state.height:
+                break
+            if self.get_transaction(posting).data == commitment:
+                return state, posting[0]
+        return None, None
+
+    def bootstrap(self, state, anchor, blocks):
+        """
+        Start this node from a state snapshot instead of the full history.
+
+        The chain keeps the anchor block (the last block the snapshot covers) and the
+        blocks after it; balances, users and DIDs from before the anchor come from
+        the snapshot. Checking the snapshot against the chain is the caller's job,
+        see BlockSync.bootstrap().
+
+        Args:
+            state (StateSnapshot): The state after the anchor block.
+            anchor (Block): The block at state.height - 1.
+            blocks (list): Validated blocks from state.height onwards.
+
+        Raises:
+            ValueError: If this node already holds blocks after genesis, or the
+                anchor does not match the snapshot.
+        """
+        with self._commit_lock:
+            if len(self.chain) > 1 or self.base_state is not None:
+                raise ValueError("Only a new node, holding nothing but the genesis block, can bootstrap.")
+            if anchor.index != state.height - 1 or anchor.hash != state.tip_hash:
+                raise ValueError("The anchor block is not the tip of the state snapshot.")
+            for name, extension in (('columns', 'log'), ('index', 'log'), ('balances', 'log'),
+                                    ('rollups', 'log'), ('checkpoint', 'json'), ('state', 'json')):
+                if os.path.exists(self._sidecar_filename(name, extension)):
+                    os.remove(self._sidecar_filename(name, extension))
+            state.save(self._sidecar_filename('base'))
+            self.storage.rewrite([anchor.to_dict()])
+            self.load_blockchain()
+            self.import_blocks(blocks)
+        print(f"Bootstrapped from the state at height {state.height} and {len(blocks)} later blocks.")
+
     def store_blockchain(self):
-        """Save the blockchain to a file."""
-        with open(self.filename, 'w') as f:
-            json.dump([block.to_dict() for block in self.chain], f, indent=4)
+        """Compact the block log by rewriting it from the in-memory chain."""
+        with self._commit_lock:
+            self.storage.rewrite(self.chain.read_data(height) for height in range(self.chain.base, len(self.chain)))
+            self.chain.reload()
 
     def load_blockchain(self):
-        """Load the blockchain from a file, or create a genesis block if the file is empty or missing."""
-        if os.path.exists(self.filename):
-            try:
-                with open(self.filename, 'r') as f:
-                    chain_data = json.load(f)
-                    if chain_data:
-                        self.chain = [Block.from_dict(block_data) for block_data in chain_data]
-                        print(f"Blockchain loaded from {self.filename}.")
-                    else:
-                        print("Blockchain file is empty. Initializing with a genesis block.")
-                        self.create_genesis_block()
-            except (json.JSONDecodeError, IOError) as e:
-                print(f"Error loading blockchain: {e}. Initializing with a genesis block.")
-                self.create_genesis_block()
+        """Load the blockchain from the block log, or create a genesis block if the log is empty or missing."""
+        if not self.storage.exists():
+            self.migrate_legacy_file()
+
+        # A bootstrapped chain starts at the anchor block of its base state
+        self.base_state = StateSnapshot.load(self._sidecar_filename('base'))
+        if self.base_state is not None and not self.storage.load_offsets():
+            print("Bootstrap did not complete; starting over from genesis.")
+            os.remove(self._sidecar_filename('base'))
+            self.base_state = None
+        base = self.base_state.height - 1 if self.base_state is not None else 0
+
+        self.chain = LazyChain(self.storage, base=base)  # Only record offsets are read here
+        self.chain.columns = ChainColumns.load(self._sidecar_filename('columns', 'log'), self.chain)
+        self._load_derived_state()
+        if self.chain:
+            self.head = ChainHead(len(self.chain), self.index.tip_hash)
+            print(f"Blockchain loaded from {self.storage.filename}.")
         else:
-            print("Blockchain file not found. Initializing with a genesis block.")
+            print("Blockchain log is empty. Initializing with a genesis block.")
             self.create_genesis_block()
+        if self.chain.columns.snapshot_height != self.chain.columns.height \
+                or self.index.snapshot_height != self.index.height \
+                or self.balance_manager.snapshot_height != self.balance_manager.height \
+                or self.rollups.snapshot_height != self.rollups.height:
+            self.save_snapshots()
+        self.state = self._load_state()
+
+        # Verify whatever was appended since the last trusted checkpoint
+        report = self.validate(since_checkpoint=True)
+        if not report.valid:
+            print(f"Warning: block {report.first_invalid} is invalid: {report.reason}")
+
+    def _load_derived_state(self):
+        """Load the index, balances and rollups from their snapshots and catch them up with the chain."""
+        self.index = ChainIndex.load(self._sidecar_filename('index', 'log'), self.chain)
+        self.balance_manager = BalanceManager.load(self._sidecar_filename('balances', 'log'), self.chain, self.base_state)
+        self.time_index = TimeIndex.load(self.chain)
+        self.rollups = EmissionRollups.load(self._sidecar_filename('rollups', 'log'), self.chain, self.index)
+
+    def truncate(self, height):
+        """
+        Drop every block from height onwards, e.g. to switch to a peer's fork.
+
+        The index and balances are restored from the newest snapshot that is still
+        part of the chain and replayed from the columns, so no block is decoded.
+
+        Args:
+            height (int): Number of blocks to keep; at least 1, the genesis block (or
+                the anchor block of a bootstrapped chain) stays.
+
+        Returns:
+            list: The removed blocks, in chain order.
+        """
+        if height <= self.chain.base:
+            raise ValueError(f"Blocks up to height {self.chain.base} cannot be removed.")
+        if height < 1:
+            raise ValueError("The genesis block cannot be removed.")
+        with self._commit_lock:
+            removed = [self.chain[h] for h in range(height, len(self.chain))]
+            if not removed:
+                return removed
+            self.storage.truncate(height - self.chain.base)
+            self.chain.reload()
+            self.chain.columns.truncate(height)
+            self._load_derived_state()
+            self.head = ChainHead(len(self.chain), self.last_block.hash)
+            if self.state is not None and self.state.height > height:
+                self.state = self._load_state()
+            self.save_snapshots()
+        print(f"Truncated the chain to {height} blocks ({len(removed)} removed).")
+        return removed
+
+    def import_blocks(self, blocks):
+        """
+        Commit blocks produced elsewhere, e.g. received from a peer.
+
+        The blocks must already have been validated; only their position is checked.
+        Snapshots are saved once after the batch rather than every snapshot_interval blocks.
+
+        Args:
+            blocks (list): Consecutive blocks, the first for height len(self.chain).
+
+        Raises:
+            ValueError: If a block does not extend the current tip.
+        """
+        with self._commit_lock:
+            height = len(self.chain)
+            try:
+                for block in blocks:
+                    if block.index != len(self.chain) or block.previous_hash != self.last_block.hash:
+                        raise ValueError(f"Block {block.index} does not extend the chain at height {len(self.chain)}.")
+                    with self._pending_lock:
+                        self.mempool.remove_many(block.transactions)
+                    self._commit_block(block, snapshot=False)
+            finally:
+                if len(self.chain) // self.snapshot_interval > height // self.snapshot_interval:
+                    self.save_snapshots()
+
+    def import_block(self, block):
+        """Commit one block produced elsewhere; see import_blocks()."""
+        self.import_blocks([block])
+
+    def migrate_legacy_file(self):
+        """
+        One-time migration from the legacy pretty-printed JSON array file to the block log.
+
+        A binary log is filled from the JSON Lines log instead when one exists.
+        The source file is left untouched; once the log exists it is no longer read.
+
+        Returns:
+            int: The number of blocks migrated.
+        """
+        json_log = BlockLog(self._log_filename(self.filename))
+        if self.storage.FORMAT != json_log.FORMAT and json_log.exists():
+            count = convert_block_log(json_log, self.storage)
+            print(f"Converted {count} blocks from {json_log.filename} to {self.storage.filename}.")
+            return count
+        if self.filename == self.storage.filename or not os.path.exists(self.filename):
+            return 0
+        try:
+            with open(self.filename, 'r') as f:
+                chain_data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error reading legacy blockchain file: {e}. Skipping migration.")
+            return 0
+        if not chain_data:
+            return 0
+        self.storage.rewrite(chain_data)
+        print(f"Migrated {len(chain_data)} blocks from {self.filename} to {self.storage.filename}.")
+        return len(chain_data)
+
+    @property
+    def current_transactions(self):
+        """The pending transactions in sealing order (a copy of the mempool's contents)."""
+        return self.mempool.transactions()
+
+    def mempool_metrics(self):
+        """Return the mempool's pending count, bytes, oldest age and counters."""
+        return self.mempool.metrics()
+
+    def _on_evict(self, transaction):
+        """Fail the Future of a transaction the mempool evicted to stay within its caps."""
+        self.producer.discard(transaction, MempoolError("Transaction was evicted from the full mempool."))
 
     @property
     def last_block(self):
         return self.chain[-1] if self.chain else None
 
+    def snapshot(self):
+        """
+        Return the committed head for a consistent, lock-free read.
+
+        Blocks, postings and balances are only ever appended or replaced as a
+        whole, and the head is published after all of them, so everything up to
+        the returned height is complete. Bound chain reads by head.height to see
+        one committed state even while newer blocks are being appended.
+
+        Returns:
+            ChainHead: (height, tip_hash) of the last fully committed block.
+        """
+        return self.head
+
+    def get_transaction(self, posting):
+        """
+        Resolve an index posting to the committed transaction it points at.
+
+        Args:
+            posting (tuple): (height, position) as stored in the ChainIndex.
+
+        Returns:
+            Transaction: The transaction at that position.
+        """
+        height, position = posting
+        return self.chain[height].transactions[position]
+
         
     def add_transaction(self, sender, recipient, operation, data):
         """
@@ -75,115 +423,325 @@ class Blockchain:
             recipient=recipient,
             data=data
         )
-        self.current_transactions.append(transaction)
+        self.queue_transaction(transaction)
         return transaction
 
-    def add_block(self, transaction):
+    def add_spend_transaction(self, sender, recipient, operation, data):
         """
-        Add a new block to the blockchain with a single transaction.
+        Add a transaction that debits an account, if the account can afford it.
+
+        The balance is checked and the transaction queued under the pending lock,
+        against the committed balance minus what the account's pending transactions
+        already spend, so concurrent requests cannot overdraw it between two blocks.
+        An UNSTAKE is checked against the recipient's stake instead.
 
         Args:
-            transaction (Transaction): The transaction to include in the block.
+            sender (str): The sender's username or DID.
+            recipient (str): The recipient's username or DID.
+            operation (str): A token operation, e.g. 'TOKEN_TRANSFER' or 'STAKE'.
+            data (dict): Transaction data, including the 'amount' spent.
+
+        Returns:
+            Transaction: The created transaction.
+
+        Raises:
+            InsufficientBalanceError: If the amount exceeds what the account can still spend.
         """
-        # Calculate the hash of the last block
-        previous_hash = self.last_block.hash if self.last_block else "0"
-        
-        # Create a new block with the transaction
-        new_block = Block(len(self.chain), [transaction], previous_hash, datetime.now().isoformat())
-        
-        # Add the block to the chain
-        self.chain.append(new_block)
-        
-        # Update the state of the transaction to 'Processed'
-        transaction.state = 'Processed'
-        
-        # Save the blockchain state
-        self.store_blockchain()
+        stake = operation == 'UNSTAKE'
+        account = recipient if stake else sender
+        with self._pending_lock:
+            spendable = self._spendable(account, stake)
+            if spendable < data.get('amount', 0):
+                raise InsufficientBalanceError(
+                    f"Insufficient {'stake' if stake else 'balance'}: {account} can spend "
+                    f"{spendable}, {data.get('amount', 0)} needed.")
+            return self.add_transaction(sender, recipient, operation, data)
+
+    def spendable_balance(self, user_did, stake=False):
+        """
+        Return the committed balance (or stake) of a user minus what their pending
+        transactions will take from it.
+        """
+        with self._pending_lock:
+            return self._spendable(user_did, stake)
+
+    def _spendable(self, account, stake=False):
+        # Unstakes are sent by the pool; everything else is debited from its sender
+        sender = 'STAKE_POOL' if stake else account
+        pending = self.mempool.from_sender(sender)
+        if self.balance_manager.height <= self._sealing_height:
+            # The batch being sealed is not folded into the balances yet
+            pending += [tx for tx in self._sealing if tx.sender == sender]
+        manager = self.balance_manager
+        committed = manager.get_stake(account) if stake else manager.get_balance(account)
+        return committed - manager.pending_debits(account, pending, stake)
+
+    def queue_transaction(self, transaction):
+        """
+        Add an already built transaction to the mempool.
+
+        A transaction that is already pending or committed is not queued again.
+
+        Args:
+            transaction (Transaction): The transaction to queue.
+
+        Returns:
+            Future: Resolves to the Block that includes the transaction.
+
+        Raises:
+            MempoolError: If the mempool refuses the transaction.
+        """
+        size = self.producer.transaction_size(transaction)
+        with self._pending_lock:
+            posting = self.index.locate(transaction.hash)
+            if posting is not None:
+                future = Future()
+                future.set_result(self.chain[posting[0]])
+                return future
+            if not self.mempool.add(transaction, size):
+                return self.producer.future_for(transaction)
+            # Tracked under the same lock so a batch can never seal an untracked transaction
+            return self.producer.track(transaction, size)
+
+    def wait_for_transaction(self, transaction, timeout=None):
+        """
+        Wait until a queued transaction has been committed.
+
+        Args:
+            transaction (Transaction): A transaction returned by add_transaction.
+            timeout (float, optional): Seconds to wait before raising TimeoutError.
+
+        Returns:
+            Block: The block that includes the transaction.
+        """
+        return self.producer.wait(transaction, timeout)
+
+    def commit_transactions(self, transactions):
+        """
+        Queue a batch of transactions and seal blocks until the pending pool is drained.
+
+        Used by bulk ingestion, so each chunk of a file is committed as full blocks
+        instead of waiting for the producer's deadline. Transactions already on the
+        chain are skipped rather than queued again.
+
+        Args:
+            transactions (list): The transactions to commit.
+
+        Returns:
+            dict: "refused" (position -> reason the mempool gave), "duplicates" (positions
+                already committed), "pending" (positions still waiting, e.g. for
+                another authority's slot) and "blocks" (number of blocks sealed).
+        """
+        refused, duplicates = {}, []
+        for position, transaction in enumerate(transactions):
+            if self.index.locate(transaction.hash) is not None:
+                duplicates.append(position)
+                continue
+            try:
+                self.queue_transaction(transaction)
+            except MempoolError as e:
+                refused[position] = str(e)
+        blocks = 0
+        while self.mine_block() is not None:
+            blocks += 1
+        skipped = set(refused).union(duplicates)
+        pending = [position for position, transaction in enumerate(transactions)
+                   if position not in skipped and self.index.locate(transaction.hash) is None]
+        return {"refused": refused, "duplicates": duplicates, "pending": pending, "blocks": blocks}
+
+    def queue_registration(self, username, transactions):
+        """
+        Queue the transactions that register a user, unless the username is taken.
+
+        The availability check covers committed, pending and currently sealing
+        registrations and runs under the pending lock, so two concurrent requests cannot both claim
+        the same username. The transactions are queued all or nothing and linked in the
+        mempool, so a full pool evicts them together.
+
+        Args:
+            username (str): The username being registered.
+            transactions (list): The transactions to queue, registration first.
+
+        Returns:
+            bool: True if the transactions were queued, False if the username is taken.
+        """
+        with self._pending_lock:
+            if not self.is_username_available(username) or any(
+                    tx.sender == username and tx.operation in ('USER_REGISTRATION', 'STORE_DID')
+                    for tx in self.mempool.from_sender(username) + self._sealing):
+                return False
+            queued = []
+            try:
+                for transaction in transactions:
+                    self.queue_transaction(transaction)
+                    queued.append(transaction)
+            except MempoolError as e:
+                # All or nothing: do not leave a credit behind without its registration
+                for transaction in queued:
+                    self.mempool.remove(transaction)
+                    self.producer.discard(transaction, e)
+                raise
+            # ...and keep it that way: the mempool evicts them together
+            self.mempool.link(transactions)
+        return True
+
+    def add_block(self, transaction=None, authority=None):
+        """
+        Seal pending transactions into a new block.
+
+        Without an argument the oldest pending transactions are drained into one block,
+        up to the producer's transaction and byte limits. Passing a transaction seals a
+        block containing only that transaction.
+
+        Args:
+            transaction (Transaction, optional): A single transaction to include in the block.
+            authority (str, optional): A node of local_authorities that signs the block.
+
+        Returns:
+            Block: The new block, or None if there was nothing to seal.
+        """
+        with self._commit_lock:
+            with self._pending_lock:
+                if transaction is not None:
+                    batch = [transaction]
+                else:
+                    batch = self.producer.select_batch(self.mempool.head(self.producer.max_transactions))
+                    if not batch:
+                        return None
+                self.mempool.remove_many(batch)
+                self._sealing = batch
+                self._sealing_height = len(self.chain)
+
+            # Calculate the hash of the last block
+            previous_hash = self.last_block.hash if self.last_block else "0"
+
+            # Create a new block with the transactions
+            new_block = Block(len(self.chain), batch, previous_hash)
+
+            # Update the state of the transactions to 'Processed'
+            for tx in batch:
+                tx.state = 'Processed'
+
+            if authority is not None:
+                self._sign_block(new_block, authority)
+
+            # Add the block to the chain, the block log and the derived state
+            try:
+                state = self._commit_block(new_block)
+            finally:
+                with self._pending_lock:
+                    self._sealing = []
+
+            if state is not None:
+                # Commit the snapshot's hash in a later block, so new nodes can trust it
+                try:
+                    self.queue_transaction(Transaction(
+                        operation=STATE_OPERATION, sender='SYSTEM', recipient=STATE_RECIPIENT,
+                        data=state.commitment()
+                    ))
+                except MempoolError as e:
+                    print(f"Could not queue the state commitment for height {state.height}: {e}")
 
-        print(f"Adding block with transaction: {transaction}")  # Debugging output
-        print(f"Current blockchain state: {self.chain}")  # Debugging output
-        
         return new_block
 
-    def add_civil_engineering_transaction(self, sender, recipient, materials_used, machinery_emissions, energy_consumption):
+    def add_civil_engineering_transaction(self, sender, recipient, materials_used=None, machinery_emissions=None,
+                                          energy_consumption=None, details=None):
         """
         Add a civil engineering transaction with specific metadata.
 
         Args:
             sender (str): The sender's DID.
             recipient (str): The recipient's DID.
-            materials_used (dict): Materials used in the project.
-            machinery_emissions (dict): Emissions from machinery.
-            energy_consumption (dict): Energy consumption data.
+            materials_used (dict, optional): Materials used in the project.
+            machinery_emissions (dict, optional): Emissions from machinery.
+            energy_consumption (dict, optional): Energy consumption data.
+            details (dict, optional): Fields common to every report, e.g. 'amount' (tCO2e),
+                'emission_source' or 'reporting_period'.
 
         Returns:
             Transaction: The created transaction.
         """
-        data = {
+        data = _emission_data(details, {
             'materials_used': materials_used,
             'machinery_emissions': machinery_emissions,
             'energy_consumption': energy_consumption
-        }
+        })
         return self.add_transaction(sender, recipient, 'CARBON_EMISSION', data)
 
-    def add_mechanical_engineering_transaction(self, sender, recipient, energy_usage, operation_hours, fuel_consumption):
+    def add_mechanical_engineering_transaction(self, sender, recipient, energy_usage=None, operation_hours=None,
+                                               fuel_consumption=None, details=None):
         """
         Add a mechanical engineering transaction with specific metadata.
 
         Args:
             sender (str): The sender's DID.
             recipient (str): The recipient's DID.
-            energy_usage (dict): Energy usage data.
-            operation_hours (dict): Hours of operation for processes.
-            fuel_consumption (dict): Fuel consumption data.
+            energy_usage (dict, optional): Energy usage data.
+            operation_hours (dict, optional): Hours of operation for processes.
+            fuel_consumption (dict, optional): Fuel consumption data.
+            details (dict, optional): Fields common to every report, see add_civil_engineering_transaction().
 
         Returns:
             Transaction: The created transaction.
         """
-        data = {
+        data = _emission_data(details, {
             'energy_usage': energy_usage,
             'operation_hours': operation_hours,
             'fuel_consumption': fuel_consumption
-        }
+        })
         return self.add_transaction(sender, recipient, 'CARBON_EMISSION', data)
 
-    def add_electronics_engineering_transaction(self, sender, recipient, power_usage, recycling_efforts):
+    def add_electronics_engineering_transaction(self, sender, recipient, power_usage=None, recycling_efforts=None,
+                                                details=None):
         """
         Add an electronics engineering transaction with specific metadata.
 
         Args:
             sender (str): The sender's DID.
             recipient (str): The recipient's DID.
-            power_usage (dict): Power usage data.
-            recycling_efforts (dict): Recycling efforts data.
+            power_usage (dict, optional): Power usage data.
+            recycling_efforts (dict, optional): Recycling efforts data.
+            details (dict, optional): Fields common to every report, see add_civil_engineering_transaction().
 
         Returns:
             Transaction: The created transaction.
         """
-        data = {
+        data = _emission_data(details, {
             'power_usage': power_usage,
             'recycling_efforts': recycling_efforts
-        }
+        })
         return self.add_transaction(sender, recipient, 'CARBON_EMISSION', data)
 
     def calculate_user_balance(self, user_did):
         """
-        Calculate the balance of a user based on their transactions.
+        Return the balance of a user from the materialized balance table.
 
         Args:
             user_did (str): The DID of the user.
 
         Returns:
-            float: The calculated balance of the user.
+            float: The balance of the user.
         """
-        balance = 0.0
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction.recipient == user_did:
-                    balance += transaction.data.get('amount', 0)
-                elif transaction.sender == user_did:
-                    balance -= transaction.data.get('amount', 0)
-        return balance
+        return float(self.balance_manager.get_balance(user_did))
+
+    def _sign_block(self, block, authority):
+        """Sign a sealed block for a local authority, in the crypto worker pool if there is one."""
+        private_key = self.local_authorities[authority]
+        if self.crypto_executor is not None:
+            try:
+                block.sign_block(private_key, executor=self.crypto_executor, authority=authority)
+                return
+            except CryptoBusyError:
+                pass  # The pool is saturated; sign here rather than stall the chain
+        block.sign_block(private_key, authority=authority)
+
+    def get_balance(self, user_did):
+        """Return the committed token balance of a user."""
+        return self.balance_manager.get_balance(user_did)
+
+    def get_stake(self, user_did):
+        """Return the amount a user currently has staked."""
+        return self.balance_manager.get_stake(user_did)
 
     def burn_tokens(self, user_id, amount):
         """
@@ -196,24 +754,21 @@ class Blockchain:
         Returns:
             bool: True if the burn was successful, False otherwise.
         """
-        user_balance = self.balance_manager.get_balance(user_id)
-        if user_balance >= amount:
-            self.balance_manager.update_balance(user_id, -amount)
-            
-            # Record the burn transaction
-            self.add_transaction(
+        try:
+            # Record the burn transaction; the balance is debited when its block commits
+            self.add_spend_transaction(
                 sender=user_id,
                 recipient="BURN",
                 operation="BURN",
                 data={"amount": amount}
             )
-            self.add_block()
-            
-            print(f"Burned {amount} tokens from user {user_id}.")
-            return True
-        else:
+        except InsufficientBalanceError:
             print(f"Failed to burn tokens: insufficient balance for user {user_id}.")
             return False
+        self.mine_block()
+
+        print(f"Burned {amount} tokens from user {user_id}.")
+        return True
 
     def get_user_data(self, username):
         """
@@ -225,21 +780,14 @@ class Blockchain:
         Returns:
             dict: A dictionary containing user-specific data, or None if the user is not found.
         """
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction.sender == username:
-                    # Deserialize the JSON string to a dictionary if needed
-                    if isinstance(transaction.data, str):
-                        transaction_data = json.loads(transaction.data)
-                    else:
-                        transaction_data = transaction.data
-                    
-                    return {
-                        'encrypted_secret_phrase': transaction_data.get('encrypted_secret_phrase'),
-                        'public_key': transaction_data.get('public_key'),
-                        'profession': transaction_data.get('profession')  # Include profession
-                    }
-        return None  # User not found
+        if self.base_state is not None and username in self.base_state.users:
+            return dict(self.base_state.users[username])  # Registered before the bootstrap
+
+        postings = self.index.sender_postings(username)
+        if not postings:
+            return None  # User not found
+
+        return registration_data(self.get_transaction(postings[0]))
 
     def is_username_available(self, username):
         """
@@ -251,13 +799,15 @@ class Blockchain:
         Returns:
             bool: True if the username is available, False otherwise.
         """
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction.sender == username and transaction.operation in ['USER_REGISTRATION', 'STORE_DID']:
-                    return False
-        return True
+        if self.base_state is not None \
+                and (username in self.base_state.users or username in self.base_state.dids):
+            return False
+        return not any(
+            self.index.sender_postings(username, operation)
+            for operation in ['USER_REGISTRATION', 'STORE_DID']
+        )
 
-    def add_user_to_blockchain(self, username, encrypted_secret, public_key):
+    def add_user_to_blockchain(self, username, encrypted_secret, public_key, secret_verifier=None):
         """
         Add a new user to the blockchain and generate a DID.
 
@@ -265,65 +815,108 @@ class Blockchain:
             username (str): The username of the new user.
             encrypted_secret (str): The encrypted secret phrase of the new user.
             public_key (str): The public key of the new user.
+            secret_verifier (str, optional): Salted hash of the secret phrase, checked at login.
         """
-        # Check if the username is available
-        if not self.is_username_available(username):
-            return False, f"Username '{username}' is already taken."
-
         transaction_data = {
             "encrypted_secret_phrase": encrypted_secret,
             "public_key": public_key
         }
+        if secret_verifier:
+            transaction_data["secret_verifier"] = secret_verifier
 
         # Create the user registration transaction
-        transaction = self.add_transaction(
+        transaction = Transaction(
+            operation='USER_REGISTRATION',
             sender=username,
             recipient='SYSTEM',
-            operation='USER_REGISTRATION',
             data=transaction_data
         )
 
+        # Queue it only if the username is still available
+        if not self.queue_registration(username, [transaction]):
+            return False, f"Username '{username}' is already taken."
+
         # Immediately mark the transaction as processed
         transaction.state = "Processed"
 
-        # Initialize the user's balance
-        self.balance_manager.initialize_user(username)
-
         # Add the block with the user registration transaction
-        self.add_block()  # This will include the transaction in the same block
+        self.mine_block()  # This will include the transaction in the same block
 
         return True, "Registration successful!"
 
+    def add_authority(self, node_id, public_key, private_key=None):
+        """
+        Register an authority node, and save its public key next to the chain.
+
+        Args:
+            node_id (str): The node's identifier.
+            public_key (rsa.RSAPublicKey or str): Key that verifies the node's block signatures, or its PEM.
+            private_key (rsa.RSAPrivateKey, optional): The node's signing key, if this
+                process produces blocks for it. It is kept in memory only.
+
+        Raises:
+            ValueError: If private_key does not match public_key.
+        """
+        public_key = load_public_key(public_key)
+        if private_key is not None and public_key_pem(private_key.public_key()) != public_key_pem(public_key):
+            raise ValueError(f"The private key of authority {node_id!r} does not match its public key.")
+        known = self.authority_nodes.get(node_id)
+        if known is None or public_key_pem(known) != public_key_pem(public_key):
+            self.authority_nodes[node_id] = public_key
+            save_authority_keys(self._sidecar_filename('authorities'), self.authority_nodes)
+        if private_key is not None:
+            self.local_authorities[node_id] = private_key
+
     def select_mining_node(self):
-        """Select the next authority node to mine a block."""
-        # Simple round-robin selection or other criteria
-        # For example, using a round-robin approach:
-        node_ids = list(self.authority_nodes.keys())
-        if not node_ids:
-            raise ValueError("No authority nodes available.")
-        # Select the next node based on the current chain length
-        return node_ids[len(self.chain) % len(node_ids)]
-
-    def start_mining(self, interval=600):
-        """Start the mining process with a fixed interval."""
-        def mine():
-            while True:
-                time.sleep(interval)
-                try:
-                    self.mine_block()
-                except Exception as e:
-                    print(f"Error during mining: {e}")
+        """Select the authority node whose slot is the next block."""
+        return self.scheduler.slot_owner(len(self.chain))
+
+    def start_mining(self, interval=None):
+        """
+        Start the block producer thread.
+
+        A block is sealed whenever the pending batch is full or its deadline passes.
+
+        Args:
+            interval (float, optional): Override the producer's deadline in seconds.
+        """
+        if interval is not None:
+            self.producer.max_delay = interval
 
-        mining_thread = threading.Thread(target=mine)
+        mining_thread = threading.Thread(target=self.producer.run)
         mining_thread.daemon = True
         mining_thread.start()
 
-    def mine_block(self):
-        """Mine a new block using the selected authority node."""
-        node_id = self.select_mining_node()
-        private_key = self.authority_nodes[node_id]  # Assuming you have a way to access the private key
-        self.add_block()
-        print(f"Block mined by authority node: {node_id}")
+    def mine_block(self, waited=0.0):
+        """
+        Seal the pending batch into a block signed by the authority of the next slot.
+
+        Without authority nodes the block is sealed unsigned.
+
+        Args:
+            waited (float): Seconds since the batch became due, used to skip
+                authorities that let their slot time out. Peers measure the wait
+                from the previous block, so it is capped at the time since then.
+
+        Returns:
+            Block: The new block, or None if nothing was pending or the slot
+                belongs to an authority this process does not sign for.
+        """
+        with self._commit_lock:
+            height = len(self.chain)
+            waited = max(0.0, min(waited, time.time() - self.last_block.timestamp))
+            node_id = self.scheduler.authority_for(height, waited)
+            if node_id is None:
+                return self.add_block()
+            if node_id not in self.local_authorities:
+                owner = self.scheduler.slot_owner(height)
+                if owner not in self.local_authorities:
+                    return None  # Another node's slot: its block arrives through sync
+                node_id = owner  # The owner of a slot may always seal it, e.g. when back online
+            block = self.add_block(authority=node_id)
+        if block is not None:
+            print(f"Block mined by authority node: {node_id}")
+        return block
 
     def create_user_did(self, user_identifier, user_public_key):
         """
@@ -364,11 +957,6 @@ class Blockchain:
         Returns:
             Transaction: The transaction created for storing the DID.
         """
-        # Check if the username is available
-        if not self.is_username_available(username):
-            flash(f"User '{username}' is already registered.", 'danger')
-            return None  # Or handle as needed
-
         # Create a DID document
         did_document = {
             "@context": "https://www.w3.org/ns/did/v1",
@@ -390,61 +978,121 @@ class Blockchain:
             data=json.dumps(did_document)  # Ensure the document is stored as a JSON string
         )
 
-        # Add the transaction to the current transactions list
-        self.current_transactions.append(did_transaction)
+        # Add the transaction to the current transactions list if the username is still available
+        if not self.queue_registration(username, [did_transaction]):
+            flash(f"User '{username}' is already registered.", 'danger')
+            return None  # Or handle as needed
 
         # Add this line to create a new block with the DID transaction
-        self.add_block()
+        self.mine_block()
 
         return did_transaction  # Return the transaction
     
     
     def find_did_in_blockchain(self, user_identifier):
         print(f"Searching for DID with user identifier: {user_identifier}")
-        for index, block in enumerate(self.chain):
-            print(f"Searching in block {index}")
-            for transaction in block.transactions:
-                print(f"Transaction: {transaction.to_dict()}")
-                if transaction.sender == user_identifier and transaction.operation == "STORE_DID":
-                    print(f"Found matching transaction: {transaction.to_dict()}")
-                    # Parse the JSON string stored in transaction.data
-                    return json.loads(transaction.data)  # Return the parsed JSON object
+        if self.base_state is not None and user_identifier in self.base_state.dids:
+            return dict(self.base_state.dids[user_identifier])
+        postings = self.index.sender_postings(user_identifier, "STORE_DID")
+        if postings:
+            transaction = self.get_transaction(postings[0])
+            print(f"Found matching transaction: {transaction.to_dict()}")
+            # Parse the JSON string stored in transaction.data
+            return json.loads(transaction.data)  # Return the parsed JSON object
         print("DID not found in blockchain")
         return None
     
 
-    def validate_chain(self, verbose=False):
+    def validate(self, since_checkpoint=False):
+        """
+        Validate the chain with the parallel validation engine, then audit the
+        authority signatures of the same range.
+
+        Args:
+            since_checkpoint (bool): Only verify blocks added after the last trusted
+                checkpoint. The checkpoint advances after every successful validation.
+
+        Returns:
+            ValidationReport: The outcome, including the height of the first bad block.
+        """
+        start = 0
+        checkpoint_filename = self._sidecar_filename('checkpoint')
+        if since_checkpoint:
+            checkpoint = read_json(checkpoint_filename)
+            if checkpoint and self.chain.base < checkpoint["height"] <= len(self.chain) \
+                    and self.chain[checkpoint["height"] - 1].hash == checkpoint["tip_hash"]:
+                start = checkpoint["height"]
+
+        report = self.validator.validate(self.chain, start)
+        if report.valid:
+            report = self.auditor.audit(self.chain, self.authority_nodes, start)
+        if report.valid and report.checked:
+            write_json_atomic(checkpoint_filename, {"height": len(self.chain), "tip_hash": self.last_block.hash})
+        return report
+
+    def validate_chain(self, verbose=False, since_checkpoint=False):
         """
         Validate the entire blockchain using stored data.
         :param verbose: If True, print detailed information during validation.
+        :param since_checkpoint: If True, only verify blocks added since the last trusted checkpoint.
         :return: True if valid, False if not
         """
-        for i in range(len(self.chain)):
-            current_block = self.chain[i]
-            
-            if verbose:
-                print(f"\nValidating block {i}:")
-                print(f"  Current block hash: {current_block.hash}")
-
-            # Check block hash
-            calculated_hash = current_block.calculate_hash()
-            if current_block.hash != calculated_hash:
-                print(f"Invalid hash in block {i}")
-                print(f"  Stored hash: {current_block.hash}")
-                print(f"  Calculated hash: {calculated_hash}")
-                return False
-
-            # Additional validation checks can be added here
+        report = self.validate(since_checkpoint=since_checkpoint)
+        if not report.valid:
+            print(f"Invalid block {report.first_invalid}: {report.reason}")
+            return False
 
-        print("Blockchain is valid")
+        if verbose:
+            print(f"Blockchain is valid ({report.checked} blocks checked)")
         return True
 
+    def get_transaction_proof(self, tx_hash):
+        """
+        Build a Merkle inclusion proof for a committed transaction.
+
+        The transaction is located through the index, and only its block is read
+        from the block log.
+
+        Args:
+            tx_hash (str): The hash of the transaction.
+
+        Returns:
+            dict: The block header, block hash and Merkle proof, or None if the
+                  transaction is unknown or sits in a legacy (version 1) block.
+        """
+        posting = self.index.locate(tx_hash)
+        if posting is None or posting[0] >= self.snapshot().height:
+            return None
+        block = self.chain[posting[0]]
+        proof = block.get_merkle_proof(tx_hash)
+        if proof is None:
+            return None
+        return {
+            "tx_hash": tx_hash,
+            "block_hash": block.hash,
+            "header": block.header(),
+            "proof": proof
+        }
+
+    @staticmethod
+    def verify_transaction_proof(proof):
+        """
+        Verify a proof returned by get_transaction_proof without loading the block.
+
+        Args:
+            proof (dict): The inclusion proof.
+
+        Returns:
+            bool: True if the transaction is committed under the block hash.
+        """
+        return Block.verify_inclusion(proof["tx_hash"], proof["proof"], proof["header"], proof["block_hash"])
+
     def is_valid_transaction(self, transaction):
         """
         Validate a transaction by comparing it with the original transaction data stored in the blockchain.
         """
-        original_tx = next((tx for block in self.chain for tx in block.transactions 
-                            if tx.get_transaction_id() == transaction.get_transaction_id()), None)
+        posting = self.index.locate(transaction.hash)
+        original_tx = self.get_transaction(posting) if posting else None
         
         if original_tx and original_tx.data != transaction.data:
             print(f"Transaction data mismatch: Original {original_tx.data}, Current {transaction.data}")
@@ -455,51 +1103,39 @@ class Blockchain:
         """
         Check if the blockchain is valid.
         """
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i-1]
-
-            # Check if the current block's hash is valid
-            if not current_block.is_valid():
-                print(f"Invalid hash in block {i}")
-                return False
-
-            # Check if the previous_hash field points to the previous block's hash
-            if current_block.previous_hash != previous_block.hash:
-                print(f"Invalid previous hash in block {i}")
-                return False
-
-            # Check if all transactions in the block are valid
-            for tx in current_block.transactions:
-                if not tx.is_valid():
-                    print(f"Invalid transaction in block {i}")
-                    return False
+        return self.validate().valid
 
-        return True
-
-    def pay_tax(self, payer, tax_authority, amount, tax_period):
+    def pay_tax(self, payer, tax_authority, amount=None, tax_period=None):
         """
         Record a tax payment transaction.
 
         Args:
             payer (str): The DID of the payer.
             tax_authority (str): The DID of the tax authority.
-            amount (float): The amount of tax paid.
-            tax_period (str): The tax period or reference.
+            amount (float, optional): The amount of tax paid. Defaults to the carbon tax
+                the payer still owes for tax_period, read from the emission rollups.
+            tax_period (str): The tax period or reference, e.g. '2024' or '2024-Q3'.
 
         Returns:
             Transaction: The created tax payment transaction.
-        """
-        if self.balance_manager.get_balance(payer) < amount:
-            raise ValueError("Insufficient balance to pay tax")
 
-        transaction = self.add_transaction(
+        Raises:
+            ValueError: If the balance is insufficient, or no amount was given and
+                none is due for tax_period.
+        """
+        if amount is None:
+            if tax_period is None:
+                raise ValueError("A tax period is needed to work out the tax due.")
+            amount = round(self.rollups.tax_due(payer, tax_period), 8)
+            if amount <= 0:
+                raise ValueError(f"No carbon tax is due for {tax_period}.")
+        transaction = self.add_spend_transaction(
             sender=payer,
             recipient=tax_authority,
             operation='TAX_PAYMENT',
             data={'amount': amount, 'tax_period': tax_period}
         )
-        self.add_block()
+        self.mine_block()
         return transaction
 
     def grant_tax_credit(self, recipient, amount, reason):
@@ -520,7 +1156,7 @@ class Blockchain:
             operation='TAX_CREDIT',
             data={'amount': amount, 'reason': reason}
         )
-        self.add_block()
+        self.mine_block()
         return transaction
 
     def record_tax_audit(self, audited_user, findings, adjustments):
@@ -541,24 +1177,121 @@ class Blockchain:
             operation='TAX_AUDIT',
             data={'findings': findings, 'adjustments': adjustments}
         )
-        self.add_block()
+        self.mine_block()
         return transaction
 
-    def calculate_carbon_tax(self, user_did):
+    @property
+    def emissions(self):
+        """The EmissionsAnalytics engine over this chain (imports NumPy on first use)."""
+        if self._emissions is None:
+            from app.emissions import EmissionsAnalytics
+            self._emissions = EmissionsAnalytics(self)
+        return self._emissions
+
+    def calculate_carbon_tax(self, user_did, tax_period=None):
         """
         Calculate the total carbon tax for a user based on their reported emissions.
 
+        Looks the user's emissions up in the rollups, without decoding any report.
+
         Args:
             user_did (str): The DID of the user.
+            tax_period (str, optional): Only tax the reports of this period, e.g. '2024' or '2024-Q3'.
 
         Returns:
             float: The total carbon tax owed by the user.
         """
-        total_tax = 0.0
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction.sender == user_did and transaction.operation == 'CARBON_EMISSION':
-                    # Assuming a tax rate of $X per ton of CO2 emitted
-                    tax_rate = 10.0  # Example tax rate
-                    total_tax += transaction.data['amount'] * tax_rate
-        return total_tax
+        return self.rollups.carbon_tax(user_did, tax_period)
+
+    def carbon_tax_run(self, tax_period=None):
+        """
+        Calculate the carbon tax of every user who reported emissions.
+
+        Args:
+            tax_period (str, optional): Only tax the reports of this period.
+
+        Returns:
+            dict: User -> {"emissions": tCO2e, "tax": amount owed}.
+        """
+        return self.emissions.tax_run(tax_period)
+
+    def emission_totals(self, by='user', period='month', within=None):
+        """
+        Return emission totals per user, profession or period; see EmissionsAnalytics.totals().
+
+        Totals of every period (by='period' without within) come straight from the rollups.
+        """
+        if by == 'period' and within is None:
+            return self.rollups.series(period)
+        return self.emissions.totals(by, period, within)
+
+    def period_totals(self, period):
+        """
+        Return the emission totals of one period and the blocks sealed in it.
+
+        Args:
+            period (str): '2024', '2024-Q4', '2024-10' or '2024-10-31' (UTC).
+
+        Returns:
+            dict: The period's rollup ("transactions", "emissions" and the metrics)
+                and "heights", the [first, end) range of its blocks.
+
+        Raises:
+            ValueError: If period is not a valid label.
+        """
+        totals = self.rollups.totals(period)
+        totals["heights"] = list(self.heights_between(*period_bounds(period)))
+        return totals
+
+    def heights_between(self, start, end):
+        """
+        Return the heights of the blocks sealed between two Unix timestamps.
+
+        Args:
+            start (float): Inclusive.
+            end (float): Exclusive.
+
+        Returns:
+            tuple: The half-open [first, end) range of heights, found by bisection.
+        """
+        return self.time_index.heights_between(start, end)
+
+    def chain_head(self):
+        """Return the committed height, tip hash and tip timestamp; see ChainExplorer.head()."""
+        return self.explorer.head()
+
+    def explore_blocks(self, cursor=None, limit=None):
+        """Return one page of block summaries, newest first; see ChainExplorer.blocks()."""
+        return self.explorer.blocks(cursor, limit)
+
+    def explore_transactions(self, sender=None, operation=None, start=None, end=None, cursor=None, limit=None):
+        """Return one page of transactions, newest first; see ChainExplorer.transactions()."""
+        return self.explorer.transactions(sender, operation, start, end, cursor, limit)
+
+    def balance_history(self, account, start=None, end=None, cursor=None, limit=None):
+        """Return one page of an account's balance history, newest first; see ChainExplorer.balance_history()."""
+        return self.explorer.balance_history(account, start, end, cursor, limit)
+
+    def get_block(self, height):
+        """
+        Return a committed block as stored in the block log.
+
+        Args:
+            height (int): The block height.
+
+        Returns:
+            dict: The block and its transactions.
+
+        Raises:
+            IndexError: If there is no block at height, or it was pruned by a bootstrap.
+        """
+        if not self.chain.base <= height < self.head.height:
+            raise IndexError(f"No block at height {height}.")
+        return self.chain.read_data(height)
+
+
+def _emission_data(details, figures):
+    """Return the payload of an emission report: the common details and the figures that were given."""
+    data = dict(details or {})
+    data.update((field, value) for field, value in figures.items() if value is not None)
+    return data
@@ -0,0 +1,148 @@
+import heapq
+from app.storage import SnapshotLog
+
+
+class ChainIndex:
+    """
+    Secondary indexes over the committed chain.
+
+    Every entry is a posting ``(height, position)`` that locates a transaction as
+    ``chain[height].transactions[position]``. Postings are appended in chain order,
+    so every posting list is already sorted. The snapshot on disk is a log of the
+    postings added in each snapshot interval.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self.height = 0  # Number of blocks indexed
+        self.tip_hash = None  # Hash of the last indexed block
+        self.by_sender = {}  # sender -> [posting]
+        self.by_recipient = {}  # recipient -> [posting]
+        self.by_operation = {}  # operation -> [posting]
+        self.by_sender_operation = {}  # sender -> {operation -> [posting]}
+        self.by_tx_hash = {}  # transaction hash -> posting
+        self.snapshot_height = 0  # Height covered by the snapshot log on disk
+        self.snapshot_log = None  # SnapshotLog the index is saved to
+        self._unsaved = []  # [height, position, sender, recipient, operation, hash] added since the last save
+
+    def add_block(self, block):
+        """
+        Index every transaction of a newly committed block.
+
+        Args:
+            block (Block): The block appended at height ``self.height``.
+        """
+        for position, transaction in enumerate(block.transactions):
+            self._add_posting((self.height, position), transaction.sender, transaction.recipient,
+                              transaction.operation, transaction.hash)
+        self.height += 1
+        self.tip_hash = block.hash
+
+    def _add_posting(self, posting, sender, recipient, operation, tx_hash):
+        self.by_sender.setdefault(sender, []).append(posting)
+        self.by_recipient.setdefault(recipient, []).append(posting)
+        self.by_operation.setdefault(operation, []).append(posting)
+        self.by_sender_operation.setdefault(sender, {}).setdefault(operation, []).append(posting)
+        self.by_tx_hash[tx_hash] = posting
+        self._unsaved.append([posting[0], posting[1], sender, recipient, operation, tx_hash])
+
+    def rebuild(self, chain, start=0):
+        """
+        Index the blocks of chain from height start onwards.
+
+        Reads the chain's columns when they cover it, so no block has to be decoded.
+
+        Args:
+            chain (list): The blockchain's list of blocks.
+            start (int): First height to index.
+        """
+        columns = getattr(chain, 'columns', None)
+        if columns is None or columns.height != len(chain):
+            for height in range(start, len(chain)):
+                self.add_block(chain[height])
+            return
+
+        for row in columns.rows(start):
+            self._add_posting((row.height, row.position), row.sender, row.recipient, row.operation, row.hash)
+        if columns.height > start:
+            self.height = columns.height
+            self.tip_hash = columns.block_hash_at(columns.height - 1)
+
+    def sender_postings(self, sender, operation=None):
+        """Return the postings of transactions sent by sender, optionally limited to one operation."""
+        if operation is None:
+            return self.by_sender.get(sender, [])
+        return self.by_sender_operation.get(sender, {}).get(operation, [])
+
+    def recipient_postings(self, recipient):
+        """Return the postings of transactions received by recipient."""
+        return self.by_recipient.get(recipient, [])
+
+    def operation_postings(self, operation):
+        """Return the postings of transactions with the given operation."""
+        return self.by_operation.get(operation, [])
+
+    def account_postings(self, account):
+        """
+        Return the postings of every transaction that account sent or received.
+
+        Returns:
+            list: Postings in chain order, without duplicates for self-transfers.
+        """
+        postings = []
+        for posting in heapq.merge(self.sender_postings(account), self.recipient_postings(account)):
+            if not postings or postings[-1] != posting:
+                postings.append(posting)
+        return postings
+
+    def locate(self, tx_hash):
+        """Return the posting of the transaction with the given hash, or None."""
+        return self.by_tx_hash.get(tx_hash)
+
+    def save(self, filename):
+        """
+        Append the postings added since the last snapshot to the index snapshot log.
+
+        Args:
+            filename (str): Path of the snapshot log.
+        """
+        if self.snapshot_log is None or self.snapshot_log.filename != filename:
+            self.snapshot_log = SnapshotLog(filename)
+        if self.height > self.snapshot_height:
+            self.snapshot_log.append({
+                "start": self.snapshot_height,
+                "height": self.height,
+                "tip_hash": self.tip_hash,
+                "postings": self._unsaved
+            })
+        self._unsaved = []
+        self.snapshot_height = self.height
+
+    @classmethod
+    def load(cls, filename, chain):
+        """
+        Load the index from its snapshot log and catch it up with chain.
+
+        Records are only trusted while they continue each other and the block at
+        their height still has the hash they recorded; the index is caught up from
+        the last one that does (from the base height on a chain bootstrapped from a
+        state snapshot).
+
+        Args:
+            filename (str): Path of the snapshot log.
+            chain (list): The blockchain's list of blocks.
+
+        Returns:
+            ChainIndex: An index covering every block of chain.
+        """
+        index = cls()
+        index.height = index.snapshot_height = getattr(chain, 'base', 0)
+        index.snapshot_log = SnapshotLog(filename)
+        for header, _ in index.snapshot_log.read(chain, index.height):
+            for height, position, sender, recipient, operation, tx_hash in header["postings"]:
+                index._add_posting((height, position), sender, recipient, operation, tx_hash)
+            index.height = index.snapshot_height = header["height"]
+            index.tip_hash = header["tip_hash"]
+        index._unsaved = []
+        index.rebuild(chain, start=index.height)
+        return index
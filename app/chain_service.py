@@ -0,0 +1,307 @@
+import mmap
+import os
+import struct
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+
+class HeightBroadcast:
+    """
+    The committed chain height, shared between processes through a memory-mapped file.
+
+    The writer process publishes the height after every commit; readers map the
+    same file and compare it with the height their caches were filled at, so
+    noticing a new block costs one 8-byte read and no IPC round trip.
+    """
+
+    LAYOUT = struct.Struct('<Q')
+
+    def __init__(self, filename, writable=False):
+        """
+        Map the height file.
+
+        Args:
+            filename (str): Path of the height file.
+            writable (bool): True in the writer process, which creates the file.
+        """
+        self.filename = filename
+        self.writable = writable
+        self._map = None
+        if writable:
+            with open(filename, 'wb') as f:
+                f.write(bytes(self.LAYOUT.size))
+            with open(filename, 'r+b') as f:
+                self._map = mmap.mmap(f.fileno(), self.LAYOUT.size)
+
+    def publish(self, height):
+        """Publish a new committed height (writer only)."""
+        self.LAYOUT.pack_into(self._map, 0, height)
+
+    def height(self):
+        """
+        Return the last published height.
+
+        Returns:
+            int: The height, or None if the writer has not created the file yet.
+        """
+        if self._map is None:
+            try:
+                with open(self.filename, 'rb') as f:
+                    self._map = mmap.mmap(f.fileno(), self.LAYOUT.size, access=mmap.ACCESS_READ)
+            except (IOError, ValueError):
+                return None
+        return self.LAYOUT.unpack_from(self._map, 0)[0]
+
+
+class ChainServer:
+    """
+    Serves one Blockchain to other processes over a Unix socket.
+
+    The process running the server is the only one that opens the block log and
+    commits blocks; web workers connect with RemoteBlockchain. Each connection is
+    handled on its own thread, relying on the Blockchain's commit and pending locks.
+    """
+
+    # Methods that only read committed state; clients may cache their results per height
+    READ_METHODS = {
+        'get_user_data', 'get_balance', 'get_stake', 'is_username_available',
+        'find_did_in_blockchain', 'calculate_carbon_tax', 'calculate_user_balance',
+        'carbon_tax_run', 'emission_totals', 'period_totals', 'heights_between', 'chain_head', 'get_block',
+        'balance_history', 'get_transaction_proof'
+    }
+    # Read-only methods whose results must not be cached: they depend on pending
+    # transactions, or on arguments that would fill the cache with one-off pages
+    UNCACHED_METHODS = {
+        'snapshot', 'mempool_metrics', 'spendable_balance', 'explore_blocks', 'explore_transactions'
+    }
+    # Methods that queue or commit transactions
+    WRITE_METHODS = {
+        'add_transaction', 'add_spend_transaction', 'queue_registration', 'wait_for_transaction',
+        'add_block', 'mine_block', 'commit_transactions',
+        'add_civil_engineering_transaction', 'add_mechanical_engineering_transaction',
+        'add_electronics_engineering_transaction', 'burn_tokens', 'pay_tax', 'grant_tax_credit',
+        'record_tax_audit'
+    }
+
+    def __init__(self, blockchain, address, authkey, height_filename=None):
+        """
+        Initialize the server.
+
+        Args:
+            blockchain (Blockchain): The chain owned by this process.
+            address (str): Path of the Unix socket to listen on.
+            authkey (bytes): Shared secret clients must prove to connect.
+            height_filename (str, optional): Path of the height broadcast file.
+        """
+        self.blockchain = blockchain
+        self.address = address
+        self.authkey = authkey
+        self.broadcast = HeightBroadcast(height_filename or address + '.height', writable=True)
+
+    def serve_forever(self):
+        """Publish the height after every commit and answer requests until the process exits."""
+        self.blockchain.commit_hooks.append(lambda block: self.broadcast.publish(len(self.blockchain.chain)))
+        self.broadcast.publish(len(self.blockchain.chain))
+        if os.path.exists(self.address):
+            os.remove(self.address)  # Left over from a previous run
+        with Listener(self.address, family='AF_UNIX', authkey=self.authkey) as listener:
+            print(f"Chain server listening on {self.address}.")
+            while True:
+                try:
+                    connection = listener.accept()
+                except (OSError, EOFError, AuthenticationError) as e:
+                    print(f"Rejected chain client: {e}")
+                    continue
+                threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        with connection:
+            while True:
+                try:
+                    method, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                if method not in self.READ_METHODS and method not in self.UNCACHED_METHODS \
+                        and method not in self.WRITE_METHODS:
+                    connection.send(('error', ValueError(f"Unknown chain method: {method}")))
+                    continue
+                try:
+                    result = getattr(self.blockchain, method)(*args, **kwargs)
+                except Exception as e:
+                    connection.send(('error', e))
+                else:
+                    connection.send(('ok', result))
+
+
+class RemoteBlockchain:
+    """
+    Client side of ChainServer, used by web workers in place of a Blockchain.
+
+    Calls are forwarded over the Unix socket. Results of read-only methods are
+    kept in a read-through cache that is dropped whenever the height broadcast
+    shows a new block, so repeated lookups (balances, logins, dashboards) between
+    commits are answered without a round trip.
+    """
+
+    def __init__(self, address, authkey, height_filename=None, cache_size=10000):
+        """
+        Initialize the client; the connection is opened on first use.
+
+        Args:
+            address (str): Path of the server's Unix socket.
+            authkey (bytes): Shared secret of the server.
+            height_filename (str, optional): Path of the height broadcast file.
+            cache_size (int): Maximum number of cached read results.
+        """
+        self.address = address
+        self.authkey = authkey
+        self.broadcast = HeightBroadcast(height_filename or address + '.height')
+        self.cache_size = cache_size
+        self._connection = None
+        self._lock = threading.Lock()  # One request in flight per connection
+        self._cache = {}
+        self._cache_height = None
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Build a client from BLOCKCHAIN_SOCKET, BLOCKCHAIN_AUTHKEY (hex) and the
+        optional BLOCKCHAIN_HEIGHT_FILE environment variables.
+        """
+        return cls(
+            os.environ['BLOCKCHAIN_SOCKET'],
+            bytes.fromhex(os.environ['BLOCKCHAIN_AUTHKEY']),
+            os.environ.get('BLOCKCHAIN_HEIGHT_FILE')
+        )
+
+    def __getattr__(self, name):
+        if name in ChainServer.READ_METHODS:
+            return lambda *args: self._cached(name, *args)
+        if name in ChainServer.UNCACHED_METHODS or name in ChainServer.WRITE_METHODS:
+            return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+        raise AttributeError(name)
+
+    def height(self):
+        """Return the committed height published by the server."""
+        return self.broadcast.height()
+
+    def call(self, method, *args, **kwargs):
+        """
+        Invoke a Blockchain method in the server process.
+
+        Returns:
+            The method's return value. Exceptions raised by the method are re-raised here.
+        """
+        with self._lock:
+            try:
+                if self._connection is None:
+                    self._connection = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+                self._connection.send((method, args, kwargs))
+            except (OSError, EOFError):
+                # Stale connection (e.g. the server restarted): the request was not
+                # delivered, so it is safe to reconnect and send it once more.
+                self._connection = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+                self._connection.send((method, args, kwargs))
+            try:
+                status, value = self._connection.recv()
+            except (OSError, EOFError):
+                self._connection = None
+                raise
+        if status == 'error':
+            raise value
+        return value
+
+    def _cached(self, method, *args):
+        height = self.broadcast.height()
+        key = (method,) + args
+        with self._cache_lock:
+            if height is None or height != self._cache_height:
+                self._cache.clear()
+                self._cache_height = height
+            elif key in self._cache:
+                return self._cache[key]
+        value = self.call(method, *args)
+        with self._cache_lock:
+            if height is not None and height == self._cache_height:
+                if len(self._cache) >= self.cache_size:
+                    self._cache.clear()
+                self._cache[key] = value
+        return value
+
+
+def run_chain_server(address, authkey, filename='blockchain.json', format='json', max_delay=0.25):
+    """
+    Open the chain and serve it until the process exits.
+
+    Intended as the target of the writer process started by gunicorn.conf.py or
+    ``manage.py serve``. Authority keys are read from the environment, see
+    app.authority.authorities_from_environment(); public keys are saved next to
+    the chain, so they are known on later starts too.
+
+    Args:
+        address (str): Path of the Unix socket to listen on.
+        authkey (bytes): Shared secret clients must prove to connect.
+        filename (str): Path of the chain file.
+        format (str): On-disk format of the block log.
+        max_delay (float): Seconds a pending transaction waits before its batch is sealed.
+    """
+    from app.authority import authorities_from_environment
+    from app.blockchain import Blockchain
+    from app.crypto_executor import CryptoExecutor
+
+    authority_nodes, local_authorities = authorities_from_environment()
+    blockchain = Blockchain(filename, format=format, crypto_executor=CryptoExecutor(),
+                            authority_nodes=authority_nodes, local_authorities=local_authorities)
+    if blockchain.authority_nodes:
+        signing = ', '.join(sorted(blockchain.local_authorities)) or 'none'
+        print(f"Proof of authority: {len(blockchain.authority_nodes)} authorities, signing for {signing}.")
+    blockchain.start_mining(interval=max_delay)
+    _start_sync(blockchain)
+    ChainServer(blockchain, address, authkey, os.environ.get('BLOCKCHAIN_HEIGHT_FILE')).serve_forever()
+
+
+def _start_sync(blockchain):
+    """
+    Serve the chain to peers and follow them, if configured.
+
+    BLOCKCHAIN_SYNC_LISTEN (host:port) starts a SyncServer; it only binds to a
+    non-loopback address if BLOCKCHAIN_SYNC_PUBLIC is set. BLOCKCHAIN_SYNC_PEERS
+    (comma-separated host:port) starts a thread syncing with each peer every
+    BLOCKCHAIN_SYNC_INTERVAL seconds; with BLOCKCHAIN_SYNC_BOOTSTRAP set, a new
+    node first starts from a peer's state snapshot. Both need
+    BLOCKCHAIN_SYNC_AUTHKEY (hex, at least 16 bytes), shared by every node.
+
+    Raises:
+        ValueError: If the key is too short, or the listen address is public
+            without BLOCKCHAIN_SYNC_PUBLIC.
+    """
+    from app.sync import BlockSync, SyncError, SyncServer, is_loopback, parse_address
+
+    listen = os.environ.get('BLOCKCHAIN_SYNC_LISTEN')
+    peers = [parse_address(peer) for peer in os.environ.get('BLOCKCHAIN_SYNC_PEERS', '').split(',') if peer.strip()]
+    if not listen and not peers:
+        return
+    authkey = bytes.fromhex(os.environ['BLOCKCHAIN_SYNC_AUTHKEY'])
+    if len(authkey) < 16:
+        raise ValueError("BLOCKCHAIN_SYNC_AUTHKEY must hold at least 16 bytes (32 hex digits).")
+    if listen:
+        address = parse_address(listen)
+        if not is_loopback(address[0]) and not os.environ.get('BLOCKCHAIN_SYNC_PUBLIC'):
+            raise ValueError(f"BLOCKCHAIN_SYNC_LISTEN={listen} is not a loopback address; "
+                             f"set BLOCKCHAIN_SYNC_PUBLIC=1 to serve peers on other hosts.")
+        server = SyncServer(blockchain, address, authkey)
+        server.start()
+        print(f"Serving blocks to peers on {server.address[0]}:{server.address[1]}.")
+    if peers:
+        syncer = BlockSync(blockchain, authkey)
+        if os.environ.get('BLOCKCHAIN_SYNC_BOOTSTRAP') and len(blockchain.chain) == 1:
+            for address in peers:
+                try:
+                    syncer.bootstrap(address)
+                    break
+                except (SyncError, OSError, EOFError) as e:
+                    print(f"Bootstrap from {address} failed: {e}")
+        interval = float(os.environ.get('BLOCKCHAIN_SYNC_INTERVAL', '1.0'))
+        threading.Thread(target=syncer.run, args=(peers, interval), daemon=True).start()
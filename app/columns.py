@@ -0,0 +1,295 @@
+import math
+from array import array
+from collections import namedtuple
+from app.storage import SnapshotLog
+
+# One committed transaction as seen through the columns
+TransactionRow = namedtuple(
+    'TransactionRow',
+    ['height', 'position', 'operation', 'sender', 'recipient', 'amount', 'timestamp', 'hash']
+)
+
+
+class StringTable:
+    """Maps repeated strings (operations, senders, recipients) to small integer ids."""
+
+    def __init__(self, strings=None):
+        self.strings = list(strings or [])
+        self.ids = {value: i for i, value in enumerate(self.strings)}
+
+    def intern(self, value):
+        """Return the id of value, adding it to the table if needed."""
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def __getitem__(self, string_id):
+        return self.strings[string_id]
+
+
+class ChainColumns:
+    """
+    Columnar in-memory summary of every committed transaction.
+
+    Each transaction takes one slot in a set of typed arrays (height, timestamp,
+    amount, operation/sender/recipient string ids, the raw 32-byte hash and the
+    sender's and recipient's token balance after it) instead of a Transaction
+    object with its own dict. Replaying the chain into
+    the index or the balance table reads these columns instead of decoding
+    blocks, and they are snapshotted next to the chain so a restart only decodes
+    the blocks committed after the snapshot. Each snapshot appends only the
+    blocks added since the previous one.
+
+    On a chain bootstrapped from a state snapshot the columns start at the
+    chain's base height; heights still count from genesis.
+    """
+
+    HASH_SIZE = 32
+
+    def __init__(self, base=0):
+        """
+        Initialize empty columns.
+
+        Args:
+            base (int): Height of the first block the columns will hold.
+        """
+        self.base = base
+        self.strings = StringTable()
+        # Per block
+        self.block_hash = bytearray()
+        self.block_timestamp = array('d')
+        self.block_first_row = array('Q')
+        # Per transaction
+        self.tx_height = array('Q')
+        self.tx_timestamp = array('d')
+        self.tx_amount = array('d')  # NaN when the transaction carries no numeric amount
+        self.tx_operation = array('I')
+        self.tx_sender = array('I')
+        self.tx_recipient = array('I')
+        # Balances after the transaction, filled in by the balance manager; NaN when
+        # the transaction does not move that side's balance
+        self.tx_sender_balance = array('d')
+        self.tx_recipient_balance = array('d')
+        self.tx_hash = bytearray()
+        self.snapshot_height = base  # Height covered by the snapshot log on disk
+        self.snapshot_log = None  # SnapshotLog the columns are saved to
+        self._saved_strings = [0]  # Size of the string table after each record of the log
+
+    @property
+    def height(self):
+        """Height of the chain the columns cover: base plus the blocks they hold."""
+        return self.base + len(self.block_timestamp)
+
+    def __len__(self):
+        return len(self.tx_height)
+
+    def add_block(self, block):
+        """
+        Append the header fields and the transactions of a newly committed block.
+
+        Args:
+            block (Block): The block appended at height ``self.height``.
+        """
+        height = self.height
+        self.block_hash += bytes.fromhex(block.hash)
+        self.block_timestamp.append(float(block.timestamp))
+        self.block_first_row.append(len(self.tx_height))
+        for tx in block.transactions:
+            self.tx_height.append(height)
+            self.tx_timestamp.append(float(tx.timestamp))
+            self.tx_amount.append(_amount_of(tx))
+            self.tx_operation.append(self.strings.intern(tx.operation))
+            self.tx_sender.append(self.strings.intern(tx.sender))
+            self.tx_recipient.append(self.strings.intern(tx.recipient))
+            self.tx_sender_balance.append(math.nan)
+            self.tx_recipient_balance.append(math.nan)
+            self.tx_hash += bytes.fromhex(tx.hash)
+
+    def rebuild(self, chain, start=0):
+        """
+        Append the blocks of chain from height start onwards.
+
+        Args:
+            chain (list): The blockchain's list of blocks.
+            start (int): First height to add.
+        """
+        for height in range(start, len(chain)):
+            self.add_block(chain[height])
+
+    def truncate(self, height):
+        """
+        Drop the blocks from height onwards, with their transactions.
+
+        Args:
+            height (int): Number of blocks to keep.
+        """
+        if height >= self.height:
+            return
+        offset = height - self.base
+        rows = self.block_first_row[offset]
+        del self.block_hash[offset * self.HASH_SIZE:]
+        del self.block_timestamp[offset:]
+        del self.block_first_row[offset:]
+        for column in (self.tx_height, self.tx_timestamp, self.tx_amount, self.tx_operation,
+                       self.tx_sender, self.tx_recipient, self.tx_sender_balance, self.tx_recipient_balance):
+            del column[rows:]
+        del self.tx_hash[rows * self.HASH_SIZE:]
+        if self.snapshot_log is not None:
+            kept = self.snapshot_log.truncate(height)
+            del self._saved_strings[len(self.snapshot_log.records) + 1:]
+            self.snapshot_height = self.base if kept is None else kept
+
+    def block_hash_at(self, height):
+        """Return the hex hash of the block at height."""
+        offset = self._offset(height)
+        return self.block_hash[offset * self.HASH_SIZE:(offset + 1) * self.HASH_SIZE].hex()
+
+    def block_rows(self, height):
+        """Return the range of row numbers holding the transactions of the block at height."""
+        offset = self._offset(height)
+        end = self.block_first_row[offset + 1] if height + 1 < self.height else len(self.tx_height)
+        return range(self.block_first_row[offset], end)
+
+    def set_balances(self, row, sender_balance, recipient_balance):
+        """
+        Record the balances a transaction left its sender and recipient with.
+
+        Args:
+            row (int): The row number.
+            sender_balance (float): The sender's balance after it, or NaN if it was not debited.
+            recipient_balance (float): The recipient's balance after it, or NaN if it was not credited.
+        """
+        self.tx_sender_balance[row] = sender_balance
+        self.tx_recipient_balance[row] = recipient_balance
+
+    def _offset(self, height):
+        if not self.base <= height < self.height:
+            raise IndexError(f"block height {height} is not in the columns")
+        return height - self.base
+
+    def row(self, row):
+        """
+        Return one transaction as a TransactionRow.
+
+        Args:
+            row (int): The row number.
+        """
+        height = self.tx_height[row]
+        amount = self.tx_amount[row]
+        return TransactionRow(
+            height=height,
+            position=row - self.block_first_row[height - self.base],
+            operation=self.strings[self.tx_operation[row]],
+            sender=self.strings[self.tx_sender[row]],
+            recipient=self.strings[self.tx_recipient[row]],
+            amount=None if math.isnan(amount) else amount,
+            timestamp=self.tx_timestamp[row],
+            hash=self.tx_hash[row * self.HASH_SIZE:(row + 1) * self.HASH_SIZE].hex()
+        )
+
+    def rows(self, start_height=0):
+        """
+        Iterate over the transactions of every block from start_height onwards.
+
+        Yields:
+            TransactionRow: The transactions in chain order.
+        """
+        start_height = max(start_height, self.base)
+        if start_height >= self.height:
+            return
+        for row in range(self.block_first_row[start_height - self.base], len(self.tx_height)):
+            yield self.row(row)
+
+    def _arrays(self):
+        return [
+            self.block_timestamp, self.block_first_row, self.tx_height, self.tx_timestamp,
+            self.tx_amount, self.tx_operation, self.tx_sender, self.tx_recipient,
+            self.tx_sender_balance, self.tx_recipient_balance
+        ]
+
+    def save(self, filename):
+        """
+        Append the blocks added since the last snapshot to the column snapshot log.
+
+        Each record is one JSON header line (height range, tip hash, the strings
+        interned since the previous record and the row count) followed by the raw
+        bytes of every column over those blocks.
+
+        Args:
+            filename (str): Path of the snapshot log.
+        """
+        if self.snapshot_log is None or self.snapshot_log.filename != filename:
+            self.snapshot_log = SnapshotLog(filename)
+            self.snapshot_height, self._saved_strings = self.base, [0]
+        if self.height == self.snapshot_height:
+            return
+        first_block = self.snapshot_height - self.base
+        first_row = self.block_first_row[first_block] if first_block < len(self.block_first_row) else len(self)
+        header = {
+            "base": self.base,
+            "start": self.snapshot_height,
+            "height": self.height,
+            "tip_hash": self.block_hash_at(self.height - 1),
+            "strings": self.strings.strings[self._saved_strings[-1]:],
+            "rows": len(self) - first_row,
+            "typecodes": [column.typecode for column in self._arrays()]
+        }
+        firsts = [first_block] * 2 + [first_row] * 8
+        payload = b''.join(column[first:].tobytes() for column, first in zip(self._arrays(), firsts))
+        payload += self.block_hash[first_block * self.HASH_SIZE:] + self.tx_hash[first_row * self.HASH_SIZE:]
+        self.snapshot_log.append(header, payload)
+        self.snapshot_height = self.height
+        self._saved_strings.append(len(self.strings.strings))
+
+    @classmethod
+    def load(cls, filename, chain):
+        """
+        Load the columns from their snapshot log and add the blocks committed after it.
+
+        Records are only trusted while they continue each other and the block at
+        their height still has the hash they recorded; the columns are rebuilt from
+        the chain after the last one that does.
+
+        Args:
+            filename (str): Path of the snapshot log.
+            chain (list): The blockchain's list of blocks.
+
+        Returns:
+            ChainColumns: Columns covering every block of chain.
+        """
+        columns = cls(getattr(chain, 'base', 0))
+        columns.snapshot_log = SnapshotLog(filename)
+        typecodes = [column.typecode for column in columns._arrays()]
+        for header, payload in columns.snapshot_log.read(chain, columns.base):
+            if header.get("base") != columns.base or header.get("typecodes") != typecodes:
+                break
+            blocks, rows = header["height"] - header["start"], header["rows"]
+            sizes = [count * column.itemsize for count, column in zip([blocks] * 2 + [rows] * 8, columns._arrays())]
+            sizes += [blocks * cls.HASH_SIZE, rows * cls.HASH_SIZE]
+            if len(payload) != sum(sizes):
+                break
+            parts, offset = [], 0
+            for size in sizes:
+                parts.append(payload[offset:offset + size])
+                offset += size
+            for string in header["strings"]:
+                columns.strings.intern(string)
+            for column, part in zip(columns._arrays(), parts):
+                column.frombytes(part)
+            columns.block_hash += parts[-2]
+            columns.tx_hash += parts[-1]
+            columns.snapshot_height = columns.height
+            columns._saved_strings.append(len(columns.strings.strings))
+        columns.rebuild(chain, start=columns.height)
+        return columns
+
+
+def _amount_of(transaction):
+    """Return the numeric amount carried in a transaction's data, or NaN."""
+    data = transaction.data
+    amount = data.get('amount') if isinstance(data, dict) else None
+    if isinstance(amount, (int, float)) and not isinstance(amount, bool):
+        return float(amount)
+    return math.nan
@@ -0,0 +1,218 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+
+
+class CryptoBusyError(RuntimeError):
+    """Raised when the crypto executor's queue stays full for longer than the submit timeout."""
+
+
+# Per worker process: the SecretManager (with its key cache) and the keys loaded from PEM
+_secret_manager = None
+_loaded_keys = {}
+_MAX_LOADED_KEYS = 64
+
+
+def _pss():
+    return padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH)
+
+
+def _load_key(pem, private):
+    fingerprint = hashlib.sha256(pem).digest()
+    key = _loaded_keys.get(fingerprint)
+    if key is None:
+        if private:
+            key = serialization.load_pem_private_key(pem, password=None)
+        else:
+            key = serialization.load_pem_public_key(pem)
+        if len(_loaded_keys) >= _MAX_LOADED_KEYS:
+            _loaded_keys.clear()
+        _loaded_keys[fingerprint] = key
+    return key
+
+
+def derive_key_pair(secret_phrase):
+    """Worker task: derive the PEM key pair of a secret phrase."""
+    global _secret_manager
+    if _secret_manager is None:
+        from app.secret import SecretManager
+        _secret_manager = SecretManager()
+    return _secret_manager.generate_key_from_secret_phrase(secret_phrase)
+
+
+def sign_with_pem(private_key_pem, data):
+    """Worker task: RSA-PSS sign data with a PEM private key."""
+    return _load_key(private_key_pem, private=True).sign(data, _pss(), hashes.SHA256())
+
+
+def verify_with_pem(public_key_pem, signature, data):
+    """Worker task: check an RSA-PSS signature with a PEM public key."""
+    try:
+        _load_key(public_key_pem, private=False).verify(signature, data, _pss(), hashes.SHA256())
+        return True
+    except InvalidSignature:
+        return False
+
+
+class CryptoExecutor:
+    """
+    Runs RSA key derivation, signing and verification in a pool of worker processes.
+
+    Request threads submit work and wait on a Future, so a burst of registrations
+    no longer holds the GIL of the web process for the length of a key derivation.
+    At most max_pending tasks are queued or running; a submit that cannot get a slot
+    within submit_timeout raises CryptoBusyError instead of growing the queue.
+    Queue depth, rejections and latencies are reported by metrics().
+    """
+
+    def __init__(self, max_workers=None, max_pending=64, submit_timeout=5.0, latency_samples=1024):
+        """
+        Initialize the executor; worker processes start on the first submit.
+
+        Args:
+            max_workers (int, optional): Worker processes; defaults to the CPU count.
+            max_pending (int): Maximum number of queued or running tasks.
+            submit_timeout (float): Seconds a submit waits for a free slot before raising.
+            latency_samples (int): Number of recent latencies kept for the percentiles.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.submit_timeout = submit_timeout
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_waits = deque(maxlen=latency_samples)  # Seconds from submit until a worker picked it up
+        self._latencies = deque(maxlen=latency_samples)  # Seconds from submit until the result was ready
+
+    def submit(self, fn, *args):
+        """
+        Queue a task on the worker pool.
+
+        Args:
+            fn (callable): A module-level function (it is pickled to the worker).
+            *args: Its picklable arguments.
+
+        Returns:
+            Future: The task's result.
+
+        Raises:
+            CryptoBusyError: If no slot frees up within submit_timeout.
+        """
+        if not self._slots.acquire(timeout=self.submit_timeout):
+            with self._lock:
+                self._rejected += 1
+            raise CryptoBusyError("Crypto executor is saturated; try again shortly.")
+        submitted = time.perf_counter()
+        try:
+            task = self._pool().submit(_timed, fn, args)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending += 1
+            self._submitted += 1
+        future = Future()
+        task.add_done_callback(lambda task: self._finished(task, submitted, future))
+        return future
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawned rather than forked: the web process is multi-threaded
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _finished(self, task, submitted, future):
+        finished = time.perf_counter()
+        error = None if task.cancelled() else task.exception()
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            self._latencies.append(finished - submitted)
+            if not task.cancelled() and error is None:
+                self._queue_waits.append(max(finished - submitted - task.result()[1], 0.0))
+        self._slots.release()
+        if task.cancelled():
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(task.result()[0])
+
+    def run(self, fn, *args, timeout=None):
+        """Submit a task and wait for its result."""
+        return self.submit(fn, *args).result(timeout)
+
+    def generate_key_pair(self, secret_phrase, timeout=None):
+        """
+        Derive the PEM key pair of a secret phrase in a worker.
+
+        Returns:
+            tuple: (public_key_pem, private_key_pem).
+        """
+        return self.run(derive_key_pair, secret_phrase, timeout=timeout)
+
+    def sign(self, private_key_pem, data, timeout=None):
+        """Sign data (bytes) with a PEM private key in a worker, returning the signature."""
+        return self.run(sign_with_pem, private_key_pem, data, timeout=timeout)
+
+    def verify(self, public_key_pem, signature, data, timeout=None):
+        """Check a signature of data with a PEM public key in a worker."""
+        return self.run(verify_with_pem, public_key_pem, signature, data, timeout=timeout)
+
+    def metrics(self):
+        """
+        Report the executor's load.
+
+        Returns:
+            dict: Queue depth, capacity, task counters and p50/p99 queue wait and
+                  total latency in milliseconds over the recent tasks.
+        """
+        with self._lock:
+            return {
+                "queue_depth": self._pending,
+                "max_pending": self.max_pending,
+                "workers": self.max_workers,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "queue_wait_ms": _percentiles(self._queue_waits),
+                "latency_ms": _percentiles(self._latencies)
+            }
+
+    def shutdown(self, wait=True):
+        """Stop the worker processes."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _timed(fn, args):
+    """Run fn in the worker and report how long it took, so queue wait can be told apart."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _percentiles(samples):
+    if not samples:
+        return {"p50": None, "p99": None}
+    ordered = sorted(samples)
+    return {
+        "p50": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p99": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3)
+    }
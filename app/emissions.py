@@ -0,0 +1,260 @@
+import threading
+from bisect import bisect_left
+import numpy as np
+from app.rollups import EMISSION_OPERATION, EmissionRollups, quantity, report_emissions, report_timestamp
+from app.time_index import PERIODS, period_bounds
+
+
+class EmissionsAnalytics:
+    """
+    Batch analytics over the CARBON_EMISSION transactions of a chain.
+
+    The numeric payload fields of every emission report (the civil, mechanical
+    and electronics fields as well as a plain 'amount') are extracted once into
+    NumPy columns, one row per transaction, together with the reporter, the tCO2e
+    and the time the report is dated at (the start of its reporting period if it
+    names one). Each refresh() only decodes the reports committed since the last
+    one, found through the index. Totals per user, profession or period and the
+    tax of every user are then computed with vectorized group-bys instead of
+    scanning the chain per user.
+
+    A payload field may hold a number or a dict (or list) of numbers, which are
+    summed. Emissions in tCO2e are the stated 'amount', or the other fields
+    weighted by factors when a report has none; the tax is a
+    marginal schedule of (threshold, rate) brackets over a user's emissions. On a
+    chain bootstrapped from a state snapshot only the reports after the base
+    height are available.
+    """
+
+    METRICS = EmissionRollups.METRICS
+    EMISSION_FACTORS = EmissionRollups.EMISSION_FACTORS
+    TAX_BRACKETS = EmissionRollups.TAX_BRACKETS
+
+    def __init__(self, blockchain, factors=None, brackets=None):
+        """
+        Initialize the engine; the columns are filled on the first query.
+
+        Args:
+            blockchain (Blockchain): The chain to analyse.
+            factors (dict, optional): Overrides EMISSION_FACTORS, field -> tCO2e per unit.
+            brackets (list, optional): Overrides TAX_BRACKETS, sorted by threshold.
+        """
+        self.blockchain = blockchain
+        self.factors = dict(self.EMISSION_FACTORS, **(factors or {}))
+        self.brackets = sorted(brackets or self.TAX_BRACKETS)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.height = 0  # Chain height covered by the columns
+        self.tip_hash = None
+        self.users = []  # User code -> username
+        self._user_codes = {}
+        self._professions = []  # User code -> profession
+        self.user = np.zeros(0, dtype=np.int32)
+        self.timestamp = np.zeros(0, dtype=np.float64)
+        self.tco2e = np.zeros(0, dtype=np.float64)
+        self.metrics = np.zeros((0, len(self.METRICS)), dtype=np.float64)
+
+    def refresh(self):
+        """
+        Add the emission reports committed since the last refresh to the columns.
+
+        The columns are rebuilt from scratch when the chain no longer contains the
+        block they were last refreshed at, e.g. after a fork switch.
+
+        Returns:
+            int: Number of rows (emission reports) in the columns.
+        """
+        blockchain = self.blockchain
+        with self._lock:
+            head = blockchain.snapshot()
+            if self.tip_hash is not None and not self._still_on_chain(head):
+                self._reset()
+            if head.height == self.height:
+                return len(self.user)
+
+            postings = blockchain.index.operation_postings(EMISSION_OPERATION)
+            end = bisect_left(postings, (head.height,))
+            new = postings[bisect_left(postings, (self.height,), 0, end):end]
+            users, timestamps, tco2e, rows = [], [], [], []
+            for posting in new:
+                transaction = blockchain.get_transaction(posting)
+                users.append(self._user_code(transaction.sender))
+                timestamps.append(report_timestamp(transaction))
+                tco2e.append(report_emissions(transaction.data, self.factors))
+                rows.append(self._extract(transaction.data))
+
+            if rows:
+                self.user = np.concatenate([self.user, np.array(users, dtype=np.int32)])
+                self.timestamp = np.concatenate([self.timestamp, np.array(timestamps, dtype=np.float64)])
+                self.tco2e = np.concatenate([self.tco2e, np.array(tco2e, dtype=np.float64)])
+                self.metrics = np.concatenate([self.metrics, np.array(rows, dtype=np.float64)])
+            self.height, self.tip_hash = head.height, head.tip_hash
+            return len(self.user)
+
+    def _still_on_chain(self, head):
+        if self.height > head.height:
+            return False
+        try:
+            return self.blockchain.chain[self.height - 1].hash == self.tip_hash
+        except IndexError:
+            return False
+
+    def _user_code(self, username):
+        code = self._user_codes.get(username)
+        if code is None:
+            code = self._user_codes[username] = len(self.users)
+            self.users.append(username)
+            user_data = self.blockchain.get_user_data(username)
+            self._professions.append((user_data or {}).get('profession') or 'unknown')
+        return code
+
+    def _extract(self, data):
+        """Return the METRICS of one payload as a list of floats."""
+        if not isinstance(data, dict):
+            return [0.0] * len(self.METRICS)
+        return [quantity(data.get(field)) for field in self.METRICS]
+
+    def emissions(self):
+        """Return the tCO2e of every row; see report_emissions()."""
+        return self.tco2e
+
+    def tax(self, emissions):
+        """
+        Apply the marginal tax brackets to an array of emission totals.
+
+        Args:
+            emissions (numpy.ndarray): tCO2e per taxpayer; negative totals owe nothing.
+
+        Returns:
+            numpy.ndarray: The tax owed by each.
+        """
+        emissions = np.asarray(emissions, dtype=np.float64)
+        owed = np.zeros_like(emissions)
+        for i, (lower, rate) in enumerate(self.brackets):
+            upper = self.brackets[i + 1][0] if i + 1 < len(self.brackets) else np.inf
+            owed += rate * np.clip(emissions - lower, 0.0, upper - lower)
+        return owed
+
+    def _period_mask(self, period):
+        if period is None:
+            return None
+        start, end = period_bounds(period)
+        return (self.timestamp >= start) & (self.timestamp < end)
+
+    def totals(self, by='user', period='month', within=None):
+        """
+        Sum the emissions and metrics of the reports per user, profession or period.
+
+        Args:
+            by (str): 'user', 'profession' or 'period'.
+            period (str): Granularity of by='period': 'day', 'month', 'quarter' or 'year'.
+            within (str, optional): Only count reports in this period, e.g. '2024', '2024-Q3'.
+
+        Returns:
+            dict: Group -> {"transactions", "emissions", and every non-zero metric}.
+        """
+        self.refresh()
+        with self._lock:
+            user, timestamp, metrics = self.user, self.timestamp, self.metrics
+            emissions = self.emissions()
+            mask = self._period_mask(within)
+            if mask is not None:
+                user, timestamp, metrics, emissions = user[mask], timestamp[mask], metrics[mask], emissions[mask]
+
+            if by == 'user':
+                labels, groups = self.users, user
+            elif by == 'profession':
+                labels, codes = np.unique(np.array(self._professions, dtype=str), return_inverse=True)
+                labels, groups = list(labels), codes.reshape(-1)[user]
+            elif by == 'period':
+                codes, groups = np.unique(period_codes(timestamp, period), return_inverse=True)
+                labels = [period_label(code, period) for code in codes]
+            else:
+                raise ValueError(f"Cannot group emissions by {by!r}.")
+
+        size = len(labels)
+        counts = np.bincount(groups, minlength=size)
+        sums = np.bincount(groups, weights=emissions, minlength=size)
+        metric_sums = [np.bincount(groups, weights=metrics[:, i], minlength=size) for i in range(len(self.METRICS))]
+        result = {}
+        for code in np.flatnonzero(counts):
+            entry = {"transactions": int(counts[code]), "emissions": float(sums[code])}
+            for field, column in zip(self.METRICS, metric_sums):
+                if column[code]:
+                    entry[field] = float(column[code])
+            result[str(labels[code])] = entry
+        return result
+
+    def tax_run(self, within=None):
+        """
+        Compute the carbon tax of every reporting user at once.
+
+        Args:
+            within (str, optional): Only tax the reports of this period, e.g. '2024-10'.
+
+        Returns:
+            dict: Username -> {"emissions": tCO2e, "tax": amount owed}.
+        """
+        self.refresh()
+        with self._lock:
+            user, emissions = self.user, self.emissions()
+            mask = self._period_mask(within)
+            if mask is not None:
+                user, emissions = user[mask], emissions[mask]
+            totals = np.bincount(user, weights=emissions, minlength=len(self.users))
+            reported = np.bincount(user, minlength=len(self.users))
+            owed = self.tax(totals)
+            users = self.users
+        return {
+            users[code]: {"emissions": float(totals[code]), "tax": float(owed[code])}
+            for code in np.flatnonzero(reported)
+        }
+
+    def carbon_tax(self, username, within=None):
+        """Return the carbon tax owed by one user, optionally for one period."""
+        self.refresh()
+        with self._lock:
+            code = self._user_codes.get(username)
+            if code is None:
+                return 0.0
+            rows = self.user == code
+            mask = self._period_mask(within)
+            if mask is not None:
+                rows &= mask
+            total = float(self.emissions()[rows].sum())
+        return float(self.tax([total])[0])
+
+
+def period_codes(timestamps, period='month'):
+    """
+    Number the UTC periods of Unix timestamps: days, months, quarters or years since 1970.
+
+    Args:
+        timestamps (numpy.ndarray): Seconds since the epoch.
+        period (str): 'day', 'month', 'quarter' or 'year'.
+
+    Returns:
+        numpy.ndarray: One int64 code per timestamp; see period_label().
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r}; expected one of {', '.join(PERIODS)}.")
+    dates = np.asarray(timestamps, dtype=np.float64).astype('datetime64[s]')
+    if period == 'day':
+        return dates.astype('datetime64[D]').astype(np.int64)
+    if period == 'year':
+        return dates.astype('datetime64[Y]').astype(np.int64)
+    months = dates.astype('datetime64[M]').astype(np.int64)
+    return months // 3 if period == 'quarter' else months
+
+
+def period_label(code, period='month'):
+    """Format a period_codes() value: '2024-10-31', '2024-10', '2024-Q4' or '2024'."""
+    if period == 'day':
+        return str(np.datetime64(int(code), 'D'))
+    if period == 'month':
+        return str(np.datetime64(int(code), 'M'))
+    if period == 'quarter':
+        return f"{1970 + int(code) // 4}-Q{int(code) % 4 + 1}"
+    return str(1970 + int(code))
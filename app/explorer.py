@@ -0,0 +1,261 @@
+import heapq
+import math
+from bisect import bisect_left
+
+
+class ChainExplorer:
+    """
+    Pages through committed blocks and transactions, newest first.
+
+    Pages are read from the chain columns, so no block is decoded. Transaction
+    filters use the index: the posting list of a sender, an operation or both
+    narrows the candidates, and a time range becomes a range of heights through
+    the time index (a transaction matches by the time its block was sealed).
+    Both ends of a page are found by bisection, so a page costs O(log N + limit)
+    wherever it falls.
+
+    A cursor is the position of the last item of the previous page: a height
+    for blocks, 'height:position' for transactions. New blocks only add items
+    before the first page, so following cursors never skips or repeats an item.
+    """
+
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 1000
+
+    def __init__(self, blockchain):
+        """
+        Initialize the explorer.
+
+        Args:
+            blockchain (Blockchain): The chain to explore.
+        """
+        self.blockchain = blockchain
+
+    def head(self):
+        """
+        Return the committed head: what the pages of this height are computed from.
+
+        Returns:
+            dict: {"height", "tip_hash", "timestamp"}, the timestamp being when the tip was sealed.
+        """
+        head = self.blockchain.snapshot()
+        return {
+            "height": head.height,
+            "tip_hash": head.tip_hash,
+            "timestamp": self.blockchain.time_index.timestamp_at(head.height - 1),
+        }
+
+    def blocks(self, cursor=None, limit=None):
+        """
+        Return one page of block summaries, newest first.
+
+        Args:
+            cursor (str, optional): The height of the last block of the previous page.
+            limit (int, optional): Blocks per page, at most MAX_LIMIT.
+
+        Returns:
+            dict: {"height", "blocks": [{"height", "hash", "previous_hash", "timestamp",
+                "transactions"}], "next_cursor"}; next_cursor is None on the last page.
+
+        Raises:
+            ValueError: If cursor or limit is malformed.
+        """
+        limit = self._limit(limit)
+        columns = self.blockchain.chain.columns
+        height = self.blockchain.snapshot().height
+        end = height if cursor is None else min(height, _parse_int(cursor, "cursor"))
+        first = max(columns.base, end - limit)
+        blocks = []
+        for h in range(end - 1, first - 1, -1):
+            blocks.append({
+                "height": h,
+                "hash": columns.block_hash_at(h),
+                "previous_hash": self._previous_hash(h),
+                "timestamp": columns.block_timestamp[h - columns.base],
+                "transactions": len(columns.block_rows(h)),
+            })
+        return {"height": height, "blocks": blocks, "next_cursor": str(first) if first > columns.base else None}
+
+    def _previous_hash(self, height):
+        columns = self.blockchain.chain.columns
+        if height > columns.base:
+            return columns.block_hash_at(height - 1)
+        return self.blockchain.chain.read_data(height)["previous_hash"]
+
+    def transactions(self, sender=None, operation=None, start=None, end=None, cursor=None, limit=None):
+        """
+        Return one page of transactions, newest first.
+
+        Args:
+            sender (str, optional): Only transactions sent by this account.
+            operation (str, optional): Only transactions with this operation.
+            start (float, optional): Only blocks sealed at or after this Unix timestamp.
+            end (float, optional): Only blocks sealed before this Unix timestamp.
+            cursor (str, optional): 'height:position' of the last transaction of the previous page.
+            limit (int, optional): Transactions per page, at most MAX_LIMIT.
+
+        Returns:
+            dict: {"height", "transactions": [{"hash", "height", "position", "operation",
+                "sender", "recipient", "amount", "timestamp"}], "next_cursor"}.
+
+        Raises:
+            ValueError: If cursor or limit is malformed.
+        """
+        limit = self._limit(limit)
+        blockchain = self.blockchain
+        columns = blockchain.chain.columns
+        height = blockchain.snapshot().height
+        first_height, end_height = blockchain.time_index.heights_between(
+            0.0 if start is None else start, float('inf') if end is None else end)
+        end_height = min(end_height, height)
+
+        if sender is None and operation is None:
+            # Every transaction: row numbers of the columns are in chain order
+            def row_of(i):
+                return i
+            lo, hi = _first_row(columns, first_height), _first_row(columns, end_height)
+            if cursor is not None:
+                cursor_height, position = _parse_posting(cursor)
+                if cursor_height < end_height:
+                    hi = min(hi, _first_row(columns, cursor_height) + position)
+        else:
+            if sender is not None:
+                postings = blockchain.index.sender_postings(sender, operation)
+            else:
+                postings = blockchain.index.operation_postings(operation)
+
+            def row_of(i):
+                h, position = postings[i]
+                return columns.block_first_row[h - columns.base] + position
+            lo = bisect_left(postings, (first_height,))
+            hi = bisect_left(postings, (end_height,))
+            if cursor is not None:
+                hi = min(hi, bisect_left(postings, _parse_posting(cursor)))
+
+        first = max(lo, hi - limit)
+        transactions = []
+        for i in range(hi - 1, first - 1, -1):
+            row = columns.row(row_of(i))
+            transactions.append({
+                "hash": row.hash, "height": row.height, "position": row.position,
+                "operation": row.operation, "sender": row.sender, "recipient": row.recipient,
+                "amount": row.amount, "timestamp": row.timestamp,
+            })
+        next_cursor = None
+        if first > lo and transactions:
+            next_cursor = f"{transactions[-1]['height']}:{transactions[-1]['position']}"
+        return {"height": height, "transactions": transactions, "next_cursor": next_cursor}
+
+    def balance_history(self, account, start=None, end=None, cursor=None, limit=None):
+        """
+        Return one page of an account's balance history, newest first.
+
+        Entries are the account's index postings (what it received, and what it sent
+        with an operation that debits the sender), merged newest first; the balance
+        after each transaction is read from the columns, where the balance manager
+        records it at commit. Postings that did not move the account's balance are
+        skipped, so a page costs O(log N + limit) plus the skipped postings.
+
+        Args:
+            account (str): The account (username or DID).
+            start (float, optional): Only blocks sealed at or after this Unix timestamp.
+            end (float, optional): Only blocks sealed before this Unix timestamp.
+            cursor (str, optional): 'height:position' of the last entry of the previous page.
+            limit (int, optional): Entries per page, at most MAX_LIMIT.
+
+        Returns:
+            dict: {"account", "height", "entries": [{"height", "position", "hash", "operation",
+                "counterparty", "change", "balance", "timestamp"}], "next_cursor"}.
+
+        Raises:
+            ValueError: If cursor or limit is malformed.
+        """
+        limit = self._limit(limit)
+        blockchain = self.blockchain
+        columns = blockchain.chain.columns
+        index = blockchain.index
+        height = blockchain.snapshot().height
+        first_height, end_height = blockchain.time_index.heights_between(
+            0.0 if start is None else start, float('inf') if end is None else end)
+        lo, hi = (first_height,), (min(end_height, height),)
+        if cursor is not None:
+            hi = min(hi, _parse_posting(cursor))
+
+        posting_lists = [index.recipient_postings(account)] + [
+            index.sender_postings(account, operation)
+            for operation, (debit_sender, _) in blockchain.balance_manager.TOKEN_OPERATIONS.items()
+            if debit_sender
+        ]
+        postings = heapq.merge(*(_descending(postings, lo, hi) for postings in posting_lists), reverse=True)
+        entries, more, previous = [], False, None
+        for posting in postings:
+            if posting == previous:
+                continue  # A transfer to oneself is in both the sender and recipient lists
+            previous = posting
+            entry = _balance_entry(columns, account, posting)
+            if entry is None:
+                continue
+            if len(entries) == limit:
+                more = True
+                break
+            entries.append(entry)
+        next_cursor = f"{entries[-1]['height']}:{entries[-1]['position']}" if more else None
+        return {"account": account, "height": height, "entries": entries, "next_cursor": next_cursor}
+
+    def _limit(self, limit):
+        if limit is None:
+            return self.DEFAULT_LIMIT
+        limit = _parse_int(limit, "limit")
+        if not 1 <= limit <= self.MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {self.MAX_LIMIT}.")
+        return limit
+
+
+def _first_row(columns, height):
+    """Return the row number of the first transaction at or after height."""
+    if height < columns.base:
+        return 0
+    if height >= columns.height:
+        return len(columns.tx_height)
+    return columns.block_first_row[height - columns.base]
+
+
+def _descending(postings, lo, hi):
+    """Yield the postings from lo (inclusive) to hi (exclusive), newest first."""
+    for i in range(bisect_left(postings, hi) - 1, bisect_left(postings, lo) - 1, -1):
+        yield postings[i]
+
+
+def _balance_entry(columns, account, posting):
+    """Return the history entry of account for the transaction at posting, or None if its balance did not move."""
+    h, position = posting
+    i = columns.block_first_row[h - columns.base] + position
+    row = columns.row(i)
+    if row.sender == row.recipient or row.amount is None:
+        return None  # A transfer to oneself moves nothing
+    if row.sender == account:
+        change, balance, counterparty = -row.amount, columns.tx_sender_balance[i], row.recipient
+    else:
+        change, balance, counterparty = row.amount, columns.tx_recipient_balance[i], row.sender
+    if math.isnan(balance) or not change:
+        return None
+    return {
+        "height": h, "position": position, "hash": row.hash, "operation": row.operation,
+        "counterparty": counterparty, "change": change, "balance": balance, "timestamp": row.timestamp,
+    }
+
+
+def _parse_int(value, name):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name} {value!r}.")
+    if number < 0:
+        raise ValueError(f"Invalid {name} {value!r}.")
+    return number
+
+
+def _parse_posting(cursor):
+    """Parse a 'height:position' transaction cursor into a posting."""
+    height, _, position = str(cursor).partition(':')
+    return _parse_int(height, "cursor"), _parse_int(position or None, "cursor")
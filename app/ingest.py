@@ -0,0 +1,266 @@
+import csv
+import io
+import json
+import math
+from app.time_index import parse_timestamp
+from app.transaction import Transaction
+
+EMISSION_RECIPIENT = 'DID:example:environmentalAgency'
+# Emission figures each profession reports, on top of the common 'amount' (tCO2e)
+EMISSION_SCHEMAS = {
+    'civil_engineer': ('materials_used', 'machinery_emissions', 'energy_consumption'),
+    'mechanical_engineer': ('energy_usage', 'operation_hours', 'fuel_consumption'),
+    'electronics_engineer': ('power_usage', 'recycling_efforts'),
+}
+TEXT_FIELDS = ('emission_source', 'activity_type', 'compliance_status', 'reporting_period')
+COMPLIANCE_STATUSES = ('compliant', 'non-compliant')
+FORMATS = ('csv', 'jsonl')
+
+
+class IngestError(ValueError):
+    """Raised when a row of an emissions file does not match its reporter's schema."""
+
+
+class IngestReport:
+    """
+    Outcome of one ingestion run: row counts and the errors of rejected rows.
+
+    At most max_errors errors are kept, so a report stays small however bad the file.
+    """
+
+    def __init__(self, max_errors=1000):
+        self.rows = 0  # Rows read, blank lines excluded
+        self.committed = 0  # Rows now on the chain
+        self.duplicates = 0  # Rows already on the chain from an earlier upload
+        self.pending = 0  # Rows queued but left for another authority's block
+        self.blocks = 0  # Blocks sealed by this run
+        self.error_count = 0
+        self.errors = []  # [{"line", "error"}], the first max_errors
+        self.max_errors = max_errors
+
+    def add_error(self, line, error):
+        """Record that the row at line was rejected."""
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": str(error)})
+
+    def to_dict(self):
+        """Return the report as a JSON-serializable dict."""
+        return {
+            "rows": self.rows,
+            "committed": self.committed,
+            "duplicates": self.duplicates,
+            "pending": self.pending,
+            "rejected": self.error_count,
+            "blocks": self.blocks,
+            "errors": self.errors,
+        }
+
+
+class EmissionIngestor:
+    """
+    Streams a CSV or JSONL file of emission reports onto the chain.
+
+    Rows are read one at a time from any iterable of lines (an open file, an
+    upload stream), checked against the reporter's profession schema, turned into
+    CARBON_EMISSION transactions and committed chunk_size at a time with
+    Blockchain.commit_transactions(). Only one chunk is held in memory, so the
+    file size does not matter. Rejected rows are listed in the IngestReport with
+    their line number instead of stopping the run.
+
+    A row names its reporter in 'username' and may hold 'timestamp' (Unix seconds
+    or ISO 8601, default now), 'recipient', 'profession' (checked against the
+    registered one), the TEXT_FIELDS, 'amount' and the figures of the reporter's
+    EMISSION_SCHEMAS entry. A figure is a non-negative number or an object of
+    them; in CSV, 'materials_used.concrete' columns build that object. Rows with
+    an explicit timestamp hash the same every time, so uploading a file twice
+    does not duplicate its reports.
+    """
+
+    def __init__(self, blockchain, chunk_size=500, max_errors=1000):
+        """
+        Initialize the ingestor.
+
+        Args:
+            blockchain (Blockchain): The chain to commit to (or a RemoteBlockchain).
+            chunk_size (int): Transactions committed per batch.
+            max_errors (int): Row errors kept in the report.
+        """
+        self.blockchain = blockchain
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self._professions = {}  # Username -> registered profession
+
+    def ingest(self, lines, format='csv', sender=None):
+        """
+        Validate and commit every row of an emissions file.
+
+        Args:
+            lines (iterable): Lines of text (or bytes, decoded as UTF-8).
+            format (str): 'csv' (with a header row) or 'jsonl'.
+            sender (str, optional): Only accept rows reported by this user; rows
+                without a username are attributed to them.
+
+        Returns:
+            IngestReport: Counts and per-row errors.
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format!r}; expected one of {', '.join(FORMATS)}.")
+        report = IngestReport(self.max_errors)
+        chunk = []  # [(line, transaction)]
+        for line, row in read_rows(lines, format):
+            report.rows += 1
+            try:
+                chunk.append((line, self.build_transaction(row, sender)))
+            except IngestError as e:
+                report.add_error(line, e)
+                continue
+            if len(chunk) >= self.chunk_size:
+                self._commit(chunk, report)
+                chunk = []
+        if chunk:
+            self._commit(chunk, report)
+        return report
+
+    def _commit(self, chunk, report):
+        result = self.blockchain.commit_transactions([transaction for _, transaction in chunk])
+        for position, error in result["refused"].items():
+            report.add_error(chunk[position][0], error)
+        report.duplicates += len(result["duplicates"])
+        report.pending += len(result["pending"])
+        report.committed += len(chunk) - len(result["refused"]) - len(result["duplicates"]) - len(result["pending"])
+        report.blocks += result["blocks"]
+
+    def build_transaction(self, row, sender=None):
+        """
+        Check one row against its reporter's schema and build its transaction.
+
+        Args:
+            row (dict or str): A CSV row, or a JSONL line.
+            sender (str, optional): See ingest().
+
+        Returns:
+            Transaction: The CARBON_EMISSION transaction of the row.
+
+        Raises:
+            IngestError: If the row is malformed or does not match the schema.
+        """
+        if isinstance(row, str):
+            try:
+                row = json.loads(row)
+            except ValueError as e:
+                raise IngestError(f"Invalid JSON: {e}")
+            if not isinstance(row, dict):
+                raise IngestError("Each line must hold a JSON object.")
+        else:
+            row = _nest_columns(row)
+
+        username = row.pop('username', None) or sender
+        if not username:
+            raise IngestError("Missing 'username'.")
+        if sender is not None and username != sender:
+            raise IngestError(f"Rows can only be reported as {sender}, not {username}.")
+        profession = self._profession(username)
+        if profession not in EMISSION_SCHEMAS:
+            raise IngestError(f"{username} is not a registered engineer.")
+        declared = row.pop('profession', None)
+        if declared and declared != profession:
+            raise IngestError(f"{username} is registered as {profession}, not {declared}.")
+        timestamp = _timestamp(row.pop('timestamp', None))
+        recipient = row.pop('recipient', None) or EMISSION_RECIPIENT
+
+        figures = ('amount',) + EMISSION_SCHEMAS[profession]
+        data = {}
+        for field, value in row.items():
+            if field in TEXT_FIELDS:
+                data[field] = str(value)
+            elif field in figures:
+                data[field] = _figure(field, value)
+            else:
+                raise IngestError(f"Field {field!r} is not part of the {profession} schema.")
+        if not any(field in data for field in figures):
+            raise IngestError(f"No emission figures; expected one of {', '.join(figures)}.")
+        if data.get('compliance_status', COMPLIANCE_STATUSES[0]) not in COMPLIANCE_STATUSES:
+            raise IngestError(f"Invalid compliance_status {data['compliance_status']!r}.")
+        return Transaction('CARBON_EMISSION', username, recipient, data=data, timestamp=timestamp)
+
+    def _profession(self, username):
+        if username not in self._professions:
+            user_data = self.blockchain.get_user_data(username)
+            self._professions[username] = (user_data or {}).get('profession')
+        return self._professions[username]
+
+
+def read_rows(lines, format='csv'):
+    """
+    Yield the rows of a CSV or JSONL file one at a time.
+
+    Args:
+        lines (iterable): Lines of text, or bytes decoded as UTF-8.
+        format (str): 'csv' (with a header row) or 'jsonl'.
+
+    Yields:
+        tuple: (line number, row), where row is a dict for CSV and the raw line for JSONL.
+    """
+    lines = (line.decode('utf-8') if isinstance(line, bytes) else line for line in lines)
+    if format == 'jsonl':
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                yield number, line
+        return
+    reader = csv.DictReader(lines)
+    for row in reader:
+        if any(value for value in row.values() if isinstance(value, str)):
+            yield reader.line_num, row
+
+
+def open_text(stream):
+    """Wrap a binary stream (e.g. an uploaded file) so it yields lines of text."""
+    return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+
+def _nest_columns(row):
+    """Turn the flat columns of a CSV row into fields; 'a.b' columns become {'b': ...} under 'a'."""
+    if None in row:
+        raise IngestError("The row has more cells than the header.")
+    fields = {}
+    for column, value in row.items():
+        if value is None or value.strip() == '':
+            continue
+        field, _, key = column.strip().partition('.')
+        if key:
+            if not isinstance(fields.setdefault(field, {}), dict):
+                raise IngestError(f"Column {column!r} conflicts with column {field!r}.")
+            fields[field][key] = value.strip()
+        elif field in fields:
+            raise IngestError(f"Column {field!r} is given twice.")
+        else:
+            fields[field] = value.strip()
+    return fields
+
+
+def _figure(field, value):
+    """Return a figure as a non-negative float, or a dict of them."""
+    if isinstance(value, dict):
+        if not value:
+            raise IngestError(f"{field} is empty.")
+        return {str(key): _figure(f"{field}.{key}", item) for key, item in value.items()}
+    if isinstance(value, bool):
+        raise IngestError(f"{field}: {value!r} is not a number.")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise IngestError(f"{field}: {value!r} is not a number.")
+    if not math.isfinite(number) or number < 0:
+        raise IngestError(f"{field}: {value!r} must be a non-negative number.")
+    return number
+
+
+def _timestamp(value):
+    """Return a row's timestamp as Unix seconds, or None to stamp it now."""
+    if value is None or value == '':
+        return None
+    try:
+        return parse_timestamp(value)
+    except ValueError as e:
+        raise IngestError(str(e))
@@ -0,0 +1,155 @@
+import hashlib
+import hmac
+import math
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+PUBLIC_EXPONENT = 65537
+# FIPS 186-4 table C.2: Miller-Rabin rounds for the 1024-bit primes of a 2048-bit key
+MILLER_RABIN_ROUNDS = 5
+SIEVE_LIMIT = 1 << 16
+SIEVE_WINDOW = 4096  # Odd candidates sieved at a time
+
+
+def _odd_primes_below(limit):
+    sieve = bytearray([1]) * limit
+    sieve[:2] = b'\x00\x00'
+    for p in range(2, math.isqrt(limit) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = bytes(len(range(p * p, limit, p)))
+    return [p for p in range(3, limit, 2) if sieve[p]]
+
+
+# Used to strike out candidates with a small factor before any Miller-Rabin round
+_SMALL_PRIMES = _odd_primes_below(SIEVE_LIMIT)
+
+
+class HmacDrbg:
+    """
+    Deterministic random bit generator (HMAC_DRBG from NIST SP 800-90A, SHA-512).
+
+    The same seed and personalization always produce the same byte stream, which
+    is what makes keys reproducible from a secret phrase.
+    """
+
+    def __init__(self, seed, personalization=b''):
+        """
+        Instantiate the generator.
+
+        Args:
+            seed (bytes): Entropy input, e.g. a BIP-39 seed.
+            personalization (bytes): Domain separation string.
+        """
+        self.key = b'\x00' * 64
+        self.value = b'\x01' * 64
+        self._update(seed + personalization)
+
+    def _update(self, data=b''):
+        self.key = hmac.new(self.key, self.value + b'\x00' + data, hashlib.sha512).digest()
+        self.value = hmac.new(self.key, self.value, hashlib.sha512).digest()
+        if data:
+            self.key = hmac.new(self.key, self.value + b'\x01' + data, hashlib.sha512).digest()
+            self.value = hmac.new(self.key, self.value, hashlib.sha512).digest()
+
+    def generate(self, length):
+        """Return the next length bytes of the stream."""
+        output = b''
+        while len(output) < length:
+            self.value = hmac.new(self.key, self.value, hashlib.sha512).digest()
+            output += self.value
+        self._update()
+        return output[:length]
+
+    def randbits(self, bits):
+        """Return the next value of the stream as a bits-bit integer."""
+        return int.from_bytes(self.generate((bits + 7) // 8), 'big') >> (-bits % 8)
+
+
+def is_probable_prime(n, drbg, rounds=MILLER_RABIN_ROUNDS):
+    """
+    Miller-Rabin primality test with bases drawn from drbg.
+
+    Args:
+        n (int): The candidate.
+        drbg (HmacDrbg): Source of the test bases, so the outcome is reproducible.
+        rounds (int): Number of bases; the error bound is 4**-rounds.
+
+    Returns:
+        bool: False if n is composite, True if it is prime with overwhelming probability.
+    """
+    if n < 4:
+        return n in (2, 3)
+    if n % 2 == 0:
+        return False
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for _ in range(rounds):
+        a = 2 + drbg.randbits(n.bit_length()) % (n - 3)
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _generate_prime(drbg, bits):
+    """
+    Return the first suitable prime at or after a random bits-bit odd start.
+
+    The two top bits are set so that the product of two such primes has exactly
+    2 * bits bits. Odd candidates are sieved by every prime below SIEVE_LIMIT, a
+    window at a time, so Miller-Rabin only runs on the few that survive.
+    """
+    while True:
+        start = drbg.randbits(bits) | (0b11 << (bits - 2)) | 1
+        # composite[k] is set when start + 2k has a small factor
+        composite = bytearray(SIEVE_WINDOW)
+        for p in _SMALL_PRIMES:
+            # First k with start + 2k = 0 (mod p); 2 is invertible mod an odd p
+            first = (-start % p) * ((p + 1) // 2) % p
+            composite[first::p] = b'\x01' * len(range(first, SIEVE_WINDOW, p))
+        for k in range(SIEVE_WINDOW):
+            candidate = start + 2 * k
+            if composite[k] or candidate.bit_length() > bits:
+                continue
+            if math.gcd(candidate - 1, PUBLIC_EXPONENT) == 1 and is_probable_prime(candidate, drbg):
+                return candidate
+
+
+def derive_rsa_private_key(seed, key_size=2048, personalization=b'greenledger/rsa'):
+    """
+    Derive an RSA private key deterministically from a seed.
+
+    Args:
+        seed (bytes): The BIP-39 seed of the user's secret phrase.
+        key_size (int): Modulus size in bits.
+        personalization (bytes): Domain separation, so the same seed can derive other keys.
+
+    Returns:
+        RSAPrivateKey: The same key for the same seed, every time.
+    """
+    drbg = HmacDrbg(seed, personalization + b'/%d' % key_size)
+    half = key_size // 2
+    p = _generate_prime(drbg, half)
+    q = _generate_prime(drbg, half)
+    # Primes this close would make the modulus easy to factor; draw again
+    while q == p or abs(p - q).bit_length() <= half - 100:
+        q = _generate_prime(drbg, half)
+    if p < q:
+        p, q = q, p
+
+    n = p * q
+    d = pow(PUBLIC_EXPONENT, -1, math.lcm(p - 1, q - 1))
+    return rsa.RSAPrivateNumbers(
+        p=p, q=q, d=d,
+        dmp1=rsa.rsa_crt_dmp1(d, p),
+        dmq1=rsa.rsa_crt_dmq1(d, q),
+        iqmp=rsa.rsa_crt_iqmp(p, q),
+        public_numbers=rsa.RSAPublicNumbers(PUBLIC_EXPONENT, n)
+    ).private_key()
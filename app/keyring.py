@@ -0,0 +1,167 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+from cryptography.fernet import Fernet, MultiFernet
+
+VERIFIER_SCHEME = 'pbkdf2_sha256'
+# The phrases are 128-bit BIP-39 mnemonics, not user-chosen passwords, so the
+# stretching only has to make offline guessing pointless, not slow
+VERIFIER_ITERATIONS = 10000
+
+
+class KeyringError(ValueError):
+    """Raised when the keyring file or variable holds no usable Fernet keys."""
+
+
+class Keyring:
+    """
+    Persistent set of Fernet keys shared by every process of a deployment.
+
+    The first key encrypts; all keys decrypt (MultiFernet), so a key can be
+    rotated without losing the secret phrases already stored on chain. Keys are
+    read from the SECRET_KEYRING environment variable (comma-separated, newest
+    first) or from a JSON file, which is created with a fresh key on first use.
+    """
+
+    def __init__(self, filename='secret.keyring', keys=None):
+        """
+        Load the keyring, creating the file if needed.
+
+        Args:
+            filename (str): Path of the keyring file.
+            keys (list, optional): Fernet keys, newest first; skips the file and the environment.
+        """
+        self.filename = filename
+        if keys is None:
+            keys = _split_keys(os.environ.get('SECRET_KEYRING', '')) or self._load_or_create()
+        self._set_keys(keys)
+
+    @classmethod
+    def from_environment(cls):
+        """Open the keyring named by SECRET_KEYRING_FILE (default secret.keyring)."""
+        return cls(os.environ.get('SECRET_KEYRING_FILE', 'secret.keyring'))
+
+    def _set_keys(self, keys):
+        keys = [key.encode() if isinstance(key, str) else key for key in keys]
+        if not keys:
+            raise KeyringError("The keyring holds no keys.")
+        try:
+            self.cipher = MultiFernet([Fernet(key) for key in keys])
+        except ValueError as e:
+            raise KeyringError(f"Invalid Fernet key in the keyring: {e}")
+        self.keys = keys
+
+    @property
+    def primary_key(self):
+        """The key new tokens are encrypted with."""
+        return self.keys[0]
+
+    def _load_or_create(self):
+        try:
+            return self._read()
+        except FileNotFoundError:
+            pass
+        # Publish the new file with a hard link, so concurrently starting workers
+        # either create it or read the one that won; none ever sees it half written
+        tmp_filename = f"{self.filename}.{os.getpid()}.tmp"
+        keys = [Fernet.generate_key()]
+        _write_private(tmp_filename, keys)
+        try:
+            os.link(tmp_filename, self.filename)
+            print(f"Created keyring {self.filename}.")
+        except FileExistsError:
+            keys = self._read()
+        finally:
+            os.remove(tmp_filename)
+        return keys
+
+    def _read(self):
+        with open(self.filename, 'r') as f:
+            try:
+                return json.load(f)["keys"]
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                raise KeyringError(f"Unreadable keyring {self.filename}: {e}")
+
+    def rotate(self):
+        """
+        Make a new key the primary key and save the keyring.
+
+        Older keys stay in the ring so existing tokens still decrypt. Processes
+        that already loaded the keyring keep encrypting with the old key until
+        they restart.
+
+        Returns:
+            bytes: The new primary key.
+        """
+        keys = [Fernet.generate_key()] + self.keys
+        tmp_filename = self.filename + '.tmp'
+        _write_private(tmp_filename, keys)
+        os.replace(tmp_filename, self.filename)
+        self._set_keys(keys)
+        return self.primary_key
+
+    def encrypt(self, data):
+        """Encrypt bytes with the primary key."""
+        return self.cipher.encrypt(data)
+
+    def decrypt(self, token):
+        """Decrypt a token made with any key of the ring."""
+        return self.cipher.decrypt(token)
+
+    def reencrypt(self, token):
+        """Return token re-encrypted with the primary key."""
+        return self.cipher.rotate(token)
+
+
+def _split_keys(value):
+    return [key.strip() for key in value.split(',') if key.strip()]
+
+
+def _write_private(filename, keys):
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({"keys": [key.decode() if isinstance(key, bytes) else key for key in keys]}, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def make_verifier(secret, iterations=VERIFIER_ITERATIONS):
+    """
+    Hash a secret phrase for storage, so it can be checked without decrypting anything.
+
+    Args:
+        secret (str): The secret phrase.
+        iterations (int): PBKDF2 iterations, recorded in the verifier.
+
+    Returns:
+        str: 'pbkdf2_sha256$iterations$salt$hash', salt and hash base64-encoded.
+    """
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac('sha256', secret.encode(), salt, iterations)
+    return '$'.join([
+        VERIFIER_SCHEME, str(iterations),
+        base64.b64encode(salt).decode(), base64.b64encode(digest).decode()
+    ])
+
+
+def check_verifier(secret, verifier):
+    """
+    Check a secret phrase against a stored verifier in constant time.
+
+    Args:
+        secret (str): The phrase to check.
+        verifier (str): A value returned by make_verifier.
+
+    Returns:
+        bool: True if the phrase matches.
+    """
+    try:
+        scheme, iterations, salt, expected = verifier.split('$')
+        if scheme != VERIFIER_SCHEME:
+            return False
+        digest = hashlib.pbkdf2_hmac('sha256', secret.encode(), base64.b64decode(salt), int(iterations))
+        return hmac.compare_digest(digest, base64.b64decode(expected))
+    except (ValueError, AttributeError):
+        return False
@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+from app.block import Block
+
+
+class LazyChain:
+    """
+    List-like view of the chain that decodes blocks from the block log on demand.
+
+    Opening the chain only loads the record offsets; a Block is built the first
+    time its height is accessed and kept in a bounded LRU cache. Supports the
+    list operations the rest of the code uses: len(), indexing (including
+    negative indices and slices), iteration, truthiness and append().
+
+    When columns are attached, every appended block is also added to them, so
+    the compact columnar summary always covers the whole chain.
+
+    A node bootstrapped from a state snapshot keeps no blocks below its base
+    height: the log starts with the block at base, heights still count from
+    genesis, and reading a pruned height raises IndexError.
+    """
+
+    def __init__(self, storage, cache_size=1024, columns=None, base=0):
+        """
+        Open the chain stored in a block log.
+
+        Args:
+            storage (BlockLog): The log holding the blocks.
+            cache_size (int): Maximum number of decoded blocks kept in memory.
+            columns (ChainColumns, optional): Columnar summary kept in step with the chain.
+            base (int): Height of the first block in the log.
+        """
+        self.storage = storage
+        self.base = base
+        self.cache_size = cache_size
+        self.columns = columns
+        self.offsets = storage.load_offsets()
+        self._cache = OrderedDict()  # height -> Block, least recently used first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.base + len(self.offsets)
+
+    def __bool__(self):
+        return len(self.offsets) > 0
+
+    def __iter__(self):
+        for height in range(self.base, len(self)):
+            yield self[height]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[height] for height in range(*key.indices(len(self)))]
+        height = key + len(self) if key < 0 else key
+        if not 0 <= height < len(self):
+            raise IndexError("block height out of range")
+        if height < self.base:
+            raise IndexError(f"block height {height} is pruned")
+
+        with self._lock:
+            block = self._cache.get(height)
+            if block is not None:
+                self._cache.move_to_end(height)
+                return block
+        block = Block.from_dict(self.storage.read_at(self.offsets[height - self.base]))
+        self._remember(height, block)
+        return block
+
+    def read_data(self, height):
+        """
+        Return the stored dictionary of a block without building or caching a Block.
+
+        Args:
+            height (int): The block height.
+
+        Returns:
+            dict: The block as stored in the log.
+        """
+        if height < self.base:
+            raise IndexError(f"block height {height} is pruned")
+        return self.storage.read_at(self.offsets[height - self.base])
+
+    def append(self, block):
+        """
+        Persist a new block at the end of the log and cache it.
+
+        Args:
+            block (Block): The block to append.
+        """
+        offset = self.storage.append(block.to_dict())
+        self.offsets.append(offset)
+        if self.columns is not None:
+            self.columns.add_block(block)
+        self._remember(len(self) - 1, block)
+
+    def reload(self):
+        """Re-read the offsets after the log has been rewritten, dropping every cached block."""
+        self.storage.close()
+        with self._lock:
+            self._cache.clear()
+        self.offsets = self.storage.load_offsets()
+
+    def _remember(self, height, block):
+        with self._lock:
+            self._cache[height] = block
+            self._cache.move_to_end(height)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
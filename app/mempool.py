@@ -0,0 +1,253 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+
+
+class MempoolError(ValueError):
+    """Raised when a transaction is refused by the mempool or evicted from it."""
+
+
+class Mempool:
+    """
+    Pending transactions, keyed by Transaction.hash.
+
+    Transactions are kept in one insertion-ordered dict per priority class, so
+    adding, looking up and removing one is O(1), and iterating yields the highest
+    priority first and oldest first within a priority. Each sender may have at
+    most max_per_sender pending transactions, and SYSTEM, which sends a credit
+    with every registration, at most max_per_system_sender. When the pool exceeds
+    max_transactions or max_bytes, the newest transactions of the lowest priority
+    are evicted; a new transaction that would itself be the one evicted is refused.
+
+    Transactions linked with link() are evicted together, so a registration never
+    loses its credit. Once one of them leaves the pool to be sealed, the others
+    are no longer evicted at all.
+    """
+
+    # Lower value = sealed first; everything else gets DEFAULT_PRIORITY
+    PRIORITIES = {
+        'USER_REGISTRATION': 0,
+        'STORE_DID': 0,
+        'TAX_PAYMENT': 1,
+        'TAX_CREDIT': 1,
+        'TAX_AUDIT': 1,
+    }
+    DEFAULT_PRIORITY = 2
+    SYSTEM_SENDERS = {'SYSTEM'}  # Registration credits and state commitments come from here
+
+    def __init__(self, max_transactions=50000, max_bytes=50000000, max_per_sender=1000,
+                 max_per_system_sender=10000, on_evict=None):
+        """
+        Initialize an empty mempool.
+
+        Args:
+            max_transactions (int): Maximum number of pending transactions.
+            max_bytes (int): Maximum total serialized size of the pending transactions.
+            max_per_sender (int): Maximum pending transactions per sender.
+            max_per_system_sender (int): Maximum pending transactions of each SYSTEM_SENDERS account.
+            on_evict (callable, optional): Called with each evicted transaction.
+        """
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.max_per_sender = max_per_sender
+        self.max_per_system_sender = max_per_system_sender
+        self.on_evict = on_evict
+        self._tiers = [OrderedDict() for _ in range(self.DEFAULT_PRIORITY + 1)]  # hash -> (tx, size, added)
+        self._by_sender = {}  # sender -> OrderedDict of its pending hashes
+        self._priority = {}  # hash -> priority class
+        self._links = {}  # hash -> list of the pending hashes evicted with it
+        self._pinned = set()  # Hashes linked to a transaction that is being sealed; never evicted
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._added = 0
+        self._duplicates = 0
+        self._rejected = 0
+        self._evicted = 0
+
+    @classmethod
+    def priority(cls, transaction):
+        """Return the priority class of a transaction (0 is sealed first)."""
+        return cls.PRIORITIES.get(transaction.operation, cls.DEFAULT_PRIORITY)
+
+    @staticmethod
+    def transaction_size(transaction):
+        """Return the serialized size of a transaction in bytes."""
+        return len(json.dumps(transaction.to_dict(), separators=(',', ':')))
+
+    def add(self, transaction, size=None):
+        """
+        Add a transaction unless it is already pending.
+
+        Args:
+            transaction (Transaction): The transaction to add.
+            size (int, optional): Its serialized size, if already known.
+
+        Returns:
+            bool: True if added, False if a transaction with the same hash is pending.
+
+        Raises:
+            MempoolError: If the sender has too many pending transactions, or the
+                pool is full of transactions of at least the same priority.
+        """
+        size = size if size is not None else self.transaction_size(transaction)
+        priority = self.priority(transaction)
+        with self._lock:
+            if transaction.hash in self._priority:
+                self._duplicates += 1
+                return False
+            sender = transaction.sender
+            limit = self.max_per_system_sender if sender in self.SYSTEM_SENDERS else self.max_per_sender
+            if len(self._by_sender.get(sender, ())) >= limit:
+                self._rejected += 1
+                raise MempoolError(f"Sender {sender} already has {limit} pending transactions.")
+            if size > self.max_bytes:
+                self._rejected += 1
+                raise MempoolError("Transaction is larger than the mempool.")
+
+            self._tiers[priority][transaction.hash] = (transaction, size, time.monotonic())
+            self._priority[transaction.hash] = priority
+            self._by_sender.setdefault(sender, OrderedDict())[transaction.hash] = None
+            self._bytes += size
+            self._added += 1
+
+            evicted = []
+            while len(self._priority) > self.max_transactions or self._bytes > self.max_bytes:
+                victim = self._eviction_candidate()
+                if victim.hash == transaction.hash:
+                    self._remove(victim.hash)
+                    self._added -= 1
+                    self._rejected += 1
+                    raise MempoolError("Mempool is full.")
+                for tx_hash in list(self._links.get(victim.hash, [victim.hash])):
+                    evicted.append(self._remove(tx_hash))
+                    self._evicted += 1
+        if self.on_evict is not None:
+            for victim in evicted:
+                self.on_evict(victim)
+        return True
+
+    def link(self, transactions):
+        """
+        Evict pending transactions together, e.g. a registration and its credit.
+
+        Args:
+            transactions (list): Pending transactions; others are ignored.
+        """
+        with self._lock:
+            hashes = [transaction.hash for transaction in transactions if transaction.hash in self._priority]
+            for tx_hash in hashes:
+                self._links[tx_hash] = hashes
+
+    def _eviction_candidate(self):
+        for tier in reversed(self._tiers):
+            for transaction, _, _ in reversed(tier.values()):
+                if transaction.hash not in self._pinned:
+                    return transaction  # Newest of the lowest priority
+
+    def _unlink(self, tx_hash, pin):
+        """Drop tx_hash from its link; if pin, keep the transactions left from being evicted."""
+        hashes = self._links.pop(tx_hash, None)
+        if hashes is not None:
+            hashes.remove(tx_hash)
+            if pin:
+                for other in hashes:
+                    del self._links[other]
+                self._pinned.update(hashes)
+
+    def _remove(self, tx_hash, pin=False):
+        self._unlink(tx_hash, pin)
+        self._pinned.discard(tx_hash)
+        priority = self._priority.pop(tx_hash)
+        transaction, size, _ = self._tiers[priority].pop(tx_hash)
+        hashes = self._by_sender[transaction.sender]
+        del hashes[tx_hash]
+        if not hashes:
+            del self._by_sender[transaction.sender]
+        self._bytes -= size
+        return transaction
+
+    def remove(self, transaction):
+        """
+        Remove a transaction, e.g. once it has been sealed into a block.
+
+        Returns:
+            bool: True if it was pending.
+        """
+        with self._lock:
+            if transaction.hash not in self._priority:
+                return False
+            self._remove(transaction.hash, pin=True)
+            return True
+
+    def remove_many(self, transactions):
+        """Remove every pending transaction of an iterable; others are ignored."""
+        with self._lock:
+            for transaction in transactions:
+                if transaction.hash in self._priority:
+                    self._remove(transaction.hash, pin=True)
+
+    def get(self, tx_hash):
+        """Return the pending transaction with a hash, or None."""
+        with self._lock:
+            priority = self._priority.get(tx_hash)
+            return None if priority is None else self._tiers[priority][tx_hash][0]
+
+    def size_of(self, transaction):
+        """Return the recorded serialized size of a pending transaction, or None."""
+        with self._lock:
+            priority = self._priority.get(transaction.hash)
+            return None if priority is None else self._tiers[priority][transaction.hash][1]
+
+    def from_sender(self, sender):
+        """Return the pending transactions of a sender, oldest first."""
+        with self._lock:
+            return [self.get(tx_hash) for tx_hash in self._by_sender.get(sender, ())]
+
+    def head(self, count):
+        """Return up to count pending transactions in sealing order."""
+        with self._lock:
+            return list(islice((entry[0] for tier in self._tiers for entry in tier.values()), count))
+
+    def transactions(self):
+        """Return the pending transactions in sealing order: priority, then age."""
+        with self._lock:
+            return [entry[0] for tier in self._tiers for entry in tier.values()]
+
+    def __iter__(self):
+        return iter(self.transactions())
+
+    def __contains__(self, transaction):
+        return transaction.hash in self._priority
+
+    def __len__(self):
+        return len(self._priority)
+
+    @property
+    def pending_bytes(self):
+        """Total serialized size of the pending transactions."""
+        return self._bytes
+
+    def metrics(self):
+        """
+        Report the pool's load.
+
+        Returns:
+            dict: Pending count and bytes, count per priority, age of the oldest
+                  pending transaction in seconds, and the add/duplicate/reject/evict counters.
+        """
+        now = time.monotonic()
+        with self._lock:
+            oldest = min((next(iter(tier.values()))[2] for tier in self._tiers if tier), default=None)
+            return {
+                "pending": len(self._priority),
+                "pending_bytes": self._bytes,
+                "by_priority": [len(tier) for tier in self._tiers],
+                "senders": len(self._by_sender),
+                "oldest_age_seconds": round(now - oldest, 3) if oldest is not None else None,
+                "added": self._added,
+                "duplicates": self._duplicates,
+                "rejected": self._rejected,
+                "evicted": self._evicted
+            }
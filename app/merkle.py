@@ -0,0 +1,109 @@
+import hashlib
+
+# Domain separation so that a leaf can never be confused with an interior node
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def _leaf(tx_hash):
+    return _leaf_digest(bytes.fromhex(tx_hash))
+
+
+def _leaf_digest(digest):
+    leaf = hashlib.sha256(LEAF_PREFIX)
+    leaf.update(digest)
+    return leaf.digest()
+
+
+def _node(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def merkle_root(tx_hashes):
+    """
+    Compute the Merkle root over a list of transaction hashes.
+
+    An odd node at the end of a level is promoted unchanged to the next level
+    rather than paired with itself.
+
+    Args:
+        tx_hashes (list): Hex-encoded SHA-256 transaction hashes, in block order.
+
+    Returns:
+        str: The hex-encoded Merkle root (the hash of the empty string for no transactions).
+    """
+    return merkle_root_from_digests([bytes.fromhex(tx_hash) for tx_hash in tx_hashes])
+
+
+def merkle_root_from_digests(digests):
+    """
+    Compute the Merkle root over raw 32-byte transaction hashes.
+
+    Accepts any bytes-like objects (including memoryview slices of a mapped file),
+    so callers holding binary hashes need not convert them to hex first.
+
+    Args:
+        digests (list): Raw SHA-256 transaction hashes, in block order.
+
+    Returns:
+        str: The hex-encoded Merkle root.
+    """
+    if not digests:
+        return hashlib.sha256(b'').hexdigest()
+    level = [_leaf_digest(digest) for digest in digests]
+    while len(level) > 1:
+        level = [
+            _node(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+    return level[0].hex()
+
+
+def merkle_proof(tx_hashes, position):
+    """
+    Build an inclusion proof for the transaction at position.
+
+    Args:
+        tx_hashes (list): Hex-encoded transaction hashes, in block order.
+        position (int): Index of the transaction to prove.
+
+    Returns:
+        list: [side, sibling_hash] pairs from the leaf up to the root, where side is
+              'L' or 'R' depending on which side the sibling sits.
+    """
+    if not 0 <= position < len(tx_hashes):
+        raise IndexError("Transaction position out of range.")
+    proof = []
+    level = [_leaf(tx_hash) for tx_hash in tx_hashes]
+    while len(level) > 1:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append(['L' if sibling < position else 'R', level[sibling].hex()])
+        level = [
+            _node(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+        position //= 2
+    return proof
+
+
+def verify_merkle_proof(tx_hash, proof, root):
+    """
+    Check that tx_hash is included under root.
+
+    Args:
+        tx_hash (str): Hex-encoded transaction hash.
+        proof (list): The proof returned by merkle_proof.
+        root (str): The hex-encoded Merkle root committed in the block header.
+
+    Returns:
+        bool: True if the proof is valid, False otherwise.
+    """
+    try:
+        current = _leaf(tx_hash)
+        for side, sibling in proof:
+            sibling = bytes.fromhex(sibling)
+            current = _node(sibling, current) if side == 'L' else _node(current, sibling)
+    except (ValueError, TypeError):
+        return False
+    return current.hex() == root
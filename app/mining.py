@@ -0,0 +1,213 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait as wait_for_futures
+
+CANCEL_CHECK_INTERVAL = 1 << 14  # Nonces tried between checks of the cancel event
+
+# Set in each worker process by the pool initializer
+_cancel_event = None
+
+
+def _init_worker(cancel_event):
+    global _cancel_event
+    _cancel_event = cancel_event
+
+
+def _meets_difficulty(difficulty):
+    """Return a test on raw digests equivalent to hexdigest().startswith('0' * difficulty)."""
+    zero_bytes, half = divmod(difficulty, 2)
+    zeros = bytes(zero_bytes)
+    if half:
+        return lambda digest: digest[:zero_bytes] == zeros and digest[zero_bytes] < 16
+    return lambda digest: digest[:zero_bytes] == zeros
+
+
+def search_nonces(prefix, difficulty, start, stop):
+    """
+    Try the nonces in [start, stop) for a header prefix.
+
+    The prefix is hashed once; each attempt copies that SHA-256 state and only
+    feeds the nonce, which is how Block.hash_header() hashes a version 2 header.
+
+    Args:
+        prefix (bytes): Block.header_prefix() of the block being mined.
+        difficulty (int): Required number of leading zero hex digits.
+        start (int): First nonce to try.
+        stop (int): Nonce after the last one to try.
+
+    Returns:
+        tuple: (nonce, hash) of the first match or (None, None), and the number of attempts.
+    """
+    midstate = hashlib.sha256(prefix)
+    meets = _meets_difficulty(difficulty)
+    for low in range(start, stop, CANCEL_CHECK_INTERVAL):
+        if _cancel_event is not None and _cancel_event.is_set():
+            return None, None, low - start
+        for nonce in range(low, min(low + CANCEL_CHECK_INTERVAL, stop)):
+            attempt = midstate.copy()
+            attempt.update(str(nonce).encode())
+            digest = attempt.digest()
+            if meets(digest):
+                return nonce, digest.hex(), nonce - start + 1
+    return None, None, stop - start
+
+
+class MiningEngine:
+    """
+    Proof-of-work nonce search on a pool of worker processes.
+
+    The nonce space is cut into chunk_size ranges handed to the workers in order,
+    so the result is the first match found by any worker, not necessarily the
+    lowest nonce. cancel() (or on_commit() when another block takes the height)
+    stops every worker at its next check and makes mine() return False.
+
+    The chain itself seals blocks by proof of authority (Blockchain.mine_block
+    signs them and searches no nonce), so the engine only serves explicit
+    Block.mine_block(difficulty, engine=...) calls.
+    """
+
+    def __init__(self, max_workers=None, chunk_size=1 << 18):
+        """
+        Initialize the engine; worker processes start on the first mine().
+
+        Args:
+            max_workers (int, optional): Worker processes; defaults to the CPU count.
+            chunk_size (int): Nonces per work item.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._context = multiprocessing.get_context('spawn')  # The web process is multi-threaded
+        self._cancel = self._context.Event()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._mine_lock = threading.Lock()  # One search at a time: they share the cancel event
+        self._mining_height = None
+        self._committed_height = None  # Height after the last block on_commit() saw
+        self._hashes = 0
+        self._seconds = 0.0
+        self._blocks = 0
+        self._cancelled = 0
+        self._last_rate = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=self._context,
+                    initializer=_init_worker, initargs=(self._cancel,)
+                )
+            return self._executor
+
+    def mine(self, block, difficulty):
+        """
+        Find a nonce that gives block a hash with difficulty leading zeros.
+
+        Args:
+            block (Block): A version 2 block; its nonce and hash are set on success.
+            difficulty (int): Required number of leading zero hex digits.
+
+        Returns:
+            bool: True if the block was mined, False if the search was cancelled.
+        """
+        if block.version < 2:
+            raise ValueError("Only version 2 blocks can be mined by the engine.")
+        with self._mine_lock:
+            return self._mine(block, difficulty)
+
+    def _mine(self, block, difficulty):
+        prefix = block.header_prefix(block.header())
+        executor = self._pool()
+        with self._lock:
+            # on_commit() takes the same lock, so a block committed at this height
+            # either shows up here or cancels the search once it has started
+            if self._committed_height is not None and block.index < self._committed_height:
+                self._cancelled += 1
+                return False
+            self._cancel.clear()
+            self._mining_height = block.index
+
+        started = time.perf_counter()
+        hashes = 0
+        found = None
+        next_start = block.nonce + 1
+        running = set()
+        try:
+            while found is None and not self._cancel.is_set():
+                # Keep every worker busy with one chunk queued behind it
+                while len(running) < 2 * self.max_workers:
+                    running.add(executor.submit(
+                        search_nonces, prefix, difficulty, next_start, next_start + self.chunk_size
+                    ))
+                    next_start += self.chunk_size
+                done, running = wait_for_futures(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    nonce, block_hash, attempts = future.result()
+                    hashes += attempts
+                    if nonce is not None and found is None:
+                        found = (nonce, block_hash)
+        finally:
+            # Stop the chunks still in flight and count the work they did
+            self._cancel.set()
+            for future in running:
+                if not future.cancel():
+                    hashes += future.result()[2]
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._mining_height = None
+                self._hashes += hashes
+                self._seconds += elapsed
+                self._last_rate = hashes / elapsed if elapsed else None
+                if found is not None:
+                    self._blocks += 1
+                else:
+                    self._cancelled += 1
+
+        if found is None:
+            return False
+        block.nonce, block.hash = found
+        return True
+
+    def cancel(self):
+        """Stop the current search; mine() returns False."""
+        self._cancel.set()
+
+    def on_commit(self, block):
+        """
+        Commit hook: abandon the search once a block at the same height is committed.
+
+        Args:
+            block (Block): The block just committed.
+        """
+        with self._lock:
+            self._committed_height = block.index + 1
+            if self._mining_height is not None and block.index >= self._mining_height:
+                self._cancel.set()
+
+    def metrics(self):
+        """
+        Report the engine's throughput.
+
+        Returns:
+            dict: Hashes per second of the last search and overall, total hashes,
+                  mined and cancelled searches.
+        """
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "hashes": self._hashes,
+                "hashes_per_second": round(self._hashes / self._seconds) if self._seconds else None,
+                "last_hashes_per_second": round(self._last_rate) if self._last_rate else None,
+                "blocks_mined": self._blocks,
+                "cancelled": self._cancelled
+            }
+
+    def shutdown(self, wait=True):
+        """Stop the worker processes."""
+        self.cancel()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,185 @@
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BlockProducer:
+    """
+    Seals pending transactions into multi-transaction blocks.
+
+    A batch is sealed as soon as it reaches max_transactions or max_bytes, or when
+    the oldest pending transaction has waited max_delay seconds. Every queued
+    transaction gets a Future that resolves to the block that included it, so a
+    request handler can wait for inclusion.
+    """
+
+    def __init__(self, blockchain, max_transactions=100, max_bytes=1000000, max_delay=0.25):
+        """
+        Initialize the block producer.
+
+        Args:
+            blockchain (Blockchain): The chain whose pending transactions are sealed.
+            max_transactions (int): Maximum number of transactions per block.
+            max_bytes (int): Maximum serialized size of the transactions in a block.
+            max_delay (float): Maximum seconds a pending transaction waits before sealing.
+        """
+        self.blockchain = blockchain
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.running = False
+        self._condition = threading.Condition()
+        self._futures = {}  # Transaction hash -> Future resolved with the including block
+        self._sizes = {}  # Transaction hash -> serialized size in bytes
+        self._pending_bytes = 0
+        self._oldest_pending = None  # time.monotonic() of the oldest unsealed transaction
+
+    def track(self, transaction, size=None):
+        """
+        Register a newly queued transaction and wake the producer if a batch is full.
+
+        Args:
+            transaction (Transaction): The transaction added to the mempool.
+            size (int, optional): Its serialized size, if already known.
+
+        Returns:
+            Future: Resolves to the Block that includes the transaction.
+        """
+        size = size if size is not None else self.transaction_size(transaction)
+        with self._condition:
+            future = self._futures.get(transaction.hash)
+            if future is None:
+                future = self._futures[transaction.hash] = Future()
+                self._sizes[transaction.hash] = size
+                self._pending_bytes += size
+                if self._oldest_pending is None:
+                    self._oldest_pending = time.monotonic()
+                    self._condition.notify_all()  # Start the deadline for this batch
+            if self._batch_full():
+                self._condition.notify_all()
+        return future
+
+    def discard(self, transaction, error):
+        """
+        Stop tracking a transaction that will not be sealed, failing its Future.
+
+        Args:
+            transaction (Transaction): The transaction dropped from the mempool.
+            error (Exception): Raised to whoever waits on it.
+        """
+        with self._condition:
+            self._pending_bytes -= self._sizes.pop(transaction.hash, 0)
+            future = self._futures.pop(transaction.hash, None)
+            if not self._futures:
+                self._oldest_pending = None
+        if future is not None and not future.done():
+            future.set_exception(error)
+
+    def future_for(self, transaction):
+        """Return the Future of a pending transaction, or None if it is not tracked."""
+        return self._futures.get(transaction.hash)
+
+    @staticmethod
+    def transaction_size(transaction):
+        """Return the serialized size of a transaction in bytes."""
+        return len(json.dumps(transaction.to_dict(), separators=(',', ':')))
+
+    def select_batch(self, transactions):
+        """
+        Choose the transactions for the next block.
+
+        Args:
+            transactions (iterable): Pending transactions in sealing order.
+
+        Returns:
+            list: The longest prefix of transactions that fits the size limits.
+                  Always contains at least one transaction if any are pending.
+        """
+        batch = []
+        batch_bytes = 0
+        for transaction in transactions:
+            size = self._sizes.get(transaction.hash) or self.transaction_size(transaction)
+            if batch and (len(batch) >= self.max_transactions or batch_bytes + size > self.max_bytes):
+                break
+            batch.append(transaction)
+            batch_bytes += size
+        return batch
+
+    def on_commit(self, block):
+        """
+        Resolve the futures of every transaction included in a committed block.
+
+        Args:
+            block (Block): The newly committed block.
+        """
+        with self._condition:
+            for transaction in block.transactions:
+                self._pending_bytes -= self._sizes.pop(transaction.hash, 0)
+                future = self._futures.pop(transaction.hash, None)
+                if future is not None and not future.done():
+                    future.set_result(block)
+            self._oldest_pending = time.monotonic() if self._futures else None
+            self._condition.notify_all()  # A producer waiting out another authority's slot re-checks
+
+    def wait(self, transaction, timeout=None):
+        """
+        Wait until a transaction has been included in a block.
+
+        If the producer thread is not running, the pending batch is sealed inline
+        when this process holds the next slot.
+
+        Args:
+            transaction (Transaction): A transaction returned by add_transaction.
+            timeout (float, optional): Seconds to wait before raising TimeoutError.
+
+        Returns:
+            Block: The block that includes the transaction.
+        """
+        future = self.future_for(transaction)
+        if future is None:
+            posting = self.blockchain.index.locate(transaction.hash)
+            if posting is not None:
+                return self.blockchain.chain[posting[0]]  # Already committed
+            raise ValueError("Transaction is not pending.")
+        if not self.running:
+            while not future.done() and len(self.blockchain.mempool):
+                if self.blockchain.mine_block() is None:
+                    break  # Another authority's slot; its block resolves the future
+        return future.result(timeout)
+
+    def _batch_full(self):
+        return len(self._futures) >= self.max_transactions or self._pending_bytes >= self.max_bytes
+
+    def _batch_due(self):
+        if not self._futures:
+            return False
+        return self._batch_full() or time.monotonic() - self._oldest_pending >= self.max_delay
+
+    def wait_for_batch(self):
+        """Block the calling thread until a batch is full or its deadline has passed."""
+        with self._condition:
+            while not self._batch_due():
+                if self._futures:
+                    remaining = self.max_delay - (time.monotonic() - self._oldest_pending)
+                    self._condition.wait(max(remaining, 0))
+                else:
+                    self._condition.wait()
+
+    def run(self):
+        """Producer loop: seal a block whenever a batch is due. Runs until the process exits."""
+        self.running = True
+        while True:
+            self.wait_for_batch()
+            due = time.monotonic()
+            try:
+                while self.blockchain.mine_block(waited=time.monotonic() - due) is None:
+                    # Another authority's slot: wait for its block or until the slot passes on
+                    with self._condition:
+                        if not self._batch_due():
+                            break
+                        waited = time.monotonic() - due
+                        self._condition.wait(self.blockchain.scheduler.time_to_next_slot(waited))
+            except Exception as e:
+                print(f"Error during mining: {e}")
+                time.sleep(self.max_delay)  # Back off instead of spinning on a persistent error
@@ -0,0 +1,311 @@
+import heapq
+from bisect import bisect_left
+from app.storage import SnapshotLog
+from app.time_index import PERIODS, period_bounds, period_granularity, period_keys
+
+EMISSION_OPERATION = 'CARBON_EMISSION'
+TAX_OPERATION = 'TAX_PAYMENT'
+
+
+class EmissionRollups:
+    """
+    Emission totals pre-aggregated per UTC day, month, quarter and year.
+
+    Each CARBON_EMISSION transaction is folded in as its block commits. Its tCO2e
+    and payload metrics are added to the totals of every period it is dated in,
+    and its tCO2e to the reporter's total for those periods; see report_emissions()
+    and report_timestamp().
+    TAX_PAYMENT amounts are summed per tax period and payer. The totals of a
+    period and a user's tax for it are then dictionary lookups instead of a scan
+    of the reports. Like the index, the rollups are checkpointed to a sidecar
+    log of the totals changed in each interval and caught up from there.
+    """
+
+    METRICS = (
+        'amount', 'materials_used', 'machinery_emissions', 'energy_consumption',
+        'energy_usage', 'operation_hours', 'fuel_consumption', 'power_usage', 'recycling_efforts'
+    )
+    # tCO2e per unit of each field. 'amount' and 'machinery_emissions' are reported in
+    # tCO2e already; the others are indicative defaults (tonnes of material, kWh, litres)
+    EMISSION_FACTORS = {
+        'amount': 1.0,
+        'machinery_emissions': 1.0,
+        'materials_used': 0.1,
+        'energy_consumption': 0.0004,
+        'energy_usage': 0.0004,
+        'power_usage': 0.0004,
+        'fuel_consumption': 0.00268,
+    }
+    TAX_BRACKETS = [(0.0, 10.0)]  # (tCO2e from which the rate applies, rate per tCO2e)
+    SNAPSHOT_FORMAT = 2  # Snapshots of another format hold totals computed differently
+
+    def __init__(self):
+        """Initialize empty rollups."""
+        self.height = 0  # Number of blocks folded in
+        self.tip_hash = None  # Hash of the last folded block
+        self.periods = {granularity: {} for granularity in PERIODS}  # granularity -> label -> totals
+        self.users = {granularity: {} for granularity in PERIODS}  # granularity -> label -> user -> tCO2e
+        self.tax_paid = {}  # tax period -> payer -> amount paid
+        self.snapshot_height = 0  # Height covered by the snapshot log on disk
+        self.snapshot_log = None  # SnapshotLog the rollups are saved to
+        self._changed = set()  # (granularity, label) and ('tax', period) keys changed since the last save
+
+    def add_block(self, block):
+        """
+        Fold the emission reports and tax payments of a newly committed block.
+
+        Args:
+            block (Block): The block appended at height ``self.height``.
+        """
+        for transaction in block.transactions:
+            self.add_transaction(transaction)
+        self.height += 1
+        self.tip_hash = block.hash
+
+    def add_transaction(self, transaction):
+        """
+        Fold one committed transaction; other operations are ignored.
+
+        Args:
+            transaction (Transaction): A transaction from a committed block.
+        """
+        if transaction.operation == EMISSION_OPERATION:
+            self._add_report(transaction.sender, report_timestamp(transaction), transaction.data)
+        elif transaction.operation == TAX_OPERATION and isinstance(transaction.data, dict):
+            period = _tax_period_key(transaction.data.get('tax_period'))
+            paid = self.tax_paid.setdefault(period, {})
+            self._changed.add(('tax', period))
+            paid[transaction.sender] = paid.get(transaction.sender, 0.0) + quantity(transaction.data.get('amount'))
+
+    def _add_report(self, user, timestamp, data):
+        if not isinstance(data, dict):
+            data = {}
+        metrics = [(field, quantity(data.get(field))) for field in self.METRICS]
+        emissions = report_emissions(data, self.EMISSION_FACTORS)
+        for granularity, label in period_keys(timestamp).items():
+            entry = self.periods[granularity].setdefault(label, {"transactions": 0, "emissions": 0.0})
+            entry["transactions"] += 1
+            entry["emissions"] += emissions
+            for field, value in metrics:
+                if value:
+                    entry[field] = entry.get(field, 0.0) + value
+            users = self.users[granularity].setdefault(label, {})
+            users[user] = users.get(user, 0.0) + emissions
+            self._changed.add((granularity, label))
+
+    def rebuild(self, chain, index, start=0):
+        """
+        Fold the emission reports and tax payments of chain from height start onwards.
+
+        Only the transactions the index lists under those operations are decoded.
+
+        Args:
+            chain (list): The blockchain's list of blocks.
+            index (ChainIndex): An index covering every block of chain.
+            start (int): First height to fold.
+        """
+        postings = [index.operation_postings(operation) for operation in (EMISSION_OPERATION, TAX_OPERATION)]
+        for height, position in heapq.merge(*(p[bisect_left(p, (start,)):] for p in postings)):
+            self.add_transaction(chain[height].transactions[position])
+        if len(chain) > start:
+            self.height = len(chain)
+            self.tip_hash = index.tip_hash
+
+    def totals(self, period):
+        """
+        Return the totals of one period.
+
+        Args:
+            period (str): '2024', '2024-Q4', '2024-10' or '2024-10-31' (UTC).
+
+        Returns:
+            dict: {"transactions", "emissions", and every non-zero metric}.
+
+        Raises:
+            ValueError: If period is not a valid label.
+        """
+        granularity, label = period_granularity(period)
+        return dict(self.periods[granularity].get(label) or {"transactions": 0, "emissions": 0.0})
+
+    def series(self, granularity='month'):
+        """
+        Return the totals of every period of one granularity, oldest first.
+
+        Raises:
+            ValueError: If granularity is not 'day', 'month', 'quarter' or 'year'.
+        """
+        if granularity not in PERIODS:
+            raise ValueError(f"Unknown period {granularity!r}; expected one of {', '.join(PERIODS)}.")
+        periods = self.periods[granularity]
+        return {label: dict(periods[label]) for label in sorted(list(periods))}
+
+    def user_emissions(self, username, period=None):
+        """Return the tCO2e reported by a user in one period, or in total."""
+        if period is None:
+            return sum(users.get(username, 0.0) for users in list(self.users['year'].values()))
+        granularity, label = period_granularity(period)
+        return self.users[granularity].get(label, {}).get(username, 0.0)
+
+    def carbon_tax(self, username, period=None):
+        """Return the carbon tax on a user's emissions in one period, or in total."""
+        return marginal_tax(self.user_emissions(username, period), self.TAX_BRACKETS)
+
+    def tax_paid_by(self, username, period):
+        """Return the TAX_PAYMENT amounts a user has committed for one tax period."""
+        return self.tax_paid.get(_tax_period_key(period), {}).get(username, 0.0)
+
+    def tax_due(self, username, period):
+        """Return the carbon tax of a user for one period less what they already paid for it."""
+        return max(0.0, self.carbon_tax(username, period) - self.tax_paid_by(username, period))
+
+    def save(self, filename):
+        """
+        Append the totals changed since the last snapshot to the rollup snapshot log.
+
+        Each record holds the whole entry of every period (and every tax period)
+        that a report or payment since the last one was added to.
+
+        Args:
+            filename (str): Path of the snapshot log.
+        """
+        if self.snapshot_log is None or self.snapshot_log.filename != filename:
+            self.snapshot_log = SnapshotLog(filename)
+        if self.height > self.snapshot_height:
+            periods = {granularity: {} for granularity in PERIODS}
+            users = {granularity: {} for granularity in PERIODS}
+            tax_paid = {}
+            for granularity, label in self._changed:
+                if granularity == 'tax':
+                    tax_paid[label] = self.tax_paid[label]
+                else:
+                    periods[granularity][label] = self.periods[granularity][label]
+                    users[granularity][label] = self.users[granularity][label]
+            self.snapshot_log.append({
+                "format": self.SNAPSHOT_FORMAT,
+                "start": self.snapshot_height,
+                "height": self.height,
+                "tip_hash": self.tip_hash,
+                "periods": periods,
+                "users": users,
+                "tax_paid": tax_paid
+            })
+        self._changed = set()
+        self.snapshot_height = self.height
+
+    @classmethod
+    def load(cls, filename, chain, index):
+        """
+        Load the rollups from their snapshot log and catch them up with chain.
+
+        Records are only trusted while they have the current format, continue each
+        other and the block at their height still has the hash they recorded; the
+        rollups are caught up from the last one that does (from the base height on
+        a chain bootstrapped from a state snapshot).
+
+        Args:
+            filename (str): Path of the snapshot log.
+            chain (list): The blockchain's list of blocks.
+            index (ChainIndex): An index covering every block of chain.
+
+        Returns:
+            EmissionRollups: Rollups covering every block of chain.
+        """
+        rollups = cls()
+        rollups.height = rollups.snapshot_height = getattr(chain, 'base', 0)
+        rollups.snapshot_log = SnapshotLog(filename)
+        for snapshot, _ in rollups.snapshot_log.read(chain, rollups.height):
+            if snapshot.get("format") != cls.SNAPSHOT_FORMAT:
+                break
+            for granularity in PERIODS:
+                rollups.periods[granularity].update(snapshot["periods"][granularity])
+                rollups.users[granularity].update(snapshot["users"][granularity])
+            rollups.tax_paid.update(snapshot["tax_paid"])
+            rollups.height = rollups.snapshot_height = snapshot["height"]
+            rollups.tip_hash = snapshot["tip_hash"]
+        rollups.rebuild(chain, index, start=rollups.height)
+        return rollups
+
+
+def marginal_tax(emissions, brackets):
+    """
+    Apply marginal tax brackets to one emission total.
+
+    Args:
+        emissions (float): tCO2e; a negative total owes nothing.
+        brackets (list): (threshold, rate) pairs sorted by threshold.
+
+    Returns:
+        float: The tax owed.
+    """
+    owed = 0.0
+    for i, (lower, rate) in enumerate(brackets):
+        upper = brackets[i + 1][0] if i + 1 < len(brackets) else float('inf')
+        owed += rate * min(max(emissions - lower, 0.0), upper - lower)
+    return owed
+
+
+def report_emissions(data, factors):
+    """
+    Return the tCO2e of one emission report.
+
+    A report that states its total 'amount' is taken at that figure, whatever
+    breakdown it also carries; otherwise the breakdown fields are weighted by
+    their factors.
+
+    Args:
+        data (dict): The report payload.
+        factors (dict): Field -> tCO2e per unit.
+
+    Returns:
+        float: The report's tCO2e.
+    """
+    if not isinstance(data, dict):
+        return 0.0
+    if data.get('amount') is not None:
+        return quantity(data['amount'])
+    return sum(quantity(data.get(field)) * factor for field, factor in factors.items() if field != 'amount')
+
+
+def report_timestamp(transaction):
+    """
+    Return the time an emission report is dated at for per-period totals.
+
+    A report whose 'reporting_period' is a period label ('2024', '2024-Q3',
+    '2024-07' or '2024-07-31') is dated at the start of that period, so it counts
+    towards the period it covers rather than the one it was submitted in; other
+    reports are dated at their transaction timestamp.
+    """
+    data = transaction.data if isinstance(transaction.data, dict) else {}
+    period = data.get('reporting_period')
+    if isinstance(period, str):
+        try:
+            return period_bounds(period.strip())[0]
+        except ValueError:
+            pass
+    return float(transaction.timestamp)
+
+
+def quantity(value):
+    """Return the numeric size of a payload field: a number, or the sum of a dict's or list's numbers."""
+    if isinstance(value, bool) or value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, dict):
+        return sum(quantity(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(quantity(item) for item in value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+def _tax_period_key(period):
+    """Return the canonical label of a tax period, or the reference as given if it is not a period label."""
+    try:
+        return period_granularity(period)[1]
+    except ValueError:
+        return str(period)
@@ -1,14 +1,32 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session
+import csv
+import json
+import os
+from datetime import datetime, timezone
+from flask import Blueprint, Response, render_template, redirect, url_for, flash, request, session, jsonify, stream_with_context
 from flask_login import login_user, current_user, logout_user
 from app.forms import RegistrationForm, LoginForm
+from app.authority import authorities_from_environment
 from app.blockchain import Blockchain
+from app.chain_service import RemoteBlockchain
 from app.secret import SecretManager
+from app.crypto_executor import CryptoExecutor, CryptoBusyError
 from app.transaction import Transaction
+from app.mempool import MempoolError
+from app.ingest import EmissionIngestor, open_text
+from app.explorer import ChainExplorer
+from app.time_index import parse_timestamp
 
 main = Blueprint('main', __name__)
-blockchain = Blockchain()
-blockchain.load_blockchain()  # Load the blockchain from the JSON file
+crypto_executor = CryptoExecutor()  # Key derivation and signing run off the request threads
+if os.environ.get('BLOCKCHAIN_SOCKET'):
+    blockchain = RemoteBlockchain.from_environment()  # Talks to the chain writer process
+else:
+    # Loads the chain from the block log; blocks are signed and audited in the same pool
+    authority_nodes, local_authorities = authorities_from_environment()
+    blockchain = Blockchain(format=os.environ.get('BLOCKCHAIN_FORMAT', 'json'), crypto_executor=crypto_executor,
+                            authority_nodes=authority_nodes, local_authorities=local_authorities)
 secret_manager = SecretManager()  # Create an instance of SecretManager
+CONFIRMATION_TIMEOUT = 10.0  # Seconds a request waits for its transaction to be committed
 
 
 @main.route('/')
@@ -16,6 +34,47 @@ def index():
     return render_template('index.html')
 
 
+@main.route('/metrics/crypto')
+def crypto_metrics():
+    """Queue depth and latency of the crypto worker pool."""
+    return jsonify(crypto_executor.metrics())
+
+
+@main.route('/metrics/mempool')
+def mempool_metrics():
+    """Pending transaction count, bytes and age of the mempool."""
+    return jsonify(blockchain.mempool_metrics())
+
+
+@main.route('/analytics/emissions')
+def emission_totals():
+    """Emission totals grouped by user, profession or period (?by=, ?period=, ?within=)."""
+    try:
+        return jsonify(blockchain.emission_totals(
+            request.args.get('by', 'user'), request.args.get('period', 'month'), request.args.get('within')
+        ))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@main.route('/analytics/periods/<period>')
+def period_totals(period):
+    """Emission totals and block range of one day, month, quarter or year (e.g. /analytics/periods/2024-Q3)."""
+    try:
+        return jsonify(blockchain.period_totals(period))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@main.route('/analytics/carbon_tax')
+def carbon_tax_run():
+    """Carbon tax owed by every reporting user, optionally for one tax period (?within=2024-Q3)."""
+    try:
+        return jsonify(blockchain.carbon_tax_run(request.args.get('within')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
 @main.route('/register', methods=['GET', 'POST'])
 def register():
     form = RegistrationForm()  # Create an instance of the RegistrationForm
@@ -29,42 +88,58 @@ def register():
         # Encrypt the secret phrase
         encrypted_secret_phrase = secret_manager.encrypt_secret_phrase(secret_phrase)
         
-        # Generate public/private key pair from the secret phrase
-        public_key, private_key = secret_manager.generate_key_from_secret_phrase(secret_phrase)
+        # Generate public/private key pair from the secret phrase in the crypto worker pool
+        try:
+            public_key, private_key = crypto_executor.generate_key_pair(secret_phrase)
+        except CryptoBusyError:
+            flash("The server is busy. Please try registering again in a moment.", 'warning')
+            return render_template('register.html', form=form), 503
         
-        # Check if the username is available
-        if not blockchain.is_username_available(username):
-            flash(f"Username '{username}' is already taken.", 'danger')
-            return render_template('register.html', form=form)  # Pass the form back to the template
-
         # Create the user registration transaction
-        user_registration_transaction = blockchain.add_transaction(
+        user_registration_transaction = Transaction(
+            operation='USER_REGISTRATION',
             sender=username,
             recipient='SYSTEM',
-            operation='USER_REGISTRATION',
             data={
                 "encrypted_secret_phrase": encrypted_secret_phrase,
+                "secret_verifier": secret_manager.create_verifier(secret_phrase),
                 "public_key": public_key.decode('utf-8'),
                 "profession": profession
             }
         )
 
-        # Add the user registration transaction to a new block
-        blockchain.add_block(user_registration_transaction)
-
         # Create a CREDIT transaction to initialize the user's balance with 10 tokens
-        credit_transaction = blockchain.add_transaction(
+        credit_transaction = Transaction(
+            operation='CREDIT',
             sender='SYSTEM',
             recipient=username,
-            operation='CREDIT',
             data={'amount': 10}
         )
 
-        # Add the credit transaction to a new block
-        blockchain.add_block(credit_transaction)
+        # Queue both only if the username is still available (checked atomically)
+        try:
+            queued = blockchain.queue_registration(username, [user_registration_transaction, credit_transaction])
+        except MempoolError:
+            flash("The server is busy. Please try registering again in a moment.", 'warning')
+            return render_template('register.html', form=form), 503
+        if not queued:
+            flash(f"Username '{username}' is already taken.", 'danger')
+            return render_template('register.html', form=form)  # Pass the form back to the template
 
-        # Flash message with the secret phrase and security recommendation
-        flash(f"Registration successful! Your initial balance is 10 tokens.", 'success')
+        # Wait until both transactions have been sealed into a block
+        try:
+            blockchain.wait_for_transaction(user_registration_transaction, timeout=CONFIRMATION_TIMEOUT)
+            blockchain.wait_for_transaction(credit_transaction, timeout=CONFIRMATION_TIMEOUT)
+        except MempoolError:
+            # Evicted from the full mempool, together with its credit
+            flash("The server is busy. Please try registering again in a moment.", 'warning')
+            return render_template('register.html', form=form), 503
+        except TimeoutError:
+            # Still hand out the secret phrase: it is shown only once and the registration stays queued
+            flash("Your registration is queued but not yet confirmed. You can log in once it is.", 'warning')
+        else:
+            # Flash message with the secret phrase and security recommendation
+            flash(f"Registration successful! Your initial balance is 10 tokens.", 'success')
         
         # Store the secret phrase in the session
         session['secret_phrase'] = secret_phrase  # Store the secret phrase in the session
@@ -85,35 +160,18 @@ def login():
         user_data = blockchain.get_user_data(username)
         
         if user_data:
-            # Retrieve the encrypted secret phrase and profession
-            encrypted_secret_phrase = user_data.get('encrypted_secret_phrase')
             profession = user_data.get('profession')  # Retrieve the profession
             
-            # Debugging output
-            print(f"Retrieved Encrypted Secret Phrase: '{encrypted_secret_phrase}'")
-            print(f"Retrieved Profession: '{profession}'")
-            print(f"Provided Secret Phrase: '{secret_phrase}'")
-            
-            try:
-                # Decrypt the stored encrypted secret phrase
-                decrypted_secret_phrase = secret_manager.decrypt_secret_phrase(encrypted_secret_phrase)
-                
-                # Debugging: Print the decrypted secret phrase
-                print(f"Decrypted Secret Phrase: '{decrypted_secret_phrase}'")
+            # Verify the secret phrase against the stored verifier
+            if secret_manager.verify_secret_phrase(secret_phrase, user_data):
+                session['username'] = username
+                session['profession'] = profession  # Store the profession in the session
+                flash('Login successful! Welcome back.', 'success')
                 
-                # Verify the secret phrase
-                if decrypted_secret_phrase == secret_phrase:
-                    session['username'] = username
-                    session['profession'] = profession  # Store the profession in the session
-                    flash('Login successful! Welcome back.', 'success')
-                    
-                    # Redirect to the appropriate dashboard based on profession
-                    return redirect_to_dashboard(profession)
-                else:
-                    flash('Invalid secret phrase. Please try again.', 'danger')
-            except Exception as e:
-                print(f"Decryption error: {e}")
-                flash('An error occurred during login. Please try again.', 'danger')
+                # Redirect to the appropriate dashboard based on profession
+                return redirect_to_dashboard(profession)
+            else:
+                flash('Invalid secret phrase. Please try again.', 'danger')
         else:
             flash('Invalid username. Please try again.', 'danger')
     
@@ -142,6 +200,9 @@ def redirect_to_dashboard(profession):
 @main.route('/logout')
 def logout():
     session.pop('username', None)
+    secret_phrase = session.pop('secret_phrase', None)
+    if secret_phrase:
+        secret_manager.forget_private_key(secret_phrase)  # Drop the cached signing key
     flash('You have been logged out.', 'info')
     return redirect(url_for('main.login'))
 
@@ -157,59 +218,72 @@ def user_dashboard():
     # Redirect to the appropriate dashboard based on profession
     return redirect_to_dashboard(profession)
 
-@main.route('/report_carbon_emission')
+@main.route('/report_carbon_emission', methods=['GET', 'POST'])
 def report_carbon_emission():
-    if request.method == 'POST':
-        amount = request.form.get('amount', type=float)
-        emission_source = request.form.get('emission_source')
-        activity_type = request.form.get('activity_type')
-        compliance_status = request.form.get('compliance_status')
-        reporting_period = request.form.get('reporting_period')
+    if 'username' not in session:
+        flash('You need to log in first.', 'danger')
+        return redirect(url_for('main.login'))
+    profession = session.get('profession')
 
-        # Determine the user's profession
-        profession = session.get('profession')
+    if request.method == 'POST':
+        details = {
+            'amount': request.form.get('amount', type=float),
+            'emission_source': request.form.get('emission_source'),
+            'activity_type': request.form.get('activity_type'),
+            'compliance_status': request.form.get('compliance_status'),
+            'reporting_period': request.form.get('reporting_period')
+        }
+        details = {field: value for field, value in details.items() if value is not None}
+        if details.get('amount') is None or details['amount'] < 0:
+            flash('Please enter the emitted amount in metric tons.', 'danger')
+            return redirect_to_dashboard(profession)
 
         # Create a carbon emission transaction based on the profession
-        if profession == 'civil engineer':
-            carbon_emission_transaction = blockchain.add_civil_engineering_transaction(
-                sender=session['username'],
-                recipient='DID:example:environmentalAgency',
-                amount=amount,
-                emission_source=emission_source,
-                activity_type=activity_type,
-                compliance_status=compliance_status,
-                reporting_period=reporting_period
-            )
-        elif profession == 'mechanical engineer':
-            carbon_emission_transaction = blockchain.add_mechanical_engineering_transaction(
-                sender=session['username'],
-                recipient='DID:example:environmentalAgency',
-                amount=amount,
-                emission_source=emission_source,
-                activity_type=activity_type,
-                compliance_status=compliance_status,
-                reporting_period=reporting_period
-            )
-        elif profession == 'electronics engineer':
-            carbon_emission_transaction = blockchain.add_electronics_engineering_transaction(
-                sender=session['username'],
-                recipient='DID:example:environmentalAgency',
-                amount=amount,
-                emission_source=emission_source,
-                activity_type=activity_type,
-                compliance_status=compliance_status,
-                reporting_period=reporting_period
-            )
-        else:
-            flash('Invalid profession. Unable to report emissions.', 'danger')
-            return redirect(url_for('main.civil_engineer_dashboard'))
+        recipient = 'DID:example:environmentalAgency'
+        try:
+            if profession == 'civil_engineer':
+                transaction = blockchain.add_civil_engineering_transaction(session['username'], recipient, details=details)
+            elif profession == 'mechanical_engineer':
+                transaction = blockchain.add_mechanical_engineering_transaction(session['username'], recipient, details=details)
+            elif profession == 'electronics_engineer':
+                transaction = blockchain.add_electronics_engineering_transaction(session['username'], recipient, details=details)
+            else:
+                flash('Invalid profession. Unable to report emissions.', 'danger')
+                return redirect(url_for('main.dashboard'))
+            # Only report success once the emission is in a committed block
+            blockchain.wait_for_transaction(transaction, timeout=CONFIRMATION_TIMEOUT)
+        except MempoolError:
+            flash('Too many pending transactions. Please try again in a moment.', 'warning')
+            return redirect_to_dashboard(profession)
+        except TimeoutError:
+            flash('Your report is queued but not yet confirmed. Check your history shortly.', 'warning')
+            return redirect_to_dashboard(profession)
 
-        # Add the transaction to the blockchain
-        blockchain.add_transaction(carbon_emission_transaction)
         flash('Carbon emission reported successfully!', 'success')
-        return redirect(url_for('main.civil_engineer_dashboard'))
+        return redirect_to_dashboard(profession)
+
+    return redirect_to_dashboard(profession)
+
 
-    return render_template('civil_engineer_dashboard.html', username=session['username'])
+@main.route('/ingest/emissions', methods=['POST'])
+def ingest_emissions():
+    """
+    Bulk-report emissions from a CSV or JSONL upload (form field 'file', or the raw body).
+
+    The format is taken from ?format=, else from the file extension. Rows are
+    attributed to the logged-in user; the response lists per-row errors.
+    """
+    if 'username' not in session:
+        return jsonify({"error": "You need to log in first."}), 401
+    upload = request.files.get('file')
+    name = upload.filename if upload is not None else ''
+    format = request.args.get('format') or ('jsonl' if name.endswith(('.jsonl', '.ndjson')) else 'csv')
+    stream = upload.stream if upload is not None else request.stream
+    try:
+        report = EmissionIngestor(blockchain).ingest(open_text(stream), format, sender=session['username'])
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(report.to_dict())
 
 @main.route('/engineer_dashboard')
 def engineer_dashboard():
@@ -263,7 +337,7 @@ def civil_engineer_dashboard():
         return redirect(url_for('main.login'))
     
     username = session['username']
-    return render_template('civil_engineer_dashboard.html', username=username)
+    return render_template('civil_engineer_dashboard.html', username=username, balance=blockchain.get_balance(username))
 
 @main.route('/mechanical_engineer_dashboard')
 def mechanical_engineer_dashboard():
@@ -272,7 +346,7 @@ def mechanical_engineer_dashboard():
         return redirect(url_for('main.login'))
     
     username = session['username']
-    return render_template('mechanical_engineer_dashboard.html', username=username)
+    return render_template('mechanical_engineer_dashboard.html', username=username, balance=blockchain.get_balance(username))
 
 @main.route('/electronics_engineer_dashboard')
 def electronics_engineer_dashboard():
@@ -281,7 +355,7 @@ def electronics_engineer_dashboard():
         return redirect(url_for('main.login'))
     
     username = session['username']
-    return render_template('electronics_engineer_dashboard.html', username=username)
+    return render_template('electronics_engineer_dashboard.html', username=username, balance=blockchain.get_balance(username))
 
 @main.route('/secret_key_explanation')
 def secret_key_explanation():
@@ -290,8 +364,108 @@ def secret_key_explanation():
 
 @main.route('/view_blockchain')
 def view_blockchain():
-    # Placeholder for viewing the blockchain
-    return render_template('view_blockchain.html')  # Create this template later
+    """Newest blocks first, one page at a time (?cursor= from the previous page)."""
+    try:
+        page = blockchain.explore_blocks(request.args.get('cursor'), request.args.get('limit'))
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('main.view_blockchain'))
+    return render_template('view_blockchain.html', page=page)
+
+
+@main.route('/api/blocks')
+def api_blocks():
+    """One page of block summaries, newest first (?cursor=, ?limit=)."""
+    return _explorer_response(lambda: jsonify(
+        blockchain.explore_blocks(request.args.get('cursor'), request.args.get('limit'))
+    ))
+
+
+@main.route('/api/blocks/<int:height>')
+def api_block(height):
+    """One block with its transactions."""
+    return _explorer_response(lambda: jsonify(blockchain.get_block(height)))
+
+
+@main.route('/api/transactions')
+def api_transactions():
+    """One page of transactions, newest first (?sender=, ?operation=, ?start=, ?end=, ?cursor=, ?limit=)."""
+    return _explorer_response(lambda: jsonify(
+        blockchain.explore_transactions(*_transaction_filters(), request.args.get('cursor'), request.args.get('limit'))
+    ))
+
+
+@main.route('/api/blocks/export')
+def api_blocks_export():
+    """Every block summary as one JSON array, streamed page by page."""
+    def fetch(cursor):
+        return blockchain.explore_blocks(cursor, ChainExplorer.MAX_LIMIT)
+    return _explorer_response(lambda: _stream_pages(fetch, 'blocks'))
+
+
+@main.route('/api/transactions/export')
+def api_transactions_export():
+    """Every matching transaction as one JSON array, streamed page by page; takes the /api/transactions filters."""
+    def build():
+        filters = _transaction_filters()
+        return _stream_pages(lambda cursor: blockchain.explore_transactions(
+            *filters, cursor, ChainExplorer.MAX_LIMIT), 'transactions')
+    return _explorer_response(build)
+
+
+def _transaction_filters():
+    """Return the (sender, operation, start, end) filters of an explorer request."""
+    return (request.args.get('sender') or None, request.args.get('operation') or None) + _date_range()
+
+
+def _stream_pages(fetch, key):
+    """
+    Build a response streaming the items of every page as one JSON array.
+
+    The first page is fetched before the response starts, so a bad request still
+    gets a 400; after that only one page is held in memory at a time.
+    """
+    page = fetch(None)
+
+    def generate(page):
+        yield '['
+        separator = ''
+        while True:
+            for item in page[key]:
+                yield separator + json.dumps(item)
+                separator = ','
+            if page['next_cursor'] is None:
+                break
+            page = fetch(page['next_cursor'])
+        yield ']'
+    return Response(stream_with_context(generate(page)), mimetype='application/json')
+
+
+def _explorer_response(build):
+    """
+    Answer an explorer request, or 304 Not Modified if the client's copy is current.
+
+    Explorer responses only change when a block is committed, so the ETag is the
+    committed height and tip hash and Last-Modified is when the tip was sealed.
+    """
+    head = blockchain.chain_head()
+    etag = f"{head['height']}-{head['tip_hash'][:16]}"
+    modified = datetime.fromtimestamp(int(head['timestamp']), timezone.utc)
+    if request.if_none_match.contains(etag) or (
+            not request.if_none_match and request.if_modified_since is not None
+            and request.if_modified_since >= modified):
+        response = Response(status=304)
+    else:
+        try:
+            response = build()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except IndexError as e:
+            return jsonify({"error": str(e)}), 404
+    response.set_etag(etag)
+    response.last_modified = modified
+    response.cache_control.no_cache = True  # Caches may keep it, but must revalidate
+    return response
 
 @main.route('/create_report')
 def create_report():
@@ -324,7 +498,47 @@ def contact_us():
 
 @main.route('/view_balance_history')
 def view_balance_history():
-    # Placeholder for balance history logic
-    # You can retrieve the balance history from the blockchain and pass it to the template
-    return render_template('balance_history.html')  # Create this template later
+    """The logged-in user's balance history, newest first (?start=, ?end= dates, ?cursor=)."""
+    if 'username' not in session:
+        flash('You need to log in first.', 'danger')
+        return redirect(url_for('main.login'))
+
+    username = session['username']
+    filters = {name: request.args.get(name, '') for name in ('start', 'end')}
+    try:
+        start, end = _date_range()
+        page = blockchain.balance_history(username, start, end, request.args.get('cursor'), request.args.get('limit'))
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('main.view_balance_history'))
+    # Current balance and stake come from the materialized balance table
+    return render_template(
+        'balance_history.html',
+        username=username,
+        balance=blockchain.get_balance(username),
+        stake=blockchain.get_stake(username),
+        page=page,
+        filters=filters
+    )
+
+
+@main.route('/api/accounts/<account>/history')
+def api_balance_history(account):
+    """One page of an account's balance history, newest first (?start=, ?end=, ?cursor=, ?limit=)."""
+    return _explorer_response(lambda: jsonify(
+        blockchain.balance_history(account, *_date_range(), request.args.get('cursor'), request.args.get('limit'))
+    ))
+
+
+def _date_range():
+    """
+    Return the (start, end) timestamps of a request's ?start= and ?end=.
+
+    An end given as a plain date (YYYY-MM-DD) includes that whole day.
+    """
+    start, end = request.args.get('start'), request.args.get('end')
+    start = parse_timestamp(start) if start else None
+    if end:
+        end = parse_timestamp(end) + (86400 if len(end) == 10 and end.count('-') == 2 else 0)
+    return start, end or None
   
\ No newline at end of file
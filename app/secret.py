@@ -1,20 +1,112 @@
 import hashlib
 from mnemonic import Mnemonic
-from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.fernet import Fernet
-import base64
+from cryptography.fernet import InvalidToken
+from app.key_derivation import derive_rsa_private_key
+from app.keyring import Keyring, make_verifier, check_verifier
+from collections import OrderedDict
+import hmac
 import os
+import threading
+import time
+
+
+class KeyCache:
+    """
+    Bounded, time-limited cache of private key objects derived from secret phrases.
+
+    Entries are keyed by an HMAC of the phrase under a per-process random key, so
+    neither the phrase nor a plain hash of it is ever stored. An entry expires
+    ttl seconds after it was last used, and the least recently used entry is
+    evicted once max_entries is reached.
+    """
+
+    def __init__(self, max_entries=256, ttl=900):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum number of cached keys.
+            ttl (float): Seconds an unused key stays cached.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._salt = os.urandom(32)
+        self._entries = OrderedDict()  # fingerprint -> (private key, expiry), least recently used first
+        self._lock = threading.Lock()
+
+    def fingerprint(self, secret_phrase):
+        """Return the cache key of a secret phrase."""
+        return hmac.new(self._salt, secret_phrase.encode(), hashlib.sha256).digest()
+
+    def get(self, secret_phrase):
+        """Return the cached private key of a secret phrase, or None."""
+        fingerprint = self.fingerprint(secret_phrase)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                return None
+            self._entries[fingerprint] = (entry[0], now + self.ttl)
+            self._entries.move_to_end(fingerprint)
+            return entry[0]
+
+    def put(self, secret_phrase, private_key):
+        """Cache the private key of a secret phrase."""
+        fingerprint = self.fingerprint(secret_phrase)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._entries[fingerprint] = (private_key, now + self.ttl)
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, secret_phrase):
+        """Drop the key of a secret phrase, e.g. when its session ends."""
+        with self._lock:
+            self._entries.pop(self.fingerprint(secret_phrase), None)
+
+    def clear(self):
+        """Drop every cached key."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expire(self, now):
+        # Entries are ordered by last use, so expired ones are at the front
+        while self._entries:
+            fingerprint, (_, expiry) = next(iter(self._entries.items()))
+            if expiry > now:
+                break
+            del self._entries[fingerprint]
+
 
 class SecretManager:
-    def __init__(self):
-        """Initialize SecretManager with a mnemonic generator for secret phrases."""
+    def __init__(self, key_cache=None, keyring=None):
+        """
+        Initialize SecretManager with a mnemonic generator for secret phrases.
+
+        Args:
+            key_cache (KeyCache, optional): Cache of derived private keys.
+            keyring (Keyring, optional): Fernet keys for stored secret phrases; loaded
+                from the environment on first use when omitted.
+        """
         self.mnemo = Mnemonic("english")
-        self.key = Fernet.generate_key()
-        self.cipher = Fernet(self.key)
+        self.key_cache = key_cache or KeyCache()
+        self._keyring = keyring
+
+    @property
+    def keyring(self):
+        """The persistent keyring, opened on first use."""
+        if self._keyring is None:
+            self._keyring = Keyring.from_environment()
+        return self._keyring
 
     def generate_secret_phrase(self, strength=128):
         """
@@ -38,14 +130,7 @@ class SecretManager:
         Returns:
             tuple: (public_key_pem, private_key_pem) The public and private keys in PEM format.
         """
-        seed = self.mnemo.to_seed(secret_phrase)
-
-        # Generate RSA keys for the user (for simplicity, using RSA in this example)
-        private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048,
-            backend=default_backend()
-        )
+        private_key = self.load_private_key(secret_phrase)
         public_key = private_key.public_key()
 
         # Serialize keys to PEM format
@@ -61,6 +146,31 @@ class SecretManager:
 
         return public_key_pem, private_key_pem
 
+    def load_private_key(self, secret_phrase):
+        """
+        Return the private key derived from a secret phrase.
+
+        The key is derived deterministically from the phrase's BIP-39 seed, so the
+        same phrase always yields the same key pair. Derivation costs hundreds of
+        milliseconds; the key object is kept in the key cache so later signatures
+        with the same phrase only pay for the signature.
+
+        Args:
+            secret_phrase (str): The BIP-39 mnemonic.
+
+        Returns:
+            RSAPrivateKey: The user's private key.
+        """
+        private_key = self.key_cache.get(secret_phrase)
+        if private_key is None:
+            private_key = derive_rsa_private_key(self.mnemo.to_seed(secret_phrase))
+            self.key_cache.put(secret_phrase, private_key)
+        return private_key
+
+    def forget_private_key(self, secret_phrase):
+        """Drop the cached private key of a secret phrase (e.g. on logout)."""
+        self.key_cache.discard(secret_phrase)
+
     def recover_key_from_secret_phrase(self, secret_phrase):
         """
         Recover a key pair from an existing secret phrase (mnemonic).
@@ -117,16 +227,9 @@ class SecretManager:
         Returns:
             bytes: The signature of the transaction data.
         """
-        # Recover the private key from the secret phrase
-        _, private_key_pem = self.generate_key_from_secret_phrase(secret_phrase)
-        
-        # Load the private key from PEM format
-        private_key = serialization.load_pem_private_key(
-            private_key_pem,
-            password=None,
-            backend=default_backend()
-        )
-        
+        # Recover the private key from the secret phrase (cached after the first use)
+        private_key = self.load_private_key(secret_phrase)
+
         # Sign the vote data
         signature = private_key.sign(
             vote_data.encode(),  # Ensure the data is in bytes
@@ -140,9 +243,40 @@ class SecretManager:
         return signature
 
     def encrypt_secret_phrase(self, secret_phrase):
-        """Encrypt the secret phrase."""
-        return self.cipher.encrypt(secret_phrase.encode()).decode()
+        """Encrypt the secret phrase with the keyring's primary key."""
+        return self.keyring.encrypt(secret_phrase.encode()).decode()
 
     def decrypt_secret_phrase(self, encrypted_phrase):
-        """Decrypt the secret phrase."""
-        return self.cipher.decrypt(encrypted_phrase.encode()).decode()
+        """Decrypt a secret phrase encrypted with any key of the keyring."""
+        return self.keyring.decrypt(encrypted_phrase.encode()).decode()
+
+    def create_verifier(self, secret_phrase):
+        """Return the salted hash of a secret phrase stored at registration to check logins."""
+        return make_verifier(secret_phrase)
+
+    def verify_secret_phrase(self, secret_phrase, user_data):
+        """
+        Check a secret phrase given at login against a user's registration data.
+
+        Uses the stored verifier, compared in constant time, so nothing is decrypted.
+        Users registered before verifiers existed fall back to decrypting their
+        encrypted phrase.
+
+        Args:
+            secret_phrase (str): The phrase entered by the user.
+            user_data (dict): The user's data from Blockchain.get_user_data().
+
+        Returns:
+            bool: True if the phrase is correct.
+        """
+        verifier = user_data.get('secret_verifier')
+        if verifier:
+            return check_verifier(secret_phrase, verifier)
+        encrypted_phrase = user_data.get('encrypted_secret_phrase')
+        if not encrypted_phrase:
+            return False
+        try:
+            stored_phrase = self.decrypt_secret_phrase(encrypted_phrase)
+        except InvalidToken:
+            return False
+        return hmac.compare_digest(stored_phrase.encode(), secret_phrase.encode())
@@ -0,0 +1,214 @@
+import base64
+import hashlib
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from app.crypto_executor import CryptoBusyError
+from app.lazy_chain import LazyChain
+from app.validation import ValidationReport
+
+# Parsed public keys of the worker process, by PEM
+_worker_keys = {}
+
+
+def _pss():
+    return padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH)
+
+
+def verify_signature_batch(public_key_pem, items):
+    """
+    Verify a batch of block signatures made by one authority.
+
+    Runs in a worker process; the parsed key is reused across batches.
+
+    Args:
+        public_key_pem (bytes): The authority's public key.
+        items (list): (height, block_hash, signature) triples.
+
+    Returns:
+        list: Heights whose signature does not verify.
+    """
+    public_key = _worker_keys.get(public_key_pem)
+    if public_key is None:
+        public_key = _worker_keys[public_key_pem] = serialization.load_pem_public_key(public_key_pem)
+    return _verify_items(public_key, items)
+
+
+def _verify_items(public_key, items):
+    failed = []
+    for height, block_hash, signature in items:
+        try:
+            public_key.verify(signature, block_hash.encode(), _pss(), hashes.SHA256())
+        except InvalidSignature:
+            failed.append(height)
+    return failed
+
+
+class SignatureAuditor:
+    """
+    Chain-wide audit of authority signatures.
+
+    Signed blocks are grouped by the authority that signed them, so each group is
+    checked against a single parsed public key, and large groups are verified in
+    parallel chunks on a process pool. Every (authority key, block hash, signature)
+    that verifies is remembered, so later audits of the same blocks, e.g. at the
+    next startup or after a sync, only pay for new signatures.
+
+    Given a CryptoExecutor, chunks are verified in its workers, so audits share the
+    pool, queue limit and metrics of key derivation and block signing. A chunk that
+    cannot get a slot is verified in-process.
+    """
+
+    def __init__(self, max_workers=None, chunk_size=256, parallel_threshold=512, memo_size=1000000,
+                 executor=None):
+        """
+        Initialize the auditor.
+
+        Args:
+            max_workers (int, optional): Worker processes; defaults to the CPU count.
+            chunk_size (int): Signatures per work item.
+            parallel_threshold (int): Minimum number of signatures before a pool is used.
+            memo_size (int): Maximum number of remembered verified signatures.
+            executor (CryptoExecutor, optional): Shared worker pool used instead of a pool
+                of the auditor's own.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.parallel_threshold = parallel_threshold
+        self.memo_size = memo_size
+        self.executor = executor
+        self._keys = {}  # node id -> (key as configured, parsed public key, PEM)
+        self._verified = OrderedDict()  # digest of (PEM, hash, signature) -> None, oldest first
+
+    def public_key(self, node_id, key):
+        """
+        Return the parsed public key and PEM of an authority node, parsing it only once.
+
+        Args:
+            node_id (str): The authority's identifier.
+            key: The key from authority_nodes: an RSAPublicKey, or PEM as bytes or str.
+
+        Returns:
+            tuple: (RSAPublicKey, PEM bytes).
+        """
+        cached = self._keys.get(node_id)
+        if cached is not None and cached[0] is key:
+            return cached[1], cached[2]
+        if isinstance(key, (str, bytes)):
+            pem = key.encode() if isinstance(key, str) else key
+            public_key = serialization.load_pem_public_key(pem)
+        else:
+            public_key = key
+            pem = key.public_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PublicFormat.SubjectPublicKeyInfo
+            )
+        self._keys[node_id] = (key, public_key, pem)
+        return public_key, pem
+
+    def audit(self, chain, authority_nodes, start=0, require_signatures=False):
+        """
+        Verify the authority signatures of chain from height start to its tip.
+
+        Args:
+            chain (list): The blockchain's list of blocks.
+            authority_nodes (dict): Node identifier -> public key.
+            start (int): First height to audit.
+            require_signatures (bool): Treat unsigned blocks as invalid. Off by default,
+                since blocks sealed without an authority carry no signature.
+
+        Returns:
+            ValidationReport: The outcome, including the height of the first bad signature.
+        """
+        start = max(start, getattr(chain, 'base', 0))
+        end = len(chain)
+        groups = {}  # node id -> [(height, hash, signature, memo key)]
+        failures = []
+        for height in range(start, end):
+            block_hash, authority, signature = _signature_of(chain, height)
+            if signature is None:
+                if require_signatures:
+                    failures.append((height, "block is not signed by an authority"))
+                    break
+                continue
+            if authority not in authority_nodes:
+                failures.append((height, f"signed by unknown authority {authority!r}"))
+                break
+            _, pem = self.public_key(authority, authority_nodes[authority])
+            memo_key = hashlib.sha256(pem + block_hash.encode() + signature).digest()
+            if memo_key in self._verified:
+                continue
+            groups.setdefault(authority, []).append((height, block_hash, signature, memo_key))
+
+        # Blocks after a structural failure are still verified, so the earliest bad
+        # signature is reported even if it comes before that failure
+        for height in self._verify_groups(groups, authority_nodes):
+            failures.append((height, "authority signature does not verify"))
+
+        checked = end - start
+        if failures:
+            height, reason = min(failures)
+            return ValidationReport(False, height, reason, height - start + 1)
+        return ValidationReport(True, None, None, checked)
+
+    def _verify_groups(self, groups, authority_nodes):
+        total = sum(len(items) for items in groups.values())
+        failed = set()
+        if total < self.parallel_threshold or (self.executor is None and self.max_workers == 1):
+            for authority, items in groups.items():
+                public_key, _ = self.public_key(authority, authority_nodes[authority])
+                failed.update(_verify_items(public_key, [item[:3] for item in items]))
+        elif self.executor is not None:
+            failed.update(self._verify_shared(groups, authority_nodes))
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = []
+                for authority, items in groups.items():
+                    _, pem = self.public_key(authority, authority_nodes[authority])
+                    for i in range(0, len(items), self.chunk_size):
+                        chunk = [item[:3] for item in items[i:i + self.chunk_size]]
+                        futures.append(executor.submit(verify_signature_batch, pem, chunk))
+                for future in futures:
+                    failed.update(future.result())
+
+        for items in groups.values():
+            for height, _, _, memo_key in items:
+                if height not in failed:
+                    self._remember(memo_key)
+        return sorted(failed)
+
+    def _verify_shared(self, groups, authority_nodes):
+        futures, failed = [], []
+        for authority, items in groups.items():
+            public_key, pem = self.public_key(authority, authority_nodes[authority])
+            for i in range(0, len(items), self.chunk_size):
+                chunk = [item[:3] for item in items[i:i + self.chunk_size]]
+                try:
+                    futures.append(self.executor.submit(verify_signature_batch, pem, chunk))
+                except CryptoBusyError:
+                    failed.extend(_verify_items(public_key, chunk))
+        for future in futures:
+            failed.extend(future.result())
+        return failed
+
+    def _remember(self, memo_key):
+        self._verified[memo_key] = None
+        if len(self._verified) > self.memo_size:
+            self._verified.popitem(last=False)
+
+
+def _signature_of(chain, height):
+    """
+    Return (hash, authority, signature bytes) of the block at height.
+
+    Reads the stored dictionary of a LazyChain so no Block has to be built.
+    """
+    if isinstance(chain, LazyChain):
+        block_data = chain.read_data(height)
+        signature = block_data.get('authority_signature')
+        return block_data['hash'], block_data.get('authority'), base64.b64decode(signature) if signature else None
+    block = chain[height]
+    return block.hash, block.authority, block.authority_signature
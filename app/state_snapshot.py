@@ -0,0 +1,144 @@
+import hashlib
+import json
+from bisect import bisect_left
+from app.storage import read_json, write_json_atomic
+
+STATE_OPERATION = 'STATE_SNAPSHOT'  # Transaction that commits a snapshot's hash to the chain
+STATE_RECIPIENT = 'STATE_REGISTRY'
+
+
+class StateSnapshot:
+    """
+    The account state after the first height blocks of the chain.
+
+    Holds what a node needs to serve requests without the blocks themselves: the
+    balance table, the stake map, the user registry (what get_user_data returns
+    per username) and the DID registry (the stored DID document per username).
+    Its state_hash is committed to the chain in a STATE_SNAPSHOT transaction, so
+    a new node can start from a snapshot fetched from any peer and check it
+    against a block signed by an authority.
+    """
+
+    def __init__(self, height, tip_hash, balances=None, stakes=None, users=None, dids=None):
+        """
+        Initialize a snapshot.
+
+        Args:
+            height (int): Number of blocks the state covers.
+            tip_hash (str): Hash of the block at height - 1.
+            balances (dict, optional): Account -> balance.
+            stakes (dict, optional): Account -> staked amount.
+            users (dict, optional): Username -> registration data.
+            dids (dict, optional): Username -> DID document.
+        """
+        self.height = height
+        self.tip_hash = tip_hash
+        self.balances = balances or {}
+        self.stakes = stakes or {}
+        self.users = users or {}
+        self.dids = dids or {}
+
+    @classmethod
+    def capture(cls, blockchain, previous=None):
+        """
+        Take a snapshot of a chain's committed state; call it under the commit lock.
+
+        The registries are carried over from previous and completed with the
+        registrations committed after it, found through the index, so only the
+        transactions since the previous snapshot are decoded.
+
+        Args:
+            blockchain (Blockchain): The chain to snapshot.
+            previous (StateSnapshot, optional): An earlier snapshot of the same chain.
+
+        Returns:
+            StateSnapshot: The state at the chain's tip.
+        """
+        head = blockchain.snapshot()
+        manager = blockchain.balance_manager
+        start = previous.height if previous is not None else 0
+        users = dict(previous.users) if previous is not None else {}
+        dids = dict(previous.dids) if previous is not None else {}
+        index = blockchain.index
+
+        for posting in _postings_since(index.operation_postings('USER_REGISTRATION'), start):
+            transaction = blockchain.get_transaction(posting)
+            if transaction.sender not in users:
+                users[transaction.sender] = registration_data(transaction)
+        for posting in _postings_since(index.operation_postings('STORE_DID'), start):
+            transaction = blockchain.get_transaction(posting)
+            if transaction.sender not in dids:
+                dids[transaction.sender] = _decode(transaction.data)
+
+        # Amounts are normalized to floats: a replayed balance and one restored from
+        # JSON must serialize, and so hash, the same way
+        return cls(
+            head.height, head.tip_hash,
+            balances={account: float(amount) for account, amount in manager.balances.items()},
+            stakes={account: float(amount) for account, amount in manager.stakes.items()},
+            users=users, dids=dids
+        )
+
+    def to_dict(self):
+        """Return the snapshot as a JSON-serializable dictionary."""
+        return {
+            "height": self.height,
+            "tip_hash": self.tip_hash,
+            "balances": self.balances,
+            "stakes": self.stakes,
+            "users": self.users,
+            "dids": self.dids
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a snapshot from to_dict() output."""
+        return cls(data["height"], data["tip_hash"], data["balances"], data["stakes"], data["users"], data["dids"])
+
+    @property
+    def state_hash(self):
+        """SHA-256 of the canonical JSON encoding of the snapshot."""
+        encoded = json.dumps(self.to_dict(), sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def commitment(self):
+        """Return the data of the STATE_SNAPSHOT transaction that commits this snapshot."""
+        return {"height": self.height, "tip_hash": self.tip_hash, "state_hash": self.state_hash}
+
+    def save(self, filename):
+        """Write the snapshot to a JSON file."""
+        write_json_atomic(filename, self.to_dict())
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Read a snapshot written by save().
+
+        Returns:
+            StateSnapshot: The snapshot, or None if the file is missing or unreadable.
+        """
+        data = read_json(filename)
+        try:
+            return cls.from_dict(data) if data else None
+        except (KeyError, TypeError):
+            return None
+
+
+def registration_data(transaction):
+    """Return the user data recorded by a USER_REGISTRATION transaction."""
+    data = _decode(transaction.data)
+    return {
+        'encrypted_secret_phrase': data.get('encrypted_secret_phrase'),
+        'public_key': data.get('public_key'),
+        'profession': data.get('profession'),
+        'secret_verifier': data.get('secret_verifier')
+    }
+
+
+def _decode(data):
+    return json.loads(data) if isinstance(data, str) else data
+
+
+def _postings_since(postings, height):
+    """Return the postings at or after height; posting lists are sorted."""
+    return postings[bisect_left(postings, (height,)):]
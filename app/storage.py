@@ -0,0 +1,541 @@
+import json
+import os
+import threading
+import zlib
+from array import array
+
+
+class BlockLogError(IOError):
+    """Raised when the block log contains a damaged record that is not the final one."""
+
+
+class BlockLog:
+    """
+    Append-only storage for blocks.
+
+    Every block is written as a single framed line::
+
+        <payload length, 8 hex digits> <CRC-32 of payload, 8 hex digits> <compact JSON payload>\\n
+
+    Appending a block writes and fsyncs only the new record, so the cost of a
+    commit no longer depends on the length of the chain. The length and checksum
+    let the reader detect a record that was torn by a crash mid-write.
+
+    The byte offset of every record is also kept in an ``.offsets`` sidecar (one
+    unsigned 64-bit integer per block) so a reader can open the log without
+    scanning it.
+    """
+
+    FORMAT = 'json'
+    EXTENSION = '.jsonl'
+    HEADER_SIZE = 18  # "llllllll cccccccc "
+
+    def __init__(self, filename):
+        """
+        Initialize the block log.
+
+        Args:
+            filename (str): Path of the log file.
+        """
+        self.filename = filename
+        self.offsets_filename = filename + '.offsets'
+        self._reader = None  # Read-only handle used for random access
+        self._read_lock = threading.Lock()
+
+    def exists(self):
+        """Return True if the log file is present on disk."""
+        return os.path.exists(self.filename)
+
+    @staticmethod
+    def encode_record(block_data):
+        """
+        Frame a block dictionary as one log record.
+
+        Args:
+            block_data (dict): The block as returned by Block.to_dict().
+
+        Returns:
+            bytes: The framed record, including the trailing newline.
+        """
+        payload = json.dumps(block_data, sort_keys=True, separators=(',', ':')).encode()
+        return b'%08x %08x ' % (len(payload), zlib.crc32(payload)) + payload + b'\n'
+
+    def append(self, block_data):
+        """
+        Append one block to the end of the log and fsync it.
+
+        Args:
+            block_data (dict): The block as returned by Block.to_dict().
+
+        Returns:
+            int: The byte offset of the new record.
+        """
+        record = self.encode_record(block_data)
+        with open(self.filename, 'ab') as f:
+            offset = f.tell()
+            f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.offsets_filename, 'ab') as f:
+            f.write(array('Q', [offset]).tobytes())
+        return offset
+
+    def read_at(self, offset):
+        """
+        Read and verify the block stored at a byte offset.
+
+        Args:
+            offset (int): Offset of the record, as returned by append() or load_offsets().
+
+        Returns:
+            dict: The stored block dictionary.
+        """
+        with self._read_lock:
+            if self._reader is None:
+                self._reader = open(self.filename, 'rb')
+            self._reader.seek(offset)
+            header = self._reader.read(self.HEADER_SIZE)
+            try:
+                length = int(header[0:8], 16)
+            except ValueError:
+                raise BlockLogError(f"Corrupted record at offset {offset} in {self.filename}")
+            data = header + self._reader.read(length + 1)
+        payload, _ = self._decode_at(data, 0)
+        if payload is None:
+            raise BlockLogError(f"Corrupted record at offset {offset} in {self.filename}")
+        return json.loads(payload)
+
+    def read_blocks(self):
+        """
+        Read every block stored in the log.
+
+        A damaged final record (for example one torn by a crash) is cut off so the
+        next append starts from a clean offset. Damage anywhere else raises.
+
+        Returns:
+            list: The stored block dictionaries, in chain order.
+        """
+        if not self.exists():
+            return []
+
+        blocks = []
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+
+        offset = 0
+        while offset < len(data):
+            payload, next_offset = self._decode_at(data, offset)
+            if payload is None:
+                if data.find(b'\n', offset) in (-1, len(data) - 1):
+                    print(f"Discarding incomplete record at offset {offset} in {self.filename}.")
+                    self._truncate(offset)
+                    break
+                raise BlockLogError(f"Corrupted record at offset {offset} in {self.filename}")
+            blocks.append(json.loads(payload))
+            offset = next_offset
+        return blocks
+
+    def load_offsets(self):
+        """
+        Return the byte offset of every record without decoding any block.
+
+        Offsets come from the sidecar when it is consistent with the log; records
+        appended after the sidecar was last written are found by hopping from
+        header to header. A torn final record is cut off as in read_blocks().
+
+        Returns:
+            array: Record offsets ('Q' typecode), in chain order.
+
+        Raises:
+            BlockLogError: If a record other than the last one is damaged.
+        """
+        offsets = array('Q')
+        if not self.exists():
+            return offsets
+        size = os.path.getsize(self.filename)
+
+        if os.path.exists(self.offsets_filename):
+            with open(self.offsets_filename, 'rb') as f:
+                raw = f.read()
+            offsets.frombytes(raw[:len(raw) - len(raw) % offsets.itemsize])
+        dirty = False
+
+        with open(self.filename, 'rb') as f:
+            if offsets and offsets[0] != 0:
+                offsets, dirty = array('Q'), True  # Sidecar belongs to another log
+            # Drop sidecar entries that do not point at a complete record
+            while offsets and self._sidecar_end(f, offsets[-1], size) is None:
+                offsets.pop()
+                dirty = True
+
+            offset = self._record_end(f, offsets[-1], size) if offsets else 0
+            while offset < size:
+                end = self._record_end(f, offset, size)
+                if end is None:
+                    print(f"Discarding incomplete record at offset {offset} in {self.filename}.")
+                    self._truncate(offset)
+                    break
+                offsets.append(offset)
+                dirty = True
+                offset = end
+
+        if dirty:
+            self._write_offsets(offsets)
+        return offsets
+
+    def rewrite(self, blocks_data):
+        """
+        Atomically replace the whole log with the given blocks.
+
+        Used for compaction and for the one-time migration from the legacy
+        JSON array file.
+
+        Args:
+            blocks_data (iterable): Block dictionaries, in chain order.
+        """
+        offsets = array('Q')
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            for block_data in blocks_data:
+                offsets.append(f.tell())
+                f.write(self.encode_record(block_data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, self.filename)
+        _fsync_directory(self.filename)
+        self._write_offsets(offsets)
+        self.close()
+
+    def truncate(self, count):
+        """
+        Drop every block from height count onwards, e.g. when a fork is abandoned.
+
+        Args:
+            count (int): Number of blocks to keep.
+        """
+        offsets = self.load_offsets()
+        if count >= len(offsets):
+            return
+        self.close()
+        self._truncate(offsets[count])
+        self._write_offsets(offsets[:count])
+
+    def close(self):
+        """Close the random-access read handle; it is reopened on the next read."""
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def _write_offsets(self, offsets):
+        tmp_filename = self.offsets_filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            f.write(offsets.tobytes())
+        os.replace(tmp_filename, self.offsets_filename)
+
+    def _sidecar_end(self, f, offset, size):
+        """Return _record_end for a sidecar entry, or None if it points at no complete record."""
+        try:
+            return self._record_end(f, offset, size)
+        except BlockLogError:
+            return None  # Stale entry; the hop from the entries before it decides
+
+    def _record_end(self, f, offset, size):
+        """
+        Return the offset just past the record at offset, or None if it is the
+        final record and incomplete.
+
+        Only the header and the trailing newline are read; the payload is skipped.
+
+        Raises:
+            BlockLogError: If the record is damaged and other records follow it.
+        """
+        end = None
+        if offset + self.HEADER_SIZE <= size:
+            f.seek(offset)
+            header = f.read(self.HEADER_SIZE)
+            try:
+                end = offset + self.HEADER_SIZE + int(header[0:8], 16)
+            except ValueError:
+                pass
+        if end is not None and end < size:
+            f.seek(end)
+            if f.read(1) == b'\n':
+                return end + 1
+        if self._is_last_record(f, offset, size):
+            return None
+        raise BlockLogError(f"Corrupted record at offset {offset} in {self.filename}")
+
+    @staticmethod
+    def _is_last_record(f, offset, size):
+        """Return True if no record starts after offset: no newline ends one before the last byte."""
+        f.seek(offset)
+        position = offset
+        while position < size - 1:
+            chunk = f.read(min(1 << 20, size - 1 - position))
+            if b'\n' in chunk:
+                return False
+            position += len(chunk)
+        return True
+
+    def _decode_at(self, data, offset):
+        """
+        Decode the record starting at offset.
+
+        Returns:
+            tuple: (payload, next_offset). payload is None if the record is damaged,
+            in which case next_offset is where the record claims to end.
+        """
+        header = data[offset:offset + self.HEADER_SIZE]
+        try:
+            length = int(header[0:8], 16)
+            checksum = int(header[9:17], 16)
+        except ValueError:
+            newline = data.find(b'\n', offset)
+            return None, len(data) if newline == -1 else newline + 1
+        start = offset + self.HEADER_SIZE
+        end = start + length
+        payload = data[start:end]
+        if len(payload) != length or data[end:end + 1] != b'\n' or zlib.crc32(payload) != checksum:
+            return None, end + 1
+        return payload, end + 1
+
+    def _truncate(self, offset):
+        with open(self.filename, 'r+b') as f:
+            f.truncate(offset)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class SnapshotLog:
+    """
+    Append-only sidecar that derived state is snapshotted to one interval at a time.
+
+    Each record holds what changed over the blocks [start, height) and the hash of
+    the block at height - 1, framed like a BlockLog record::
+
+        <body length, 8 hex digits> <CRC-32 of body, 8 hex digits> <JSON header>\\n<binary payload>\\n
+
+    Saving a snapshot appends and fsyncs one record, so its cost depends on the
+    blocks since the last one rather than on the length of the chain. Reading
+    stops at the first record that is torn, does not continue the previous one or
+    is no longer part of the chain (after a fork switch); the next append cuts
+    those off.
+    """
+
+    def __init__(self, filename):
+        """
+        Initialize the log.
+
+        Args:
+            filename (str): Path of the log file.
+        """
+        self.filename = filename
+        self.records = []  # (height, end offset) of every record read or appended
+        self.end = 0  # Offset just past the last record still part of the chain
+
+    @property
+    def height(self):
+        """Height covered by the records still part of the chain, or None if there are none."""
+        return self.records[-1][0] if self.records else None
+
+    def read(self, chain, start):
+        """
+        Iterate over the records that continue each other from start and match chain.
+
+        A record only counts as read once the caller asks for the next one, so a
+        caller that rejects a record stops the log there too.
+
+        Args:
+            chain (list): The blockchain's list of blocks.
+            start (int): Height the first record must start at.
+
+        Yields:
+            tuple: (header dict, payload bytes) of each record, in order.
+        """
+        try:
+            with open(self.filename, 'rb') as f:
+                data = f.read()
+        except IOError:
+            return
+        offset = 0
+        while offset < len(data):
+            header, payload, end = self._decode_at(data, offset)
+            if header is None or header.get("start") != start \
+                    or not start < header.get("height", 0) <= len(chain) \
+                    or _block_hash(chain, header["height"] - 1) != header.get("tip_hash"):
+                return
+            yield header, payload
+            self.records.append((header["height"], end))
+            self.end = offset = end
+            start = header["height"]
+
+    def append(self, header, payload=b''):
+        """
+        Append one record after the last one still part of the chain, and fsync it.
+
+        Args:
+            header (dict): JSON-serializable; must hold "start", "height" and "tip_hash".
+            payload (bytes): Raw data stored after the header.
+        """
+        body = json.dumps(header, separators=(',', ':')).encode() + b'\n' + payload
+        with open(self.filename, 'ab') as f:
+            f.truncate(self.end)
+            f.write(b'%08x %08x ' % (len(body), zlib.crc32(body)) + body + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+            self.end = f.tell()
+        self.records.append((header["height"], self.end))
+
+    def truncate(self, height):
+        """
+        Forget the records that reach past height, e.g. when a fork is abandoned.
+
+        They are cut off the file by the next append.
+
+        Returns:
+            int: The height covered by the records kept, or None if there are none.
+        """
+        while self.records and self.records[-1][0] > height:
+            self.records.pop()
+        self.end = self.records[-1][1] if self.records else 0
+        return self.height
+
+    @staticmethod
+    def _decode_at(data, offset):
+        """Return (header, payload, next_offset) of the record at offset; header is None if it is damaged."""
+        try:
+            length = int(data[offset:offset + 8], 16)
+            checksum = int(data[offset + 9:offset + 17], 16)
+        except ValueError:
+            return None, None, None
+        start = offset + BlockLog.HEADER_SIZE
+        body = data[start:start + length]
+        if len(body) != length or data[start + length:start + length + 1] != b'\n' \
+                or zlib.crc32(body) != checksum:
+            return None, None, None
+        header, _, payload = body.partition(b'\n')
+        try:
+            return json.loads(header), payload, start + length + 1
+        except ValueError:
+            return None, None, None
+
+
+def _block_hash(chain, height):
+    """Return the hash of the block at height, from the chain's columns if they hold it."""
+    columns = getattr(chain, 'columns', None)
+    if columns is not None and columns.base <= height < columns.height:
+        return columns.block_hash_at(height)
+    return chain[height].hash
+
+
+def block_log_class(format='json'):
+    """
+    Return the block log class that implements an on-disk format.
+
+    Args:
+        format (str): 'json' for the JSON Lines log, 'binary' for the memory-mapped binary log.
+
+    Returns:
+        type: BlockLog or one of its subclasses.
+    """
+    if format == 'json':
+        return BlockLog
+    if format == 'binary':
+        from app.binary_log import BinaryBlockLog
+        return BinaryBlockLog
+    raise ValueError(f"Unknown block log format: {format}")
+
+
+def open_block_log(filename, format='json'):
+    """
+    Open a block log in the given on-disk format.
+
+    Args:
+        filename (str): Path of the log file.
+        format (str): 'json' or 'binary'.
+
+    Returns:
+        BlockLog: The log (not yet read).
+    """
+    return block_log_class(format)(filename)
+
+
+def convert_block_log(source, destination):
+    """
+    Copy every block from one block log to another, in either format.
+
+    Args:
+        source (BlockLog): The log to read.
+        destination (BlockLog): The log to (re)write.
+
+    Returns:
+        int: The number of blocks copied.
+    """
+    offsets = source.load_offsets()
+    destination.rewrite(source.read_at(offset) for offset in offsets)
+    return len(offsets)
+
+
+def export_legacy_json(source, filename):
+    """
+    Export a block log as the legacy pretty-printed JSON array file.
+
+    Args:
+        source (BlockLog): The log to read.
+        filename (str): Path of the JSON file to write.
+
+    Returns:
+        int: The number of blocks exported.
+    """
+    blocks = source.read_blocks()
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w') as f:
+        json.dump(blocks, f, indent=4)
+    os.replace(tmp_filename, filename)
+    return len(blocks)
+
+
+def _fsync_directory(filename):
+    """Flush a rename in the directory containing filename (no-op where unsupported)."""
+    directory = os.path.dirname(os.path.abspath(filename))
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_json_atomic(filename, data):
+    """
+    Write a JSON sidecar file so that readers see either the old or the new version.
+
+    Args:
+        filename (str): Destination path.
+        data: JSON-serializable object.
+    """
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w') as f:
+        f.write(json.dumps(data, separators=(',', ':')))  # dumps uses the C encoder; dump does not
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
+
+
+def read_json(filename):
+    """
+    Read a JSON sidecar file.
+
+    Returns:
+        The decoded object, or None if the file is missing or unreadable.
+    """
+    try:
+        with open(filename, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError, ValueError):
+        return None
@@ -0,0 +1,751 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from app.block import Block
+from app.mempool import MempoolError
+from app.state_snapshot import STATE_OPERATION, StateSnapshot
+from app.validation import check_block
+
+MAX_BATCH = 2000  # Most hashes, headers or blocks answered in one request
+MAX_REQUEST_SIZE = 64 * 1024  # Largest request frame a server accepts
+MAX_RESPONSE_SIZE = 512 * 1024 * 1024  # Largest response frame a client accepts
+HANDSHAKE_TIMEOUT = 10.0  # Seconds a new connection has to exchange nonces
+
+SyncResult = namedtuple('SyncResult', ['peer_height', 'fork_height', 'added', 'removed', 'seconds'])
+SyncResult.__doc__ = """
+Outcome of one sync with a peer.
+
+Attributes:
+    peer_height (int): The peer's chain height.
+    fork_height (int): Height of the first block that differed from the peer's chain.
+    added (int): Blocks taken from the peer.
+    removed (list): Local blocks dropped because the peer's fork won.
+    seconds (float): Duration of the sync.
+"""
+
+
+class SyncError(ValueError):
+    """Raised when a peer's chain cannot be adopted: no common genesis, or an invalid block."""
+
+
+class ChannelError(ConnectionError):
+    """Raised when a peer fails authentication or sends a malformed frame."""
+
+
+def parse_address(value):
+    """Turn 'host:port' into the (host, port) tuple used by the sync sockets."""
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def is_loopback(host):
+    """Return True if host resolves to a loopback address."""
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+class MessageChannel:
+    """
+    Length-prefixed JSON messages over a TCP socket, authenticated with the network's key.
+
+    When the connection opens both ends send a random nonce, and a session key is
+    derived from the shared key and both nonces. Every frame is a 4-byte length, an
+    HMAC-SHA256 tag over the direction, the frame's sequence number and the
+    payload, then the JSON payload. A peer without the key can neither send a
+    request nor replay or reflect frames, and the tag is checked before the payload
+    is parsed. Nothing a peer sends is ever unpickled.
+    """
+
+    NONCE_SIZE = 32
+    TAG_SIZE = 32
+    LENGTH = struct.Struct('>I')
+
+    def __init__(self, sock, authkey, initiator, max_size):
+        """
+        Exchange nonces with the peer.
+
+        Args:
+            sock (socket.socket): The connected socket.
+            authkey (bytes): Shared secret of the network.
+            initiator (bool): True on the side that opened the connection.
+            max_size (int): Largest payload accepted from the peer.
+
+        Raises:
+            OSError: If the peer does not complete the exchange in time.
+        """
+        self.sock = sock
+        self.max_size = max_size
+        sock.settimeout(HANDSHAKE_TIMEOUT)
+        nonce = os.urandom(self.NONCE_SIZE)
+        sock.sendall(nonce)
+        peer_nonce = self._read_exact(self.NONCE_SIZE)
+        sock.settimeout(None)
+        client_nonce, server_nonce = (nonce, peer_nonce) if initiator else (peer_nonce, nonce)
+        self._key = hmac.new(authkey, b'greenledger-sync' + client_nonce + server_nonce, hashlib.sha256).digest()
+        self._send_direction, self._recv_direction = (b'C', b'S') if initiator else (b'S', b'C')
+        self._sent = 0
+        self._received = 0
+
+    def _tag(self, direction, sequence, payload):
+        return hmac.new(self._key, direction + sequence.to_bytes(8, 'big') + payload, hashlib.sha256).digest()
+
+    def _read_exact(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.sock.recv(min(size - len(data), 1 << 20))
+            if not chunk:
+                raise EOFError("connection closed by peer")
+            data += chunk
+        return bytes(data)
+
+    def send(self, message):
+        """Send one JSON-serializable message."""
+        payload = json.dumps(message, separators=(',', ':')).encode()
+        tag = self._tag(self._send_direction, self._sent, payload)
+        self._sent += 1
+        self.sock.sendall(self.LENGTH.pack(len(payload)) + tag + payload)
+
+    def recv(self):
+        """
+        Receive one message.
+
+        Raises:
+            ChannelError: If the frame is too large, fails authentication or is not JSON.
+            EOFError: If the peer closed the connection.
+        """
+        size, = self.LENGTH.unpack(self._read_exact(self.LENGTH.size))
+        if size > self.max_size:
+            raise ChannelError(f"frame of {size} bytes exceeds the limit of {self.max_size}")
+        tag = self._read_exact(self.TAG_SIZE)
+        payload = self._read_exact(size)
+        if not hmac.compare_digest(tag, self._tag(self._recv_direction, self._received, payload)):
+            raise ChannelError("frame failed authentication")
+        self._received += 1
+        try:
+            return json.loads(payload)
+        except ValueError:
+            raise ChannelError("frame is not valid JSON")
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def prefer_chain(local, peer):
+    """
+    Fork-choice rule: should the peer's chain replace the local one?
+
+    The longer chain wins; between two chains of the same height the one whose
+    tip hash sorts lower wins, so every node settles on the same tip.
+
+    Args:
+        local (tuple): (height, tip_hash) of the local chain.
+        peer (tuple): (height, tip_hash) of the peer's chain.
+
+    Returns:
+        bool: True if the peer's chain is preferred.
+    """
+    if peer[0] != local[0]:
+        return peer[0] > local[0]
+    return peer[1] != local[1] and peer[1] < local[1]
+
+
+class SyncServer:
+    """
+    Answers the sync requests of other nodes over TCP.
+
+    Peers ask for the chain status, then for block hashes and headers, and only
+    then for block bodies, in ranges. New nodes may ask for the latest committed
+    state snapshot instead of the early blocks. Each connection is served on its
+    own thread, over a MessageChannel; errors are answered as strings.
+    """
+
+    METHODS = {'status', 'hashes', 'headers', 'blocks', 'state'}
+
+    def __init__(self, blockchain, address=('127.0.0.1', 0), authkey=None):
+        """
+        Bind the listening socket.
+
+        Args:
+            blockchain (Blockchain): The chain to serve.
+            address (tuple): (host, port) to listen on; port 0 picks a free port.
+            authkey (bytes): Shared secret of the network.
+        """
+        self.blockchain = blockchain
+        self.authkey = authkey
+        self.listener = socket.create_server(address)
+        self.address = self.listener.getsockname()[:2]
+        self._closed = False
+
+    def start(self):
+        """Serve on a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        """Accept peers until close() is called."""
+        while not self._closed:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError as e:
+                if not self._closed:
+                    print(f"Could not accept sync peer: {e}")
+                continue
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def close(self):
+        """Stop accepting peers."""
+        self._closed = True
+        self.listener.close()
+
+    def _serve(self, sock):
+        peer = sock.getpeername()
+        try:
+            channel = MessageChannel(sock, self.authkey, initiator=False, max_size=MAX_REQUEST_SIZE)
+        except (OSError, EOFError) as e:
+            sock.close()
+            print(f"Rejected sync peer {peer[0]}:{peer[1]}: {e}")
+            return
+        with channel:
+            while True:
+                try:
+                    request = channel.recv()
+                except ChannelError as e:
+                    print(f"Rejected sync peer {peer[0]}:{peer[1]}: {e}")
+                    return
+                except (EOFError, OSError):
+                    return
+                if not (isinstance(request, list) and len(request) == 2 and request[0] in self.METHODS
+                        and isinstance(request[1], list)):
+                    channel.send(['error', f"Malformed sync request: {str(request)[:100]}"])
+                    continue
+                method, args = request
+                try:
+                    result = getattr(self, method)(*args)
+                except Exception as e:
+                    channel.send(['error', str(e) or type(e).__name__])
+                else:
+                    channel.send(['ok', result])
+
+    def status(self):
+        """Return (height, tip_hash) of the committed chain."""
+        return tuple(self.blockchain.snapshot())
+
+    def _check_start(self, start, count=0):
+        if not all(isinstance(value, int) and not isinstance(value, bool) and value >= 0
+                   for value in (start, count)):
+            raise SyncError("start and count must be non-negative integers.")
+        base = getattr(self.blockchain.chain, 'base', 0)
+        if start < base:
+            raise SyncError(f"Blocks below height {base} are pruned on this node.")
+
+    def hashes(self, start, count):
+        """Return the hashes of up to count blocks from height start."""
+        self._check_start(start, count)
+        chain = self.blockchain.chain
+        end = min(start + min(count, MAX_BATCH), self.blockchain.snapshot().height)
+        columns = getattr(chain, 'columns', None)
+        if columns is not None and columns.height >= end:
+            return [columns.block_hash_at(height) for height in range(start, end)]
+        return [chain[height].hash for height in range(start, end)]
+
+    def headers(self, start, count):
+        """Return the headers (every field but the transactions) of up to count blocks from height start."""
+        self._check_start(start, count)
+        end = min(start + min(count, MAX_BATCH), self.blockchain.snapshot().height)
+        headers = []
+        for height in range(start, end):
+            header = self.blockchain.chain.read_data(height)
+            del header['transactions']
+            headers.append(header)
+        return headers
+
+    def blocks(self, start, count):
+        """Return the stored dictionaries of up to count blocks from height start."""
+        self._check_start(start, count)
+        end = min(start + min(count, MAX_BATCH), self.blockchain.snapshot().height)
+        return [self.blockchain.chain.read_data(height) for height in range(start, end)]
+
+    def state(self):
+        """Return the latest committed state snapshot as a dict, and the height of its commitment."""
+        state, commit_height = self.blockchain.committed_state()
+        if state is None:
+            raise SyncError("This node has no committed state snapshot yet.")
+        return state.to_dict(), commit_height
+
+
+class SyncClient:
+    """One connection to a peer's SyncServer."""
+
+    def __init__(self, address, authkey):
+        """
+        Connect to a peer.
+
+        Args:
+            address (tuple): The peer's (host, port).
+            authkey (bytes): Shared secret of the network.
+        """
+        self.address = address
+        sock = socket.create_connection(address, timeout=HANDSHAKE_TIMEOUT)
+        try:
+            self.channel = MessageChannel(sock, authkey, initiator=True, max_size=MAX_RESPONSE_SIZE)
+        except BaseException:
+            sock.close()
+            raise
+
+    def call(self, method, *args):
+        """
+        Send one request and return its result.
+
+        Raises:
+            SyncError: If the peer answered with an error.
+            ChannelError: If the answer is not a well-formed response.
+        """
+        self.channel.send([method, list(args)])
+        response = self.channel.recv()
+        if not (isinstance(response, list) and len(response) == 2 and response[0] in ('ok', 'error')):
+            raise ChannelError(f"Malformed response from {self.address}.")
+        status, value = response
+        if status == 'error':
+            raise SyncError(f"Peer {self.address} refused {method}: {value}")
+        return value
+
+    def close(self):
+        self.channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BlockSync:
+    """
+    Catches a Blockchain up with its peers.
+
+    A sync asks the peer for its status and applies the fork-choice rule. It then
+    looks for the last common block by comparing hashes in growing windows back
+    from the tip. Headers from there to the peer's tip are downloaded and checked
+    for linkage and hashes before any body is fetched. Bodies are downloaded by
+    height range over several connections, pipelined, and each range is validated
+    (hashes, Merkle roots, links and authority signatures) on arrival. A plain
+    extension is committed range by range; a fork replaces the local blocks after
+    the fork point only once the whole fork has been validated, and transactions
+    of the dropped blocks go back to the mempool.
+    """
+
+    def __init__(self, blockchain, authkey, workers=4, range_size=256):
+        """
+        Initialize the syncer.
+
+        Args:
+            blockchain (Blockchain): The local chain.
+            authkey (bytes): Shared secret of the network.
+            workers (int): Parallel connections used to download bodies.
+            range_size (int): Blocks per body request.
+        """
+        self.blockchain = blockchain
+        self.authkey = authkey
+        self.workers = workers
+        self.range_size = min(range_size, MAX_BATCH)
+
+    def sync(self, address):
+        """
+        Sync with one peer.
+
+        Args:
+            address (tuple): The peer's (host, port).
+
+        Returns:
+            SyncResult: What changed.
+
+        Raises:
+            SyncError: If the peer's chain shares no genesis or fails validation.
+        """
+        started = time.perf_counter()
+        with SyncClient(address, self.authkey) as client:
+            peer_height, peer_tip = _peer_status(client)
+            local = self.blockchain.snapshot()
+            if not prefer_chain(local, (peer_height, peer_tip)):
+                return SyncResult(peer_height, local.height, 0, [], time.perf_counter() - started)
+            fork = self.find_fork_point(client, min(local.height, peer_height))
+            headers = self.fetch_headers(client, fork, peer_height)
+
+        if fork == local.height:
+            added = self._extend(address, fork, headers)
+            removed = []
+        else:
+            added, removed = self._switch_fork(address, fork, headers, (peer_height, peer_tip))
+        return SyncResult(peer_height, fork, added, removed, time.perf_counter() - started)
+
+    def _local_hash(self, height):
+        columns = getattr(self.blockchain.chain, 'columns', None)
+        if columns is not None and columns.height > height:
+            return columns.block_hash_at(height)
+        return self.blockchain.chain[height].hash
+
+    def find_fork_point(self, client, height):
+        """
+        Return the height of the first block after the last one both chains share.
+
+        Args:
+            client (SyncClient): Connection to the peer.
+            height (int): Heights at or above this are not compared.
+
+        Raises:
+            SyncError: If not even the genesis blocks match.
+        """
+        base = getattr(self.blockchain.chain, 'base', 0)
+        window = 64
+        while height > base:
+            start = max(base, height - window)
+            peer_hashes = client.call('hashes', start, height - start)
+            if not isinstance(peer_hashes, list):
+                raise SyncError(f"Malformed hashes from {client.address}.")
+            peer_hashes = peer_hashes[:height - start]
+            for h in range(start + len(peer_hashes) - 1, start - 1, -1):
+                if peer_hashes[h - start] == self._local_hash(h):
+                    return h + 1
+            height = start
+            window = min(window * 2, MAX_BATCH)
+        raise SyncError(f"Peer {client.address} does not share our {'base' if base else 'genesis'} block.")
+
+    def fetch_headers(self, client, start, end, previous_hash=None):
+        """
+        Download and check the headers of heights start to end.
+
+        Each header must link to the previous one, and version 2 headers must hash
+        to their block hash, so a bogus chain is rejected before any body is fetched.
+
+        Args:
+            client (SyncClient): Connection to the peer.
+            start (int): First height.
+            end (int): Height after the last one.
+            previous_hash (str, optional): Hash of the block at start - 1; read from
+                the local chain when omitted.
+
+        Returns:
+            list: The headers, in chain order.
+        """
+        if previous_hash is None:
+            previous_hash = self._local_hash(start - 1)
+        headers = []
+        while start + len(headers) < end:
+            batch = client.call('headers', start + len(headers), end - start - len(headers))
+            if not isinstance(batch, list) or not all(_is_header(header) for header in batch):
+                raise SyncError(f"Malformed headers from {client.address}.")
+            if not batch:
+                raise SyncError(f"Peer {client.address} stopped answering headers at height {start + len(headers)}.")
+            for header in batch:
+                height = start + len(headers)
+                if header['index'] != height or header['previous_hash'] != previous_hash:
+                    raise SyncError(f"Header {height} from {client.address} does not link to its predecessor.")
+                if header.get('version', 1) >= 2 and Block.hash_header({
+                        "version": header['version'], "index": header['index'], "timestamp": header['timestamp'],
+                        "previous_hash": header['previous_hash'], "merkle_root": header['merkle_root'],
+                        "nonce": header['nonce']}) != header['hash']:
+                    raise SyncError(f"Header {height} from {client.address} does not match its hash.")
+                headers.append(header)
+                previous_hash = header['hash']
+        return headers
+
+    def _download(self, address, start, headers, history=None):
+        """
+        Yield validated (start, blocks) ranges in chain order while later ranges download.
+
+        Args:
+            history (dict, optional): Blocks below start, by height, that the authority
+                slot checks may read instead of the local chain.
+        """
+        end = start + len(headers)
+        recent = {} if history is None else dict(history)  # Blocks the slot checks of the next range may read
+        local = threading.local()  # One connection per download thread
+        clients = []
+
+        def fetch_range(range_start):
+            if not hasattr(local, 'client'):
+                local.client = SyncClient(address, self.authkey)
+                clients.append(local.client)
+            data = local.client.call('blocks', range_start, min(self.range_size, end - range_start))
+            return _peer_data(address, 'blocks', lambda: [Block.from_dict(block_data) for block_data in data])
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [(s, executor.submit(fetch_range, s)) for s in range(start, end, self.range_size)]
+                try:
+                    for range_start, future in futures:
+                        blocks = future.result()
+                        self._validate(address, range_start, blocks, headers[range_start - start:],
+                                       recent, use_local=history is None)
+                        yield range_start, blocks
+                finally:
+                    for _, future in futures:
+                        future.cancel()
+        finally:
+            for client in clients:
+                client.close()
+
+    def _validate(self, address, start, blocks, headers, recent, use_local=True):
+        if not blocks:
+            raise SyncError(f"Peer {address} returned no blocks at height {start}.")
+        blockchain = self.blockchain
+        scheduler = blockchain.scheduler
+
+        def block_at(height):
+            # Blocks of this download first: after a fork point the local ones are not ancestors
+            block = recent.get(height)
+            if block is None and use_local and getattr(blockchain.chain, 'base', 0) <= height < len(blockchain.chain):
+                block = blockchain.chain[height]
+            return block
+
+        previous_hash = headers[0]['previous_hash']
+        for offset, block in enumerate(blocks):
+            height = start + offset
+            if block.hash != headers[offset]['hash']:
+                raise SyncError(f"Block {height} from {address} does not match its header.")
+            reason = check_block(block, height, previous_hash) or scheduler.check_signer(height, block, block_at)
+            if reason is not None:
+                raise SyncError(f"Block {height} from {address} is invalid: {reason}")
+            recent[height] = block
+            previous_hash = block.hash
+        # The slot checks read back at most one block per authority
+        for height in [h for h in recent if h < start + len(blocks) - len(blockchain.authority_nodes) - 1]:
+            del recent[height]
+        # On a proof-of-authority network every block must be signed, as for bootstrap
+        report = blockchain.auditor.audit(blocks, blockchain.authority_nodes,
+                                          require_signatures=bool(blockchain.authority_nodes))
+        if not report.valid:
+            raise SyncError(f"Block {start + report.first_invalid} from {address} is invalid: {report.reason}")
+
+    def _extend(self, address, start, headers):
+        added = 0
+        for _, blocks in self._download(address, start, headers):
+            try:
+                self.blockchain.import_blocks(blocks)
+            except ValueError as e:
+                raise SyncError(f"Local chain moved during sync: {e}")
+            added += len(blocks)
+        return added
+
+    def _switch_fork(self, address, fork, headers, peer_status):
+        # The local blocks are only dropped once the whole fork has been validated
+        blocks = [block for _, batch in self._download(address, fork, headers) for block in batch]
+        blockchain = self.blockchain
+        with blockchain._commit_lock:
+            if not prefer_chain(blockchain.snapshot(), peer_status) or self._local_hash(fork - 1) != headers[0]['previous_hash']:
+                raise SyncError("Local chain moved during sync.")
+            removed = blockchain.truncate(fork)
+            blockchain.import_blocks(blocks)
+            # Transactions only the abandoned fork contained go back to the mempool; the
+            # switch has already happened, so a full mempool only drops the orphan
+            for block in removed:
+                for transaction in block.transactions:
+                    if blockchain.index.locate(transaction.hash) is None:
+                        transaction.state = 'Pending'
+                        try:
+                            blockchain.queue_transaction(transaction)
+                        except MempoolError as e:
+                            print(f"Dropped orphaned transaction {transaction.hash}: {e}")
+        print(f"Switched to the fork of {address} at height {fork}: "
+              f"{len(removed)} blocks dropped, {len(blocks)} adopted.")
+        return len(blocks), removed
+
+    def bootstrap(self, address):
+        """
+        Start a new node from a peer's latest committed state snapshot.
+
+        Only the snapshot, its anchor block (the last block it covers) and the
+        blocks after the anchor are downloaded, so the time taken does not depend
+        on the length of the history. The snapshot is trusted once its hash is
+        found in a STATE_SNAPSHOT transaction of a downloaded block, which must be
+        signed by an authority when the network has any.
+
+        Args:
+            address (tuple): The peer's (host, port).
+
+        Returns:
+            SyncResult: What was adopted; fork_height is the snapshot's height.
+
+        Raises:
+            SyncError: If the snapshot, its anchor or the later blocks do not check out.
+        """
+        started = time.perf_counter()
+        with SyncClient(address, self.authkey) as client:
+            answer = client.call('state')
+            state, commit_height = _peer_data(address, 'state', lambda: (StateSnapshot.from_dict(answer[0]), answer[1]))
+            if not isinstance(commit_height, int) or not isinstance(state.height, int) or state.height < 1:
+                raise SyncError(f"Malformed state from {address}.")
+            peer_height, _ = _peer_status(client)
+            anchor_data = client.call('blocks', state.height - 1, 1)
+            anchor = _peer_data(address, 'anchor block', lambda: Block.from_dict(anchor_data[0]))
+            headers = self.fetch_headers(client, state.height, peer_height, previous_hash=state.tip_hash)
+
+        reason = check_block(anchor, state.height - 1, None)
+        if reason is None and anchor.hash != state.tip_hash:
+            reason = "it is not the tip of the state snapshot"
+        if reason is None:
+            reason = self.blockchain.auditor.audit([anchor], self.blockchain.authority_nodes).reason
+        if reason is not None:
+            raise SyncError(f"Anchor block {state.height - 1} from {address} is invalid: {reason}")
+
+        blocks = [block for _, batch in self._download(address, state.height, headers, {anchor.index: anchor})
+                  for block in batch]
+        self._check_commitment(address, state, blocks, commit_height)
+        try:
+            self.blockchain.bootstrap(state, anchor, blocks)
+        except ValueError as e:
+            raise SyncError(str(e))
+        return SyncResult(peer_height, state.height, len(blocks), [], time.perf_counter() - started)
+
+    def _check_commitment(self, address, state, blocks, commit_height):
+        offset = commit_height - state.height
+        if not 0 <= offset < len(blocks):
+            raise SyncError(f"Peer {address} named block {commit_height} as the state commitment, "
+                            f"outside the blocks it sent.")
+        block = blocks[offset]
+        if self.blockchain.authority_nodes and block.authority is None:
+            raise SyncError(f"State commitment block {commit_height} from {address} is not signed by an authority.")
+        commitment = state.commitment()
+        if not any(tx.operation == STATE_OPERATION and tx.sender == 'SYSTEM' and tx.data == commitment
+                   for tx in block.transactions):
+            raise SyncError(f"State snapshot from {address} does not match the hash committed in block {commit_height}.")
+
+    def sync_all(self, addresses):
+        """
+        Sync with every peer, in order.
+
+        Returns:
+            list: (address, SyncResult or SyncError) per peer.
+        """
+        results = []
+        for address in addresses:
+            try:
+                results.append((address, self.sync(address)))
+            except (SyncError, OSError, EOFError) as e:
+                results.append((address, e))
+        return results
+
+    def run(self, addresses, interval=1.0):
+        """Sync with the peers every interval seconds until the process exits."""
+        while True:
+            for address, result in self.sync_all(addresses):
+                if isinstance(result, Exception):
+                    print(f"Sync with {address} failed: {result}")
+            time.sleep(interval)
+
+
+HEADER_FIELDS = ('index', 'previous_hash', 'hash', 'timestamp')
+HEADER_V2_FIELDS = ('version', 'merkle_root', 'nonce')
+
+
+def _is_header(header):
+    """Check that a header from a peer has the fields fetch_headers() reads."""
+    if not isinstance(header, dict) or not all(field in header for field in HEADER_FIELDS):
+        return False
+    version = header.get('version', 1)
+    return isinstance(version, int) and (version < 2 or all(field in header for field in HEADER_V2_FIELDS))
+
+
+def _peer_status(client):
+    """Ask a peer for its (height, tip hash), checking the answer's shape."""
+    status = client.call('status')
+    if not (isinstance(status, list) and len(status) == 2 and isinstance(status[0], int)
+            and isinstance(status[1], str)):
+        raise SyncError(f"Malformed status from {client.address}.")
+    return tuple(status)
+
+
+def _peer_data(address, what, parse):
+    """Call parse on data received from a peer, turning a malformed answer into a SyncError."""
+    try:
+        return parse()
+    except SyncError:
+        raise
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError) as e:
+        raise SyncError(f"Malformed {what} from {address}: {e!r}")
+
+
+class LocalNetwork:
+    """
+    Several Blockchain nodes in one process, talking over loopback sockets.
+
+    Each node has its own directory, block log and SyncServer on 127.0.0.1. Used
+    to test and benchmark sync, catch-up and fork choice on one machine.
+    """
+
+    def __init__(self, size, directory=None, format='json', authority_nodes=None, workers=4, range_size=256):
+        """
+        Create the nodes.
+
+        Args:
+            size (int): Number of nodes.
+            directory (str, optional): Where the nodes store their chains; a temporary
+                directory, removed by close(), when omitted.
+            format (str): Block log format of every node.
+            authority_nodes (dict, optional): Authority public keys shared by every node.
+            workers (int): Body download connections per sync.
+            range_size (int): Blocks per body request.
+        """
+        from app.blockchain import Blockchain
+
+        self._owns_directory = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix='greenledger-net-')
+        self.authkey = os.urandom(32)
+        self.nodes = []
+        self.servers = []
+        self.syncers = []
+        for i in range(size):
+            node_directory = os.path.join(self.directory, f'node{i}')
+            os.makedirs(node_directory, exist_ok=True)
+            blockchain = Blockchain(os.path.join(node_directory, 'blockchain.json'), format=format,
+                                    authority_nodes=authority_nodes)
+            self.nodes.append(blockchain)
+            self.servers.append(SyncServer(blockchain, authkey=self.authkey).start())
+            self.syncers.append(BlockSync(blockchain, self.authkey, workers=workers, range_size=range_size))
+
+    def peers_of(self, i):
+        """Return the addresses of every node but node i."""
+        return [server.address for j, server in enumerate(self.servers) if j != i]
+
+    def sync(self, i, j):
+        """Sync node i from node j."""
+        return self.syncers[i].sync(self.servers[j].address)
+
+    def bootstrap(self, i, j):
+        """Start node i from the latest committed state snapshot of node j."""
+        return self.syncers[i].bootstrap(self.servers[j].address)
+
+    def sync_node(self, i):
+        """Sync node i from every other node."""
+        return self.syncers[i].sync_all(self.peers_of(i))
+
+    def converged(self):
+        """Return True if every node has the same tip."""
+        return len({tuple(node.snapshot()) for node in self.nodes}) == 1
+
+    def close(self):
+        """Stop the servers and remove the temporary directory."""
+        for server in self.servers:
+            server.close()
+        for node in self.nodes:
+            node.storage.close()
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
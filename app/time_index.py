@@ -0,0 +1,199 @@
+import math
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from itertools import accumulate
+
+PERIODS = ('day', 'month', 'quarter', 'year')
+
+
+class TimeIndex:
+    """
+    Maps block heights to timestamps and back by bisection.
+
+    Holds, for every height, the latest block timestamp up to and including that
+    height. Block timestamps only go backwards when the clocks of two authorities
+    disagree; the running maximum keeps the array sorted regardless, so a time
+    range always maps to one contiguous range of heights. On a chain bootstrapped
+    from a state snapshot the index starts at the chain's base height.
+    """
+
+    def __init__(self, base=0):
+        """
+        Initialize an empty index.
+
+        Args:
+            base (int): Height of the first block the index covers.
+        """
+        self.base = base
+        self.sealed = array('d')  # Height - base -> latest block timestamp so far
+
+    @property
+    def height(self):
+        """Number of blocks covered, counted from genesis."""
+        return self.base + len(self.sealed)
+
+    def add_block(self, block):
+        """
+        Record the timestamp of a newly committed block.
+
+        Args:
+            block (Block): The block appended at height ``self.height``.
+        """
+        timestamp = float(block.timestamp)
+        if self.sealed and self.sealed[-1] > timestamp:
+            timestamp = self.sealed[-1]
+        self.sealed.append(timestamp)
+
+    def height_at(self, timestamp):
+        """
+        Return the first height whose block was sealed at or after timestamp.
+
+        Returns:
+            int: A height between base and self.height; self.height if every block is older.
+        """
+        return self.base + bisect_left(self.sealed, timestamp)
+
+    def heights_between(self, start, end):
+        """
+        Return the heights of the blocks sealed in [start, end).
+
+        Args:
+            start (float): Unix timestamp, inclusive.
+            end (float): Unix timestamp, exclusive.
+
+        Returns:
+            tuple: (first height, end height), a half-open range that is empty if no block matches.
+        """
+        first = self.height_at(start)
+        return first, max(first, self.height_at(end))
+
+    def timestamp_at(self, height):
+        """Return the time by which the block at height had been sealed."""
+        if not self.base <= height < self.height:
+            raise IndexError(f"Height {height} is not covered by the time index.")
+        return self.sealed[height - self.base]
+
+    @classmethod
+    def load(cls, chain):
+        """
+        Build the index of chain.
+
+        Reads the block timestamps from the chain's columns when they cover it, so
+        no block has to be decoded.
+
+        Args:
+            chain (list): The blockchain's list of blocks.
+
+        Returns:
+            TimeIndex: An index covering every block of chain.
+        """
+        base = getattr(chain, 'base', 0)
+        index = cls(base)
+        columns = getattr(chain, 'columns', None)
+        if columns is not None and columns.height == len(chain) and columns.base == base:
+            index.sealed = array('d', accumulate(columns.block_timestamp, max))
+        else:
+            for height in range(base, len(chain)):
+                index.add_block(chain[height])
+        return index
+
+
+def period_keys(timestamp):
+    """
+    Return the UTC day, month, quarter and year labels of a Unix timestamp.
+
+    Returns:
+        dict: e.g. {'day': '2024-10-31', 'month': '2024-10', 'quarter': '2024-Q4', 'year': '2024'}.
+    """
+    date = datetime.fromtimestamp(timestamp, timezone.utc)
+    return {
+        'day': f"{date.year:04d}-{date.month:02d}-{date.day:02d}",
+        'month': f"{date.year:04d}-{date.month:02d}",
+        'quarter': f"{date.year:04d}-Q{(date.month - 1) // 3 + 1}",
+        'year': f"{date.year:04d}",
+    }
+
+
+def period_granularity(period):
+    """
+    Return the granularity of a period label and its canonical form.
+
+    Args:
+        period (str): '2024', '2024-Q4', '2024-10' or '2024-10-31' (UTC).
+
+    Returns:
+        tuple: (granularity, label), e.g. ('month', '2024-10') for '2024-10'.
+
+    Raises:
+        ValueError: If the label is not one of those forms.
+    """
+    start, _ = period_bounds(period)
+    if '-Q' in period:
+        granularity = 'quarter'
+    else:
+        granularity = ('year', 'month', 'day')[period.count('-')]
+    return granularity, period_keys(start)[granularity]
+
+
+def parse_timestamp(value):
+    """
+    Return a timestamp given as Unix seconds or ISO 8601 (UTC unless an offset is stated).
+
+    Args:
+        value (float or str): e.g. 1714557600, '1714557600', '2024-05-01' or '2024-05-01T10:00:00Z'.
+
+    Raises:
+        ValueError: If value is neither, or is negative.
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid timestamp {value!r}.")
+    try:
+        timestamp = float(value)
+    except (TypeError, ValueError):
+        try:
+            date = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f"Invalid timestamp {value!r}; expected Unix seconds or ISO 8601.")
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        timestamp = date.timestamp()
+    if not math.isfinite(timestamp) or timestamp < 0:
+        raise ValueError(f"Invalid timestamp {value!r}.")
+    return timestamp
+
+
+def period_bounds(period):
+    """
+    Return the [start, end) Unix timestamps of a period label.
+
+    Args:
+        period (str): '2024', '2024-Q4', '2024-10' or '2024-10-31' (UTC).
+
+    Raises:
+        ValueError: If the label is not one of those forms.
+    """
+    try:
+        if '-Q' in period:
+            year, quarter = period.split('-Q')
+            start = datetime(int(year), 3 * int(quarter) - 2, 1, tzinfo=timezone.utc)
+            end = _add_months(start, 3)
+        else:
+            parts = [int(part) for part in period.split('-')]
+            start = datetime(*(parts + [1] * (3 - len(parts))), tzinfo=timezone.utc)
+            if len(parts) == 1:
+                end = start.replace(year=start.year + 1)
+            elif len(parts) == 2:
+                end = _add_months(start, 1)
+            elif len(parts) == 3:
+                end = datetime.fromtimestamp(start.timestamp() + 86400, timezone.utc)
+            else:
+                raise ValueError(period)
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError(f"Invalid period {period!r}; expected YYYY, YYYY-Qn, YYYY-MM or YYYY-MM-DD.")
+    return start.timestamp(), end.timestamp()
+
+
+def _add_months(date, months):
+    month = date.month - 1 + months
+    return date.replace(year=date.year + month // 12, month=month % 12 + 1)
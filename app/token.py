@@ -59,61 +59,43 @@ class GreenToken:
 class TokenStake:
     def __init__(self, blockchain):
         self.blockchain = blockchain
-        self.user_stakes = {}  # Initialize the user_stakes dictionary
+
+    @property
+    def user_stakes(self):
+        """Stakes per user, materialized from committed STAKE/UNSTAKE transactions."""
+        return self.blockchain.balance_manager.stakes
 
     def stake_tokens(self, user_did, amount):
         # Validate input
         if amount <= 0:
             raise ValueError("Amount must be greater than zero.")
 
-        # Check if the user has enough balance
-        user_balance = self.blockchain.user_balance_manager.get_balance(user_did)
-        if user_balance < amount:
-            raise ValueError("Insufficient balance to stake.")
-
-        # Update the user's stake
-        self.user_stakes[user_did] = self.user_stakes.get(user_did, 0) + amount
-
-        # Update the user's balance
-        self.blockchain.user_balance_manager.update_balance(user_did, user_balance - amount)
-
-        # Create a transaction for staking
-        self.blockchain.add_transaction(
+        # Create a transaction for staking, if the user can afford it after their pending spends;
+        # stake and balance are updated when its block commits
+        self.blockchain.add_spend_transaction(
             sender=user_did,
             recipient="STAKE_POOL",
             operation="STAKE",
             data={"amount": amount}
         )
-        self.blockchain.add_block()
+        self.blockchain.mine_block()
 
-        print(f"User {user_did} staked {amount} tokens. New stake: {self.user_stakes[user_did]}, New balance: {self.blockchain.user_balance_manager.get_balance(user_did)}")
+        print(f"User {user_did} staked {amount} tokens. New stake: {self.user_stakes.get(user_did, 0)}, New balance: {self.blockchain.get_balance(user_did)}")
 
     def unstake_tokens(self, user_did, amount):
         # Validate input
         if amount <= 0:
             raise ValueError("Amount must be greater than zero.")
 
-        # Check if the user has enough staked tokens
-        if self.user_stakes.get(user_did, 0) < amount:
-            raise ValueError("Insufficient stake to unstake.")
-
-        # Update the user's stake
-        self.user_stakes[user_did] -= amount
-        if self.user_stakes[user_did] == 0:
-            del self.user_stakes[user_did]
-
-        # Update the user's balance
-        current_balance = self.blockchain.user_balance_manager.get_balance(user_did)
-        self.blockchain.user_balance_manager.update_balance(user_did, current_balance + amount)
-
-        # Create a transaction for unstaking
-        self.blockchain.add_transaction(
+        # Create a transaction for unstaking, if the stake covers it after pending unstakes;
+        # stake and balance are updated when its block commits
+        self.blockchain.add_spend_transaction(
             sender="STAKE_POOL",
             recipient=user_did,
             operation="UNSTAKE",
             data={"amount": amount}
         )
-        self.blockchain.add_block()
+        self.blockchain.mine_block()
 
         print(f"User {user_did} unstaked {amount} tokens. New stake: {self.user_stakes.get(user_did, 0)}")
 
@@ -128,41 +110,28 @@ class TokenStake:
         if amount <= 0:
             raise ValueError("Amount must be greater than zero.")
 
-        # Ensure both sender and recipient are initialized
-        self.blockchain.user_balance_manager.initialize_user(sender_did)
-        self.blockchain.user_balance_manager.initialize_user(recipient_did)
-
-        # Check if the sender has enough balance
-        sender_balance = self.blockchain.calculate_user_balance(sender_did)
-        if sender_balance < amount:
-            raise ValueError("Insufficient balance to drop.")
-
-        # Use the UserBalance class to update balances
-        self.blockchain.user_balance_manager.send_tokens(sender_did, recipient_did, amount)
-
-        # Create a transaction for dropping
-        self.blockchain.add_transaction(
+        # Create a transaction for dropping, if the sender can afford it after their pending spends;
+        # balances are updated when its block commits
+        self.blockchain.add_spend_transaction(
             sender=sender_did,
             recipient=recipient_did,
             operation="DROP",
             data={"amount": amount}
         )
-        self.blockchain.add_block()
+        self.blockchain.mine_block()
 
 class TokenManager:
     def __init__(self, blockchain):
         self.blockchain = blockchain
 
     def transfer_tokens(self, sender, recipient, amount):
-        if self.blockchain.get_balance(sender) < amount:
-            raise ValueError("Insufficient balance")
-        transaction = self.blockchain.add_transaction(
+        transaction = self.blockchain.add_spend_transaction(
             sender=sender,
             recipient=recipient,
             operation='TOKEN_TRANSFER',
             data={'amount': amount}
         )
-        self.blockchain.add_block()
+        self.blockchain.mine_block()
         return transaction
 
     def mint_tokens(self, recipient, amount):
@@ -172,17 +141,15 @@ class TokenManager:
             operation='MINT_TOKENS',
             data={'amount': amount}
         )
-        self.blockchain.add_block()
+        self.blockchain.mine_block()
         return transaction
 
     def burn_tokens(self, sender, amount):
-        if self.blockchain.get_balance(sender) < amount:
-            raise ValueError("Insufficient balance")
-        transaction = self.blockchain.add_transaction(
+        transaction = self.blockchain.add_spend_transaction(
             sender=sender,
             recipient='SYSTEM',
             operation='BURN_TOKENS',
             data={'amount': amount}
         )
-        self.blockchain.add_block()
+        self.blockchain.mine_block()
         return transaction
@@ -1,9 +1,17 @@
 import time
 import hashlib
 import json
+import sys
+
+def _intern(value):
+    """Share one copy of frequently repeated strings (operations, account names)."""
+    return sys.intern(value) if type(value) is str else value
 
 class Transaction:
-    def __init__(self, operation, sender, recipient, amount=None, data=None):
+    # Fixed attribute layout: no per-instance __dict__
+    __slots__ = ('operation', 'sender', 'recipient', 'amount', 'data', 'timestamp', 'state', 'hash')
+
+    def __init__(self, operation, sender, recipient, amount=None, data=None, timestamp=None, state='Pending', hash=None):
         """
         Initialize a new transaction.
 
@@ -13,15 +21,18 @@ class Transaction:
             recipient (str): The DID of the recipient.
             amount (float, optional): The amount of tokens or emissions involved in the transaction.
             data (dict, optional): Additional data related to the transaction.
+            timestamp (float, optional): Creation time; defaults to now.
+            state (str, optional): Processing state; defaults to 'Pending'.
+            hash (str, optional): The stored hash; calculated if not given.
         """
-        self.operation = operation
-        self.sender = sender
-        self.recipient = recipient
+        self.operation = _intern(operation)
+        self.sender = _intern(sender)
+        self.recipient = _intern(recipient)
         self.amount = amount
         self.data = data or {}
-        self.timestamp = time.time()
-        self.state = 'Pending'  # Default state is 'Pending'
-        self.hash = self.calculate_hash()  # Calculate and store the hash
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.state = state  # Default state is 'Pending'
+        self.hash = hash if hash is not None else self.calculate_hash()  # Calculate and store the hash
 
     def calculate_hash(self):
         """
@@ -59,13 +70,25 @@ class Transaction:
             "hash": self.hash  # Include the hash in the dictionary
         }
 
+    def is_valid(self):
+        """
+        Check that the stored hash still matches the transaction's contents.
+
+        Returns:
+            bool: True if the transaction has not been tampered with.
+        """
+        return self.hash == self.calculate_hash()
+
     @classmethod
     def from_dict(cls, tx_data):
-        """Create a Transaction object from a dictionary."""
+        """Create a Transaction object from a dictionary, keeping its stored timestamp, state and hash."""
         return cls(
             operation=tx_data['operation'],
             sender=tx_data['sender'],
             recipient=tx_data['recipient'],
             amount=tx_data.get('amount'),
-            data=tx_data['data']
+            data=tx_data['data'],
+            timestamp=tx_data.get('timestamp'),
+            state=tx_data.get('state', 'Pending'),
+            hash=tx_data.get('hash')
         )
@@ -0,0 +1,178 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from app.block import Block
+from app.lazy_chain import LazyChain
+from app.storage import open_block_log
+
+ValidationReport = namedtuple('ValidationReport', ['valid', 'first_invalid', 'reason', 'checked'])
+ValidationReport.__doc__ = """
+Outcome of a chain validation.
+
+Attributes:
+    valid (bool): True if every checked block is valid.
+    first_invalid (int): Height of the first invalid block, or None.
+    reason (str): Why that block is invalid, or None.
+    checked (int): Number of blocks covered by the validation.
+"""
+
+
+def check_block(block, height, previous_hash):
+    """
+    Check a single block against its expected height and predecessor.
+
+    Args:
+        block (Block): The block to check.
+        height (int): The height the block is stored at.
+        previous_hash (str): The hash of the block before it, or None for genesis.
+
+    Returns:
+        str: A description of the first problem found, or None if the block is valid.
+    """
+    if block.index != height:
+        return f"index {block.index} stored at height {height}"
+    if previous_hash is not None and block.previous_hash != previous_hash:
+        return "previous_hash does not match the preceding block"
+    for tx in block.transactions:
+        if not tx.is_valid():
+            return f"transaction {tx.hash} does not match its hash"
+    if not block.is_valid():
+        return "block hash does not match its contents"
+    return None
+
+
+def verify_range(start, blocks_data, previous_hash):
+    """
+    Verify a contiguous range of serialized blocks, stopping at the first failure.
+
+    Runs inside the worker processes, so it only takes picklable arguments.
+
+    Args:
+        start (int): Height of the first block in the range.
+        blocks_data (list): Block dictionaries as returned by Block.to_dict().
+        previous_hash (str): Hash of the block before the range, or None at genesis.
+
+    Returns:
+        tuple: (height, reason) of the first invalid block, or None if all are valid.
+    """
+    for offset, block_data in enumerate(blocks_data):
+        height = start + offset
+        reason = check_block(Block.from_dict(block_data), height, previous_hash)
+        if reason is not None:
+            return height, reason
+        previous_hash = block_data['hash']
+    return None
+
+
+def verify_log_range(start, filename, offsets, previous_hash, format='json'):
+    """
+    Verify a contiguous range of blocks read straight from the block log.
+
+    Lets worker processes decode their own blocks instead of receiving them
+    pickled from the parent.
+
+    Args:
+        start (int): Height of the first block in the range.
+        filename (str): Path of the block log.
+        offsets (list): Record offsets of the blocks in the range.
+        previous_hash (str): Hash of the block before the range, or None at genesis.
+        format (str): On-disk format of the log ('json' or 'binary').
+
+    Returns:
+        tuple: (height, reason) of the first invalid block, or None if all are valid.
+    """
+    storage = open_block_log(filename, format)
+    try:
+        return verify_range(start, [storage.read_at(offset) for offset in offsets], previous_hash)
+    finally:
+        storage.close()
+
+
+class ChainValidator:
+    """
+    Verifies block hashes, Merkle roots and previous_hash links.
+
+    Large ranges are split into chunks and verified in a ProcessPoolExecutor; small
+    ranges are verified in-process, where a pool would cost more than it saves.
+    """
+
+    def __init__(self, max_workers=None, chunk_size=500, parallel_threshold=2000):
+        """
+        Initialize the validator.
+
+        Args:
+            max_workers (int, optional): Worker processes; defaults to the CPU count.
+            chunk_size (int): Blocks per work item.
+            parallel_threshold (int): Minimum number of blocks before a pool is used.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.parallel_threshold = parallel_threshold
+
+    def validate(self, chain, start=0):
+        """
+        Validate chain from height start to its tip.
+
+        Args:
+            chain (list): The blockchain's list of blocks.
+            start (int): First height to verify; the block before it is trusted.
+                Raised to the base height of a chain bootstrapped from a state snapshot.
+
+        Returns:
+            ValidationReport: The outcome, including the height of the first bad block.
+        """
+        start = max(start, getattr(chain, 'base', 0))
+        end = len(chain)
+        if start >= end:
+            return ValidationReport(True, None, None, 0)
+
+        if end - start < self.parallel_threshold or self.max_workers == 1:
+            failure = self._validate_serial(chain, start, end)
+        else:
+            failure = self._validate_parallel(chain, start, end)
+
+        if failure is None:
+            return ValidationReport(True, None, None, end - start)
+        height, reason = failure
+        return ValidationReport(False, height, reason, height - start + 1)
+
+    @staticmethod
+    def _previous_hash(chain, height):
+        # The first stored block of a bootstrapped chain is anchored by the state snapshot
+        return chain[height - 1].hash if height > getattr(chain, 'base', 0) else None
+
+    def _validate_serial(self, chain, start, end):
+        previous_hash = self._previous_hash(chain, start)
+        for height in range(start, end):
+            block = chain[height]
+            reason = check_block(block, height, previous_hash)
+            if reason is not None:
+                return height, reason
+            previous_hash = block.hash
+        return None
+
+    def _validate_parallel(self, chain, start, end):
+        executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = []
+            for chunk_start in range(start, end, self.chunk_size):
+                chunk_end = min(chunk_start + self.chunk_size, end)
+                previous_hash = self._previous_hash(chain, chunk_start)
+                if isinstance(chain, LazyChain):
+                    offsets = chain.offsets[chunk_start - chain.base:chunk_end - chain.base].tolist()
+                    futures.append(executor.submit(
+                        verify_log_range, chunk_start, chain.storage.filename, offsets, previous_hash,
+                        chain.storage.FORMAT
+                    ))
+                else:
+                    blocks_data = [chain[height].to_dict() for height in range(chunk_start, chunk_end)]
+                    futures.append(executor.submit(verify_range, chunk_start, blocks_data, previous_hash))
+            # Ranges are checked in chain order, so the first failure seen is the
+            # first bad block; everything after it is cancelled.
+            for future in futures:
+                failure = future.result()
+                if failure is not None:
+                    return failure
+            return None
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,67 @@
+"""
+Bootstrap benchmark: state snapshot versus full history.
+
+For each history length, builds a chain on one node of a LocalNetwork, then
+starts one fresh node by syncing every block and another from the latest
+committed state snapshot, and compares the time taken and the balances and
+user registry the two nodes end up with.
+
+Usage:
+    python benchmarks/bench_bootstrap.py [--blocks 1000 4000 8000] [--transactions 10] [--state-interval 500]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.sync import LocalNetwork  # noqa: E402
+
+
+def run(blocks, transactions, state_interval, format):
+    network = LocalNetwork(3, format=format)
+    try:
+        source, full, bootstrapped = network.nodes
+        for node in network.nodes:
+            node.state_interval = state_interval
+        for i in range(10):
+            source.add_user_to_blockchain(f'user{i}', 'encrypted', f'public-key-{i}')
+        for height in range(blocks):
+            for i in range(transactions):
+                source.add_transaction('SYSTEM', f'user{i}', 'CREDIT', {'amount': 1, 'block': height})
+            source.add_block()
+        source.add_block()  # Seal the commitment of the last snapshot
+
+        full_result = network.sync(1, 0)
+        boot_result = network.bootstrap(2, 0)
+        same = full.snapshot() == bootstrapped.snapshot() == source.snapshot() and all(
+            full.get_balance(f'user{i}') == bootstrapped.get_balance(f'user{i}')
+            and full.get_user_data(f'user{i}') == bootstrapped.get_user_data(f'user{i}')
+            for i in range(10)
+        )
+        print(f"{len(source.chain):>7} blocks | full sync {full_result.seconds:7.2f}s "
+              f"({full_result.added} blocks) | bootstrap {boot_result.seconds:6.2f}s "
+              f"(snapshot at {boot_result.fork_height}, {boot_result.added} blocks)")
+        return same
+    finally:
+        network.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--blocks', type=int, nargs='+', default=[1000, 4000, 8000])
+    parser.add_argument('--transactions', type=int, default=10, help="Transactions per block.")
+    parser.add_argument('--state-interval', type=int, default=500, help="Blocks between state snapshots.")
+    parser.add_argument('--format', choices=['json', 'binary'], default='json')
+    args = parser.parse_args()
+
+    for blocks in args.blocks:
+        if not run(blocks, args.transactions, args.state_interval, args.format):
+            print("FAILED: the bootstrapped node disagrees with the fully synced one")
+            return 1
+    print("OK: bootstrapped nodes match fully synced ones")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
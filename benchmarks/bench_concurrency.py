@@ -0,0 +1,137 @@
+"""
+Stress benchmark for concurrent writers and lock-free readers.
+
+Many writer threads register users (some racing for the same username) and move
+tokens while the block producer seals batches and reader threads query the
+committed head. At the end the chain is checked for forks and corruption:
+contiguous heights and links, every accepted transaction committed exactly once,
+each contested username registered once, and an identical state after reopening
+the chain from disk.
+
+Usage:
+    python benchmarks/bench_concurrency.py [--writers 16] [--operations 200] [--readers 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.blockchain import Blockchain  # noqa: E402
+from app.transaction import Transaction  # noqa: E402
+
+
+def writer(blockchain, writer_id, operations, accepted, errors):
+    try:
+        for i in range(operations):
+            # Every writer races for the same contested username once per ten operations
+            username = f"contested-{i // 10}" if i % 10 == 0 else f"user-{writer_id}-{i}"
+            registration = Transaction('USER_REGISTRATION', username, 'SYSTEM', data={"public_key": username})
+            credit = Transaction('CREDIT', 'SYSTEM', username, data={'amount': 10})
+            if not blockchain.queue_registration(username, [registration, credit]):
+                continue
+            accepted.extend([registration, credit])
+            transfer = blockchain.add_transaction(username, f"user-{writer_id}-0", 'TOKEN_TRANSFER', {'amount': 1})
+            accepted.append(transfer)
+            blockchain.producer.wait(transfer, timeout=60)
+    except Exception as e:
+        errors.append(f"writer {writer_id}: {e!r}")
+
+
+def reader(blockchain, stop, errors, reads):
+    try:
+        while not stop.is_set():
+            head = blockchain.snapshot()
+            if head.height and blockchain.chain[head.height - 1].hash != head.tip_hash:
+                errors.append(f"snapshot at height {head.height} does not match the chain")
+            blockchain.get_balance('user-0-0')
+            blockchain.is_username_available('contested-0')
+            reads[0] += 1
+    except Exception as e:
+        errors.append(f"reader: {e!r}")
+
+
+def check_chain(blockchain, accepted, writers, operations):
+    problems = []
+    previous_hash = "0"
+    for height, block in enumerate(blockchain.chain):
+        if block.index != height:
+            problems.append(f"block at height {height} has index {block.index}")
+        if height and block.previous_hash != previous_hash:
+            problems.append(f"block {height} does not link to block {height - 1}")
+        previous_hash = block.hash
+
+    report = blockchain.validate()
+    if not report.valid:
+        problems.append(f"validation failed at block {report.first_invalid}: {report.reason}")
+
+    committed = [tx.hash for block in blockchain.chain for tx in block.transactions]
+    if len(committed) != len(set(committed)):
+        problems.append("a transaction was committed more than once")
+    missing = {tx.hash for tx in accepted} - set(committed)
+    if missing:
+        problems.append(f"{len(missing)} accepted transactions were never committed")
+
+    for i in range(0, operations, 10):
+        username = f"contested-{i // 10}"
+        registrations = blockchain.index.sender_postings(username, 'USER_REGISTRATION')
+        if len(registrations) != 1:
+            problems.append(f"{username} registered {len(registrations)} times")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--operations', type=int, default=200, help="Operations per writer.")
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--format', choices=['json', 'binary'], default='json')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'blockchain.json')
+        blockchain = Blockchain(filename, format=args.format)
+        blockchain.producer.max_delay = 0.05
+        blockchain.start_mining()
+
+        accepted, errors, reads = [], [], [0]
+        stop = threading.Event()
+        readers = [threading.Thread(target=reader, args=(blockchain, stop, errors, reads))
+                   for _ in range(args.readers)]
+        writers = [threading.Thread(target=writer, args=(blockchain, i, args.operations, accepted, errors))
+                   for i in range(args.writers)]
+
+        start = time.perf_counter()
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+        problems = errors + check_chain(blockchain, accepted, args.writers, args.operations)
+
+        reopened = Blockchain(filename, format=args.format)
+        if reopened.snapshot() != blockchain.snapshot():
+            problems.append("reopened chain has a different head")
+        if reopened.balance_manager.balances != blockchain.balance_manager.balances:
+            problems.append("reopened chain has different balances")
+
+        print(f"{len(accepted)} transactions in {len(blockchain.chain)} blocks from {args.writers} writers "
+              f"in {elapsed:.2f}s ({len(accepted) / elapsed:.0f} tx/s), {reads[0]} snapshot reads")
+        if problems:
+            print("FAILED:")
+            for problem in problems:
+                print(f"  {problem}")
+            return 1
+        print("OK: no forks, no lost or duplicated transactions, state survives a restart")
+        return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
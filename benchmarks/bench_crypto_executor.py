@@ -0,0 +1,86 @@
+"""
+Latency of light requests during a signup spike, with and without the crypto executor.
+
+A probe thread repeatedly runs a small request-sized piece of work and records
+how long each one takes, while a burst of registrations derives key pairs
+either inline on request threads (the old behaviour) or through CryptoExecutor.
+Inline derivation holds the GIL and stalls the probe; offloaded derivation
+should leave its p99 flat.
+
+Usage:
+    python benchmarks/bench_crypto_executor.py [--registrations 16] [--threads 8]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.crypto_executor import CryptoExecutor  # noqa: E402
+from app.secret import KeyCache, SecretManager  # noqa: E402
+
+
+def light_request():
+    payload = {"user": "alice", "balance": 10.0, "history": list(range(200))}
+    return len(json.dumps(payload))
+
+
+def probe(stop, samples, interval=0.002):
+    # A request "arrives" every interval; its latency includes waiting for the GIL
+    while not stop.is_set():
+        arrival = time.perf_counter() + interval
+        time.sleep(interval)
+        light_request()
+        samples.append(time.perf_counter() - arrival)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+
+def spike(register, phrases, threads):
+    samples, stop = [], threading.Event()
+    prober = threading.Thread(target=probe, args=(stop, samples))
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(register, phrases))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    return elapsed, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--registrations', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=8, help="Concurrent request threads.")
+    args = parser.parse_args()
+
+    manager = SecretManager(key_cache=KeyCache(max_entries=0))
+    phrases = [manager.generate_secret_phrase() for _ in range(args.registrations)]
+
+    executor = CryptoExecutor()
+    executor.generate_key_pair(manager.generate_secret_phrase())  # Start the workers outside the measurement
+
+    for label, register in [
+        ("inline", manager.generate_key_from_secret_phrase),
+        ("executor", executor.generate_key_pair),
+    ]:
+        elapsed, samples = spike(register, phrases, args.threads)
+        print(f"{label:>8}: {args.registrations} registrations in {elapsed:.2f}s; light request "
+              f"p50 {percentile(samples, 0.5):.2f} ms, p99 {percentile(samples, 0.99):.2f} ms "
+              f"({len(samples)} samples)")
+
+    print(f"executor metrics: {json.dumps(executor.metrics())}")
+    executor.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
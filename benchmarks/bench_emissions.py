@@ -0,0 +1,129 @@
+"""
+Carbon-tax benchmark: per-user chain lookups versus the NumPy analytics engine.
+
+Fills a chain with civil, mechanical and electronics emission reports from
+many users, then computes every user's carbon tax twice: once per user by
+decoding each report (what calculate_carbon_tax used to do) and once with a
+single EmissionsAnalytics.tax_run(). Also times the per-profession and
+per-month totals, and the same period lookups served by the emission rollups
+kept up to date at commit, and checks every method agrees.
+
+Usage:
+    python benchmarks/bench_emissions.py [--users 500] [--reports 40] [--format json]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.blockchain import Blockchain  # noqa: E402
+from app.emissions import EmissionsAnalytics  # noqa: E402
+from app.rollups import quantity  # noqa: E402
+from app.transaction import Transaction  # noqa: E402
+
+PROFESSIONS = ['civil_engineer', 'mechanical_engineer', 'electronics_engineer']
+
+
+def report(rng, username, profession, timestamp):
+    if profession == 'civil_engineer':
+        data = {'materials_used': {'concrete': rng.uniform(1, 50), 'steel': rng.uniform(0, 10)},
+                'machinery_emissions': {'excavator': rng.uniform(0, 2)},
+                'energy_consumption': {'grid': rng.uniform(100, 5000)}}
+    elif profession == 'mechanical_engineer':
+        data = {'energy_usage': {'plant': rng.uniform(100, 8000)}, 'operation_hours': {'line': rng.uniform(1, 24)},
+                'fuel_consumption': {'diesel': rng.uniform(10, 500)}}
+    else:
+        data = {'power_usage': {'fab': rng.uniform(500, 20000)}, 'recycling_efforts': {'recycled_kg': rng.uniform(0, 50)}}
+    return Transaction('CARBON_EMISSION', username, 'DID:example:environmentalAgency', data=data, timestamp=timestamp)
+
+
+def per_user_tax(blockchain, username, factors, rate):
+    # The old approach: look up each report of the user and decode it
+    total = 0.0
+    for posting in blockchain.index.sender_postings(username, 'CARBON_EMISSION'):
+        data = blockchain.get_transaction(posting).data
+        total += sum(quantity(data.get(field)) * factor for field, factor in factors.items())
+    return total * rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--reports', type=int, default=40, help="Emission reports per user.")
+    parser.add_argument('--format', choices=['json', 'binary'], default='json')
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as directory:
+        blockchain = Blockchain(os.path.join(directory, 'blockchain.json'), format=args.format)
+        blockchain.producer.max_transactions = 500
+        users = {f'engineer{i}': PROFESSIONS[i % 3] for i in range(args.users)}
+        for username, profession in users.items():
+            blockchain.queue_transaction(Transaction('USER_REGISTRATION', username, 'SYSTEM',
+                                                     data={'public_key': 'pk', 'profession': profession}))
+        start = time.perf_counter()
+        year = 1704067200.0  # 2024-01-01 UTC
+        for i in range(args.reports):
+            for username, profession in users.items():
+                blockchain.queue_transaction(report(rng, username, profession, year + rng.uniform(0, 365 * 86400)))
+            while blockchain.add_block() is not None:
+                pass
+        total_reports = args.users * args.reports
+        print(f"built {total_reports} emission reports in {len(blockchain.chain)} blocks "
+              f"in {time.perf_counter() - start:.2f}s")
+
+        engine = EmissionsAnalytics(blockchain)
+        factors, rate = engine.factors, engine.brackets[0][1]
+        blockchain.chain._cache.clear()
+        start = time.perf_counter()
+        expected = {username: per_user_tax(blockchain, username, factors, rate) for username in users}
+        loop_seconds = time.perf_counter() - start
+        print(f"per-user lookups:  {loop_seconds * 1000:9.1f} ms for {len(users)} users")
+
+        start = time.perf_counter()
+        engine.refresh()
+        print(f"engine first load: {(time.perf_counter() - start) * 1000:9.1f} ms (decodes each report once)")
+        timings = {}
+        for name, query in [('tax run', lambda: engine.tax_run()),
+                            ('tax run 2024-Q2', lambda: engine.tax_run('2024-Q2')),
+                            ('by profession', lambda: engine.totals('profession')),
+                            ('by month', lambda: engine.totals('period', 'month'))]:
+            start = time.perf_counter()
+            for _ in range(10):
+                query()
+            timings[name] = (time.perf_counter() - start) / 10
+            print(f"engine {name + ':':17} {timings[name] * 1000:8.2f} ms")
+        print(f"speedup of a whole-population tax run: {loop_seconds / timings['tax run']:.0f}x")
+        for name, query in [('period totals 2024-Q2', lambda: blockchain.period_totals('2024-Q2')),
+                            ('by month', lambda: blockchain.emission_totals('period', 'month')),
+                            ('tax of one user 2024-Q2', lambda: blockchain.calculate_carbon_tax('engineer0', '2024-Q2'))]:
+            start = time.perf_counter()
+            for _ in range(100):
+                query()
+            print(f"rollup {name + ':':25} {(time.perf_counter() - start) / 100 * 1000:8.3f} ms")
+
+        taxes = engine.tax_run()
+        if any(abs(taxes[username]['tax'] - expected[username]) > 1e-6 * max(1.0, expected[username])
+               for username in users):
+            print("FAILED: the engine disagrees with the per-user computation")
+            return 1
+        if round(sum(entry['emissions'] for entry in engine.totals('profession').values()), 3) \
+                != round(sum(entry['emissions'] for entry in taxes.values()), 3):
+            print("FAILED: profession totals do not add up")
+            return 1
+        quarter = engine.tax_run('2024-Q2')
+        if any(abs(blockchain.calculate_carbon_tax(username, '2024-Q2') - entry['tax']) > 1e-6 * max(1.0, entry['tax'])
+               for username, entry in quarter.items()):
+            print("FAILED: the rollups disagree with the engine")
+            return 1
+        print("OK: engine and rollup taxes match the per-user computation")
+        blockchain.storage.close()
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Explorer benchmark: cursor pages versus scanning the chain.
+
+Fills a chain with transfers from a few hundred senders, then fetches pages of
+transactions near the tip, in the middle and at the very start of the chain,
+unfiltered and filtered by sender and by time range. Each page is timed against
+a naive scan that decodes every block and filters its transactions, and the two
+are checked to return the same transactions.
+
+Usage:
+    python benchmarks/bench_explorer.py [--blocks 2000] [--transactions 20] [--limit 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.blockchain import Blockchain  # noqa: E402
+from app.transaction import Transaction  # noqa: E402
+
+
+def naive_page(blockchain, sender, start, end, cursor, limit):
+    # Decode every block, newest first, and filter its transactions
+    page = []
+    for height in range(len(blockchain.chain) - 1, -1, -1):
+        block = blockchain.chain[height]
+        if not start <= blockchain.time_index.timestamp_at(height) < end:
+            continue
+        for position in range(len(block.transactions) - 1, -1, -1):
+            if cursor is not None and (height, position) >= cursor:
+                continue
+            if sender is None or block.transactions[position].sender == sender:
+                page.append((height, position))
+                if len(page) == limit:
+                    return page
+    return page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=2000)
+    parser.add_argument('--transactions', type=int, default=20, help="Transactions per block.")
+    parser.add_argument('--limit', type=int, default=50, help="Transactions per page.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        blockchain = Blockchain(os.path.join(directory, 'blockchain.json'))
+        for height in range(args.blocks):
+            for i in range(args.transactions):
+                blockchain.queue_transaction(Transaction('TOKEN_TRANSFER', f'user{(height + i) % 300}', 'treasury',
+                                                         data={'amount': 1}, timestamp=1704067200.0 + height))
+            blockchain.add_block()
+        height = len(blockchain.chain)
+        sealed = blockchain.time_index.timestamp_at
+        cases = [
+            ('tip', None, None, None, None),
+            ('middle', None, None, None, f'{height // 2}:0'),
+            ('start', None, None, None, f'{args.limit // args.transactions + 2}:0'),
+            ('sender, tip', 'user7', None, None, None),
+            ('sender, start', 'user7', None, None, f'{300 // args.transactions + 2}:0'),
+            ('time range', None, sealed(height // 4), sealed(height // 4 + 10), None),
+        ]
+        blockchain.chain._cache.clear()
+        failed = False
+        for name, sender, start, end, cursor in cases:
+            started = time.perf_counter()
+            page = blockchain.explore_transactions(sender, None, start, end, cursor, args.limit)
+            page_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            expected = naive_page(blockchain, sender, start or 0.0, end or float('inf'),
+                                  tuple(map(int, cursor.split(':'))) if cursor else None, args.limit)
+            scan_ms = (time.perf_counter() - started) * 1000
+            blockchain.chain._cache.clear()
+            got = [(entry['height'], entry['position']) for entry in page['transactions']]
+            failed |= got != expected
+            print(f"{name:14} page {page_ms:7.2f} ms | scan {scan_ms:8.1f} ms | {len(got)} transactions")
+        blockchain.storage.close()
+    if failed:
+        print("FAILED: a page differs from the scan")
+        return 1
+    print("OK: every page matches the scan")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Bulk ingestion benchmark: rows per second and memory for growing files.
+
+Writes CSV files of civil engineering readings of increasing size, streams
+each through EmissionIngestor into a fresh chain, and reports the throughput
+and the memory allocated while ingesting (tracemalloc). What the chain keeps
+(index, columns, rollups) grows with the rows committed; the transient peak
+above it should stay flat as the file grows, since only one chunk is held at
+a time. A few malformed rows check that they are reported with their line
+numbers.
+
+Usage:
+    python benchmarks/bench_ingest.py [--rows 10000 40000] [--chunk-size 500]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.blockchain import Blockchain  # noqa: E402
+from app.ingest import EmissionIngestor  # noqa: E402
+from app.transaction import Transaction  # noqa: E402
+
+BAD_ROWS = ['engineer0,2024-03-01,abc,1,1,1\n', 'stranger,2024-03-01,1,1,1,1\n']
+
+
+def write_readings(filename, rows, rng):
+    with open(filename, 'w') as f:
+        f.write('username,timestamp,amount,materials_used.concrete,materials_used.steel,energy_consumption\n')
+        for n in range(rows):
+            f.write(f'engineer{n % 20},{1704067200 + n * 30},{rng.uniform(0, 3):.3f},'
+                    f'{rng.uniform(1, 50):.2f},{rng.uniform(0, 5):.2f},{rng.uniform(100, 900):.1f}\n')
+        f.writelines(BAD_ROWS)
+
+
+def run(directory, rows, chunk_size, rng):
+    blockchain = Blockchain(os.path.join(directory, f'chain{rows}.json'))
+    blockchain.producer.max_transactions = 500
+    for i in range(20):
+        blockchain.queue_transaction(Transaction('USER_REGISTRATION', f'engineer{i}', 'SYSTEM',
+                                                 data={'public_key': 'pk', 'profession': 'civil_engineer'}))
+    blockchain.add_block()
+    filename = os.path.join(directory, f'readings{rows}.csv')
+    write_readings(filename, rows, rng)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(filename, newline='') as lines:
+        report = EmissionIngestor(blockchain, chunk_size=chunk_size).ingest(lines, 'csv')
+    seconds = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blockchain.storage.close()
+    print(f"{rows:>8} rows | {rows / seconds:8.0f} rows/s | {report.blocks:>4} blocks "
+          f"| retained {retained / 1e6:6.1f} MB | transient peak {(peak - retained) / 1e6:5.1f} MB "
+          f"| {report.error_count} rejected")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 40000])
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in args.rows:
+            report = run(directory, rows, args.chunk_size, rng)
+            if report.committed != rows or [error['line'] for error in report.errors] != [rows + 2, rows + 3]:
+                print("FAILED: rows were lost or errors misreported")
+                return 1
+    print("OK: every valid row committed, malformed rows reported by line")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Proof-of-work throughput: the single-threaded mining loop against MiningEngine.
+
+For each difficulty, the same blocks are mined with the loop that rebuilds the
+header JSON for every nonce (the original Block.mine_block), with the in-process
+midstate loop (Block.mine_block today) and with the multi-process engine. Reports
+time per block and hashes per second, and checks every mined hash.
+
+Usage:
+    python benchmarks/bench_mining.py [--difficulties 3 4 5 6] [--blocks 3] [--workers N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.block import Block  # noqa: E402
+from app.mining import MiningEngine  # noqa: E402
+from app.transaction import Transaction  # noqa: E402
+
+
+def make_block(height):
+    transactions = [Transaction('CREDIT', 'SYSTEM', f'user{i}', {'amount': i}) for i in range(10)]
+    return Block(height, transactions, '0' * 64, timestamp=1700000000.0 + height)
+
+
+def rebuild_loop(block, difficulty):
+    # The original loop: the whole header is serialized again for every nonce
+    target = '0' * difficulty
+    while not block.hash.startswith(target):
+        block.nonce += 1
+        block.hash = block.calculate_hash()
+    return True
+
+
+def run(label, mine, difficulty, blocks, max_seconds):
+    elapsed = hashes = mined = 0
+    for height in range(1, blocks + 1):
+        block = make_block(height)
+        start = time.perf_counter()
+        mine(block, difficulty)
+        elapsed += time.perf_counter() - start
+        # The loops try every nonce in order, so the nonce counts their attempts
+        hashes += block.nonce
+        mined += 1
+        if block.hash != block.calculate_hash() or not block.hash.startswith('0' * difficulty):
+            raise SystemExit(f"FAILED: {label} produced an invalid hash at difficulty {difficulty}")
+        if elapsed > max_seconds:
+            break
+    return elapsed / mined, hashes / elapsed, mined
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--difficulties', type=int, nargs='+', default=[3, 4, 5, 6])
+    parser.add_argument('--blocks', type=int, default=3, help="Blocks mined per difficulty.")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-seconds', type=float, default=60.0,
+                        help="Stop a method at a difficulty once it has spent this long.")
+    args = parser.parse_args()
+
+    engine = MiningEngine(max_workers=args.workers)
+    engine.mine(make_block(0), 1)  # Start the workers outside the measurement
+    print(f"engine workers: {engine.max_workers}")
+
+    for difficulty in args.difficulties:
+        for label, mine in [
+            ("rebuild", rebuild_loop),
+            ("midstate", lambda block, difficulty: block.mine_block(difficulty)),
+            ("engine", lambda block, difficulty: block.mine_block(difficulty, engine=engine)),
+        ]:
+            if label == "rebuild" and difficulty > 5:
+                print(f"difficulty {difficulty} {label:>8}: skipped (minutes per block)")
+                continue
+            per_block, rate, mined = run(label, mine, difficulty, args.blocks, args.max_seconds)
+            if label == "engine":
+                rate = engine.metrics()["last_hashes_per_second"]
+            print(f"difficulty {difficulty} {label:>8}: {per_block:8.3f} s/block, "
+                  f"{rate / 1e6:6.2f} MH/s ({mined} blocks)")
+
+    print(f"engine metrics: {engine.metrics()}")
+    engine.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,54 @@
+# Gunicorn configuration: one chain writer process, many stateless web workers.
+#
+#   gunicorn -c gunicorn.conf.py run:app
+#
+# The master starts the writer before forking the workers. The writer is the only
+# process that opens the block log; workers reach it through a Unix socket and
+# watch its height broadcast to invalidate their read caches.
+import multiprocessing
+import os
+import secrets
+import subprocess
+import sys
+import time
+
+bind = os.environ.get('BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+preload_app = False  # Workers must import the app after the writer's settings are in the environment
+
+chain_process = None
+
+
+def on_starting(server):
+    global chain_process
+    os.environ.setdefault('BLOCKCHAIN_SOCKET', os.path.abspath('blockchain.sock'))
+    os.environ.setdefault('BLOCKCHAIN_AUTHKEY', secrets.token_hex(32))
+    # Every worker must decrypt with the same keys; create the keyring before forking
+    os.environ.setdefault('SECRET_KEYRING_FILE', os.path.abspath('secret.keyring'))
+    from app.keyring import Keyring
+    Keyring.from_environment()
+    address = os.environ['BLOCKCHAIN_SOCKET']
+    height_filename = os.environ.setdefault('BLOCKCHAIN_HEIGHT_FILE', address + '.height')
+    if os.path.exists(height_filename):
+        os.remove(height_filename)
+
+    # A separate interpreter rather than a multiprocessing child, so forked workers
+    # inherit no handle on it
+    chain_process = subprocess.Popen([
+        sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'manage.py'), 'serve',
+        '--socket', address, '--format', os.environ.get('BLOCKCHAIN_FORMAT', 'json')
+    ])
+
+    # Workers connect on their first request, but wait for the chain to finish loading
+    deadline = time.monotonic() + 120
+    while not os.path.exists(height_filename) or not os.path.exists(address):
+        if chain_process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("Chain writer process failed to start.")
+        time.sleep(0.1)
+    server.log.info("Chain writer started (pid %s) on %s", chain_process.pid, address)
+
+
+def on_exit(server):
+    if chain_process is not None and chain_process.poll() is None:
+        chain_process.terminate()
+        chain_process.wait(10)
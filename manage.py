@@ -0,0 +1,137 @@
+import argparse
+import os
+import secrets
+import sys
+import time
+from app.storage import open_block_log, convert_block_log, export_legacy_json
+
+
+def convert(args):
+    """Copy a block log into another file, possibly in another format."""
+    source = open_block_log(args.source, args.source_format)
+    destination = open_block_log(args.destination, args.format)
+    start = time.perf_counter()
+    count = convert_block_log(source, destination)
+    print(f"Converted {count} blocks from {args.source} to {args.destination} "
+          f"({args.format}) in {time.perf_counter() - start:.2f}s.")
+
+
+def export(args):
+    """Write a block log out as the legacy JSON array file."""
+    source = open_block_log(args.source, args.source_format)
+    count = export_legacy_json(source, args.destination)
+    print(f"Exported {count} blocks from {args.source} to {args.destination}.")
+
+
+def verify(args):
+    """Check the CRC of every record, and the Merkle root and hash of binary records in place."""
+    storage = open_block_log(args.source, args.source_format)
+    offsets = storage.load_offsets()
+    start = time.perf_counter()
+    for height, offset in enumerate(offsets):
+        if hasattr(storage, 'verify_at'):
+            valid = storage.verify_at(offset)
+        else:
+            try:
+                storage.read_at(offset)
+                valid = True
+            except IOError:
+                valid = False
+        if not valid:
+            print(f"Block {height} at offset {offset} is damaged.")
+            return 1
+    print(f"Verified {len(offsets)} blocks in {time.perf_counter() - start:.2f}s.")
+    return 0
+
+
+def serve(args):
+    """Run the chain writer process for web workers started separately."""
+    from app.chain_service import run_chain_server
+
+    authkey = os.environ.get('BLOCKCHAIN_AUTHKEY')
+    if authkey is None:
+        authkey = secrets.token_hex(32)
+        print("Point the web workers at this process with:")
+        print(f"  export BLOCKCHAIN_SOCKET={os.path.abspath(args.socket)} BLOCKCHAIN_AUTHKEY={authkey}")
+    run_chain_server(os.path.abspath(args.socket), bytes.fromhex(authkey), args.filename, args.format)
+
+
+def rotate_key(args):
+    """Add a new primary key to the keyring used for stored secret phrases."""
+    from app.keyring import Keyring
+
+    keyring = Keyring(args.keyring)
+    keyring.rotate()
+    print(f"Rotated {args.keyring}: {len(keyring.keys)} keys, the new one encrypts from the next restart.")
+
+
+def ingest(args):
+    """Commit the emission reports of a CSV or JSONL file, through the chain server if one is configured."""
+    from app.ingest import EmissionIngestor
+
+    if os.environ.get('BLOCKCHAIN_SOCKET'):
+        from app.chain_service import RemoteBlockchain
+        blockchain = RemoteBlockchain.from_environment()
+    else:
+        from app.blockchain import Blockchain
+        blockchain = Blockchain(args.filename, format=args.format)
+    format = args.input_format or ('jsonl' if args.source.endswith(('.jsonl', '.ndjson')) else 'csv')
+    start = time.perf_counter()
+    with (open(args.source, newline='', encoding='utf-8') if args.source != '-' else sys.stdin) as lines:
+        report = EmissionIngestor(blockchain, chunk_size=args.chunk_size).ingest(lines, format, sender=args.sender)
+    print(f"Read {report.rows} rows in {time.perf_counter() - start:.2f}s: {report.committed} committed in "
+          f"{report.blocks} blocks, {report.duplicates} already on the chain, {report.pending} pending, "
+          f"{report.error_count} rejected.")
+    for error in report.errors[:args.show_errors]:
+        print(f"  line {error['line']}: {error['error']}")
+    return 1 if report.error_count else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GreenLedger maintenance commands.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = commands.add_parser('convert', help="Convert a block log between formats.")
+    convert_parser.add_argument('source')
+    convert_parser.add_argument('destination')
+    convert_parser.add_argument('--source-format', choices=['json', 'binary'], default='json')
+    convert_parser.add_argument('--format', choices=['json', 'binary'], default='binary')
+    convert_parser.set_defaults(handler=convert)
+
+    export_parser = commands.add_parser('export', help="Export a block log as a legacy JSON array.")
+    export_parser.add_argument('source')
+    export_parser.add_argument('destination')
+    export_parser.add_argument('--source-format', choices=['json', 'binary'], default='json')
+    export_parser.set_defaults(handler=export)
+
+    verify_parser = commands.add_parser('verify', help="Check every record of a block log.")
+    verify_parser.add_argument('source')
+    verify_parser.add_argument('--source-format', choices=['json', 'binary'], default='json')
+    verify_parser.set_defaults(handler=verify)
+
+    serve_parser = commands.add_parser('serve', help="Run the chain writer process for web workers.")
+    serve_parser.add_argument('--socket', default='blockchain.sock')
+    serve_parser.add_argument('--filename', default='blockchain.json')
+    serve_parser.add_argument('--format', choices=['json', 'binary'], default='json')
+    serve_parser.set_defaults(handler=serve)
+
+    rotate_parser = commands.add_parser('rotate-key', help="Add a new primary key to the secret keyring.")
+    rotate_parser.add_argument('--keyring', default=os.environ.get('SECRET_KEYRING_FILE', 'secret.keyring'))
+    rotate_parser.set_defaults(handler=rotate_key)
+
+    ingest_parser = commands.add_parser('ingest', help="Commit the emission reports of a CSV or JSONL file.")
+    ingest_parser.add_argument('source', help="File to read, or - for standard input.")
+    ingest_parser.add_argument('--input-format', choices=['csv', 'jsonl'], help="Default: from the file extension.")
+    ingest_parser.add_argument('--sender', help="Only accept rows reported by this user.")
+    ingest_parser.add_argument('--chunk-size', type=int, default=500, help="Transactions committed per batch.")
+    ingest_parser.add_argument('--show-errors', type=int, default=20, help="Rejected rows to list.")
+    ingest_parser.add_argument('--filename', default='blockchain.json')
+    ingest_parser.add_argument('--format', choices=['json', 'binary'], default='json')
+    ingest_parser.set_defaults(handler=ingest)
+
+    args = parser.parse_args()
+    return args.handler(args) or 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.blockchain import Blockchain  # noqa: E402
+from app.transaction import Transaction  # noqa: E402
+
+
+@pytest.fixture
+def blockchain(tmp_path):
+    """A fresh chain in a temporary directory, holding only its genesis block."""
+    chain = Blockchain(str(tmp_path / 'blockchain.json'))
+    yield chain
+    chain.storage.close()
+
+
+@pytest.fixture
+def register(blockchain):
+    """Commit the registration of a user with a profession."""
+    def register(username, profession='civil_engineer'):
+        blockchain.queue_transaction(Transaction('USER_REGISTRATION', username, 'SYSTEM',
+                                                 data={'public_key': 'pk', 'profession': profession}))
+        while blockchain.add_block() is not None:
+            pass
+    return register
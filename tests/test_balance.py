@@ -0,0 +1,107 @@
+import math
+
+import pytest
+
+from app.balance import BalanceManager
+from app.block import Block
+from app.transaction import Transaction
+
+
+def _transfer(operation, sender, recipient, amount):
+    return Transaction(operation, sender, recipient, data={'amount': amount})
+
+
+def _chain(batches):
+    chain = [Block(0, [], '0', timestamp=0)]
+    for transactions in batches:
+        chain.append(Block(len(chain), transactions, chain[-1].hash))
+    return chain
+
+
+def _balance_columns(columns):
+    return [[None if math.isnan(value) else value for value in column]
+            for column in (columns.tx_sender_balance, columns.tx_recipient_balance)]
+
+
+BATCHES = [
+    [_transfer('CREDIT', 'SYSTEM', 'alice', 100), _transfer('CREDIT', 'SYSTEM', 'bob', 10)],
+    [_transfer('TOKEN_TRANSFER', 'alice', 'bob', 30), _transfer('STAKE', 'bob', 'STAKE_POOL', 15)],
+    [_transfer('BURN', 'alice', 'BURN', 5), _transfer('UNSTAKE', 'STAKE_POOL', 'bob', 5)],
+    [_transfer('TAX_PAYMENT', 'bob', 'DID:tax', 2), Transaction('CARBON_EMISSION', 'alice', 'DID:x', data={'amount': 7})],
+]
+
+
+def test_apply_block_folds_token_operations():
+    manager = BalanceManager()
+    for block in _chain(BATCHES):
+        manager.apply_block(block)
+    assert manager.get_balance('alice') == 65
+    assert manager.get_balance('bob') == 28
+    assert manager.get_balance('DID:tax') == 2
+    assert manager.get_stake('bob') == 10
+    assert not set(manager.balances) & BalanceManager.SYSTEM_ACCOUNTS
+    assert manager.height == 5
+
+
+def test_checkpoint_replay_matches_a_full_fold(tmp_path):
+    chain = _chain(BATCHES)
+    filename = str(tmp_path / 'balances.log')
+    manager = BalanceManager()
+    for block in chain[:3]:
+        manager.apply_block(block)
+    manager.save(filename)
+    for block in chain[3:]:
+        manager.apply_block(block)
+    manager.save(filename)
+
+    loaded = BalanceManager.load(filename, chain)
+    assert loaded.balances == manager.balances
+    assert loaded.stakes == manager.stakes
+    assert (loaded.height, loaded.snapshot_height, loaded.tip_hash) == (5, 5, chain[-1].hash)
+
+
+def test_checkpoint_past_a_fork_is_replayed_from_the_blocks(tmp_path):
+    chain = _chain(BATCHES)
+    filename = str(tmp_path / 'balances.log')
+    manager = BalanceManager()
+    for block in chain[:3]:
+        manager.apply_block(block)
+    manager.save(filename)
+    for block in chain[3:]:
+        manager.apply_block(block)
+    manager.save(filename)
+
+    # Another fork replaces the last two blocks: only the first checkpoint still holds
+    fork = chain[:3] + [Block(3, [_transfer('TOKEN_TRANSFER', 'bob', 'carol', 4)], chain[2].hash)]
+    loaded = BalanceManager.load(filename, fork)
+    expected = BalanceManager()
+    for block in fork:
+        expected.apply_block(block)
+    assert loaded.snapshot_height == 3
+    assert loaded.height == 4
+    assert loaded.balances == expected.balances
+    assert loaded.stakes == expected.stakes
+    assert loaded.get_balance('carol') == 4
+
+
+def test_restart_restores_balances_and_running_balance_columns(blockchain, register):
+    blockchain.snapshot_interval = 2
+    register('alice')
+    for amount in (100, 20, 3):
+        blockchain.queue_transaction(_transfer('CREDIT', 'SYSTEM', 'alice', amount))
+        blockchain.add_block()
+    blockchain.queue_transaction(_transfer('TOKEN_TRANSFER', 'alice', 'bob', 50))
+    blockchain.add_block()
+    expected = dict(blockchain.balance_manager.balances)
+    columns = blockchain.chain.columns
+    history = _balance_columns(columns)
+    blockchain.storage.close()
+
+    reopened = type(blockchain)(blockchain.filename)
+    try:
+        assert reopened.balance_manager.balances == expected
+        assert reopened.get_balance('alice') == pytest.approx(73)
+        columns = reopened.chain.columns
+        assert _balance_columns(columns) == history
+    finally:
+        reopened.storage.close()
@@ -0,0 +1,85 @@
+import io
+
+import pytest
+
+from app.ingest import EMISSION_RECIPIENT, EmissionIngestor, IngestError, read_rows
+
+
+@pytest.fixture
+def ingestor(blockchain, register):
+    register('carla', 'civil_engineer')
+    register('mike', 'mechanical_engineer')
+    return EmissionIngestor(blockchain, chunk_size=2)
+
+
+def test_csv_row_builds_a_nested_report(ingestor):
+    (line, row), = read_rows(io.StringIO(
+        "username,timestamp,amount,materials_used.concrete,materials_used.steel,reporting_period\n"
+        "carla,2024-05-01,1.5,10,2,2024-Q2\n"
+    ))
+    transaction = ingestor.build_transaction(row)
+    assert line == 2
+    assert (transaction.operation, transaction.sender, transaction.recipient) == \
+        ('CARBON_EMISSION', 'carla', EMISSION_RECIPIENT)
+    assert transaction.timestamp == 1714521600.0
+    assert transaction.data == {'amount': 1.5, 'materials_used': {'concrete': 10.0, 'steel': 2.0},
+                                'reporting_period': '2024-Q2'}
+
+
+def test_jsonl_row_follows_the_reporters_schema(ingestor):
+    transaction = ingestor.build_transaction('{"username": "mike", "fuel_consumption": {"diesel": 40}}')
+    assert transaction.data == {'fuel_consumption': {'diesel': 40.0}}
+
+
+@pytest.mark.parametrize('row, error', [
+    ('{"amount": 1}', "Missing 'username'"),
+    ('{"username": "nobody", "amount": 1}', "not a registered engineer"),
+    ('{"username": "carla", "profession": "mechanical_engineer", "amount": 1}', "registered as civil_engineer"),
+    ('{"username": "carla", "fuel_consumption": 1}', "not part of the civil_engineer schema"),
+    ('{"username": "carla", "reporting_period": "2024"}', "No emission figures"),
+    ('{"username": "carla", "amount": -1}', "non-negative"),
+    ('{"username": "carla", "amount": "lots"}', "not a number"),
+    ('{"username": "carla", "amount": true}', "not a number"),
+    ('{"username": "carla", "materials_used": {}}', "empty"),
+    ('{"username": "carla", "amount": 1, "compliance_status": "maybe"}', "Invalid compliance_status"),
+    ('{"username": "carla", "amount": 1, "timestamp": "yesterday"}', "Invalid timestamp"),
+    ('{"username": "carla", "amount": 1', "Invalid JSON"),
+    ('[1, 2]', "JSON object"),
+])
+def test_rows_outside_the_schema_are_rejected(ingestor, row, error):
+    with pytest.raises(IngestError, match=error):
+        ingestor.build_transaction(row)
+
+
+def test_rows_can_only_be_reported_by_the_sender(ingestor):
+    assert ingestor.build_transaction('{"amount": 1}', sender='carla').sender == 'carla'
+    with pytest.raises(IngestError, match="only be reported as mike"):
+        ingestor.build_transaction('{"username": "carla", "amount": 1}', sender='mike')
+
+
+def test_csv_rows_with_extra_cells_are_rejected(ingestor):
+    (_, row), = read_rows(io.StringIO("username,amount\ncarla,1,2\n"))
+    with pytest.raises(IngestError, match="more cells"):
+        ingestor.build_transaction(row)
+
+
+def test_ingest_reports_errors_and_skips_duplicates(ingestor, blockchain):
+    lines = [
+        '{"username": "carla", "amount": 1, "timestamp": 1714557600}\n',
+        '{"username": "carla", "amount": -1}\n',
+        '\n',
+        '{"username": "mike", "energy_usage": 100, "timestamp": 1714557601}\n',
+    ]
+    report = ingestor.ingest(lines, format='jsonl')
+    assert report.to_dict()['rows'] == 3
+    assert (report.committed, report.error_count) == (2, 1)
+    assert report.errors[0]['line'] == 2
+
+    again = EmissionIngestor(blockchain).ingest(lines, format='jsonl')
+    assert (again.committed, again.duplicates) == (0, 2)
+    assert len(blockchain.index.operation_postings('CARBON_EMISSION')) == 2
+
+
+def test_unknown_format_is_refused(ingestor):
+    with pytest.raises(ValueError):
+        ingestor.ingest([], format='xml')
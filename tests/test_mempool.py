@@ -0,0 +1,121 @@
+import pytest
+
+from app.mempool import Mempool, MempoolError
+from app.transaction import Transaction
+
+
+def _tx(operation, sender, recipient='someone', amount=1):
+    return Transaction(operation, sender, recipient, data={'amount': amount})
+
+
+def test_sealing_order_is_priority_then_age():
+    pool = Mempool()
+    transfer = _tx('TOKEN_TRANSFER', 'alice')
+    tax = _tx('TAX_PAYMENT', 'bob')
+    registration = _tx('USER_REGISTRATION', 'carol', 'SYSTEM')
+    later_transfer = _tx('TOKEN_TRANSFER', 'dave')
+    for transaction in (transfer, tax, registration, later_transfer):
+        pool.add(transaction)
+    assert pool.transactions() == [registration, tax, transfer, later_transfer]
+    assert pool.head(2) == [registration, tax]
+
+
+def test_duplicates_are_not_added_twice():
+    pool = Mempool()
+    transaction = _tx('TOKEN_TRANSFER', 'alice')
+    assert pool.add(transaction)
+    assert not pool.add(transaction)
+    assert len(pool) == 1
+    assert pool.metrics()['duplicates'] == 1
+
+
+def test_per_sender_cap():
+    pool = Mempool(max_per_sender=2)
+    pool.add(_tx('TOKEN_TRANSFER', 'alice', amount=1))
+    pool.add(_tx('TOKEN_TRANSFER', 'alice', amount=2))
+    with pytest.raises(MempoolError):
+        pool.add(_tx('TOKEN_TRANSFER', 'alice', amount=3))
+    pool.add(_tx('TOKEN_TRANSFER', 'bob'))
+    assert len(pool) == 3
+
+
+def test_system_sender_has_its_own_cap():
+    pool = Mempool(max_per_sender=1, max_per_system_sender=3)
+    for recipient in ('a', 'b', 'c'):
+        pool.add(_tx('CREDIT', 'SYSTEM', recipient))
+    with pytest.raises(MempoolError):
+        pool.add(_tx('CREDIT', 'SYSTEM', 'd'))
+
+
+def test_eviction_takes_the_newest_of_the_lowest_priority():
+    evicted = []
+    pool = Mempool(max_transactions=3, on_evict=evicted.append)
+    old = _tx('TOKEN_TRANSFER', 'alice')
+    new = _tx('TOKEN_TRANSFER', 'bob')
+    tax = _tx('TAX_PAYMENT', 'carol')
+    for transaction in (old, new, tax):
+        pool.add(transaction)
+    registration = _tx('USER_REGISTRATION', 'dave', 'SYSTEM')
+    pool.add(registration)
+    assert evicted == [new]
+    assert pool.transactions() == [registration, tax, old]
+
+
+def test_a_transaction_that_would_be_evicted_itself_is_refused():
+    pool = Mempool(max_transactions=2)
+    pool.add(_tx('TAX_PAYMENT', 'alice'))
+    pool.add(_tx('TOKEN_TRANSFER', 'bob'))
+    newest = _tx('TOKEN_TRANSFER', 'carol')
+    with pytest.raises(MempoolError):
+        pool.add(newest)
+    assert newest not in pool
+    assert pool.metrics()['rejected'] == 1
+
+
+def test_byte_cap():
+    small = _tx('TOKEN_TRANSFER', 'alice')
+    pool = Mempool(max_bytes=Mempool.transaction_size(small) + 10)
+    pool.add(small)
+    with pytest.raises(MempoolError):
+        pool.add(Transaction('TOKEN_TRANSFER', 'bob', 'x', data={'amount': 1, 'memo': 'y' * 1000}))
+    assert pool.pending_bytes == Mempool.transaction_size(small)
+
+
+def test_linked_transactions_are_evicted_together():
+    evicted = []
+    pool = Mempool(max_transactions=3, on_evict=evicted.append)
+    registration = _tx('USER_REGISTRATION', 'alice', 'SYSTEM')
+    credit = _tx('CREDIT', 'SYSTEM', 'alice', 10)
+    pool.add(registration)
+    pool.add(credit)
+    pool.link([registration, credit])
+    pool.add(_tx('TAX_PAYMENT', 'bob'))
+    pool.add(_tx('TAX_PAYMENT', 'carol'))
+    assert set(evicted) == {registration, credit}
+    assert registration not in pool and credit not in pool
+
+
+def test_link_partner_taken_for_sealing_is_never_evicted():
+    pool = Mempool(max_transactions=2)
+    registration = _tx('USER_REGISTRATION', 'alice', 'SYSTEM')
+    credit = _tx('CREDIT', 'SYSTEM', 'alice', 10)
+    pool.add(registration)
+    pool.add(credit)
+    pool.link([registration, credit])
+    pool.remove_many([registration])  # Sealed
+    pool.add(_tx('TAX_PAYMENT', 'bob'))
+    with pytest.raises(MempoolError):
+        pool.add(_tx('TAX_PAYMENT', 'carol'))
+    assert credit in pool
+
+
+def test_queue_registration_links_the_credit(blockchain):
+    blockchain.mempool.max_transactions = 3
+    registration = _tx('USER_REGISTRATION', 'alice', 'SYSTEM')
+    credit = _tx('CREDIT', 'SYSTEM', 'alice', 10)
+    assert blockchain.queue_registration('alice', [registration, credit])
+    blockchain.queue_transaction(_tx('TAX_PAYMENT', 'bob'))
+    blockchain.queue_transaction(_tx('TAX_PAYMENT', 'carol'))
+    assert registration not in blockchain.mempool
+    assert credit not in blockchain.mempool
+    assert blockchain.is_username_available('alice')
@@ -0,0 +1,101 @@
+import os
+import zlib
+
+import pytest
+
+from app.storage import BlockLog, BlockLogError, SnapshotLog
+
+
+def _log_with_blocks(tmp_path, count):
+    log = BlockLog(str(tmp_path / 'blockchain.jsonl'))
+    for i in range(count):
+        log.append({'index': i, 'payload': 'x' * i})
+    return log
+
+
+def test_record_framing(tmp_path):
+    log = _log_with_blocks(tmp_path, 1)
+    with open(log.filename, 'rb') as f:
+        record = f.read()
+    length, checksum, payload = int(record[0:8], 16), int(record[9:17], 16), record[18:-1]
+    assert record.endswith(b'\n')
+    assert length == len(payload)
+    assert checksum == zlib.crc32(payload)
+    assert log.read_at(0) == {'index': 0, 'payload': ''}
+
+
+def test_read_blocks_truncates_torn_tail(tmp_path):
+    log = _log_with_blocks(tmp_path, 3)
+    size = os.path.getsize(log.filename)
+    with open(log.filename, 'ab') as f:
+        f.write(BlockLog.encode_record({'index': 3})[:-5])  # Crash mid-write
+    assert [block['index'] for block in log.read_blocks()] == [0, 1, 2]
+    assert os.path.getsize(log.filename) == size
+    log.append({'index': 3})
+    assert [block['index'] for block in log.read_blocks()] == [0, 1, 2, 3]
+
+
+def test_read_blocks_rejects_damage_before_the_tail(tmp_path):
+    log = _log_with_blocks(tmp_path, 3)
+    with open(log.filename, 'r+b') as f:
+        f.seek(20)
+        f.write(b'#')  # Inside the payload of the first record
+    with pytest.raises(BlockLogError):
+        log.read_blocks()
+
+
+def test_load_offsets_truncates_torn_tail(tmp_path):
+    log = _log_with_blocks(tmp_path, 3)
+    offsets = list(log.load_offsets())
+    size = os.path.getsize(log.filename)
+    with open(log.filename, 'ab') as f:
+        f.write(b'0000ffff 00000000 {"index"')
+    assert list(log.load_offsets()) == offsets
+    assert os.path.getsize(log.filename) == size
+
+
+def test_load_offsets_recovers_without_sidecar(tmp_path):
+    log = _log_with_blocks(tmp_path, 4)
+    offsets = list(log.load_offsets())
+    os.remove(log.offsets_filename)
+    assert list(log.load_offsets()) == offsets
+    assert [log.read_at(offset)['index'] for offset in offsets] == [0, 1, 2, 3]
+
+
+def test_load_offsets_drops_stale_sidecar_entries(tmp_path):
+    log = _log_with_blocks(tmp_path, 4)
+    offsets = list(log.load_offsets())
+    with open(log.filename, 'r+b') as f:
+        f.truncate(offsets[2])  # The last two records are gone, the sidecar still lists them
+    assert list(log.load_offsets()) == offsets[:2]
+
+
+def test_truncate_drops_later_blocks(tmp_path):
+    log = _log_with_blocks(tmp_path, 5)
+    log.truncate(2)
+    assert [block['index'] for block in log.read_blocks()] == [0, 1]
+    assert len(log.load_offsets()) == 2
+
+
+class _Block:
+    def __init__(self, height):
+        self.hash = f'hash{height}'
+
+
+def test_snapshot_log_stops_at_torn_and_stale_records(tmp_path):
+    chain = [_Block(height) for height in range(30)]
+    log = SnapshotLog(str(tmp_path / 'index.log'))
+    for start in (0, 10, 20):
+        log.append({'start': start, 'height': start + 10, 'tip_hash': f'hash{start + 9}'}, b'\n\x00payload')
+    with open(log.filename, 'ab') as f:
+        f.write(b'00000100 00000000 {"start":30')
+
+    reader = SnapshotLog(log.filename)
+    assert [header['height'] for header, _ in reader.read(chain, 0)] == [10, 20, 30]
+    assert reader.height == 30
+
+    chain[15] = chain[19] = _Block('fork')  # The last two records are no longer part of the chain
+    reader = SnapshotLog(log.filename)
+    assert [(header['height'], payload) for header, payload in reader.read(chain, 0)] == [(10, b'\n\x00payload')]
+    reader.append({'start': 10, 'height': 20, 'tip_hash': 'hashfork'})
+    assert [header['height'] for header, _ in SnapshotLog(log.filename).read(chain, 0)] == [10, 20]
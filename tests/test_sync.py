@@ -0,0 +1,64 @@
+import pytest
+
+from app.sync import LocalNetwork
+
+
+@pytest.fixture
+def network(tmp_path):
+    network = LocalNetwork(2, directory=str(tmp_path))
+    yield network
+    network.close()
+
+
+def _fork(network):
+    """Give node 0 a two-block branch and node 1 a shorter one; return node 1's orphan."""
+    source, forked = network.nodes
+    for amount in (1, 2):
+        source.add_transaction('SYSTEM', 'alice', 'CREDIT', {'amount': amount})
+        source.add_block()
+    orphan = forked.add_transaction('SYSTEM', 'bob', 'CREDIT', {'amount': 5})
+    forked.add_block()
+    return orphan
+
+
+def test_catch_up(network):
+    source, node = network.nodes
+    for height in range(5):
+        source.add_transaction('SYSTEM', f'user{height}', 'CREDIT', {'amount': 1})
+        source.add_block()
+    result = network.sync(1, 0)
+    assert result.added == 5
+    assert node.snapshot() == source.snapshot()
+    assert node.get_balance('user4') == 1
+
+
+def test_fork_switch_requeues_orphans(network):
+    source, forked = network.nodes
+    orphan = _fork(network)
+    result = network.sync(1, 0)
+    assert forked.snapshot() == source.snapshot()
+    assert result.fork_height == 1 and result.added == 2
+    assert [block.index for block in result.removed] == [1]
+    assert orphan in forked.mempool
+    assert forked.get_balance('bob') == 0
+    assert forked.get_balance('alice') == 3
+
+
+def test_fork_switch_survives_a_full_mempool(network, capsys):
+    source, forked = network.nodes
+    orphan = _fork(network)
+    forked.mempool.max_transactions = 0  # Every requeued orphan is refused
+    result = network.sync(1, 0)
+    assert forked.snapshot() == source.snapshot()
+    assert result.added == 2
+    assert orphan not in forked.mempool
+    assert f"Dropped orphaned transaction {orphan.hash}" in capsys.readouterr().out
+
+
+def test_shorter_peer_chain_is_not_adopted(network):
+    source, node = network.nodes
+    node.add_transaction('SYSTEM', 'alice', 'CREDIT', {'amount': 1})
+    node.add_block()
+    tip = node.snapshot()
+    network.sync(1, 0)
+    assert node.snapshot() == tip